@@ -1,15 +1,28 @@
 import os
 import secrets
-from fastapi import FastAPI, Query, Request, HTTPException
-from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse
+from typing import Optional
+from fastapi import FastAPI, Query, Request, HTTPException, Depends
+from fastapi.responses import JSONResponse, RedirectResponse, HTMLResponse, PlainTextResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.templating import Jinja2Templates
 from backend.utils.file_utils import ensure_directory_exists, delete_file
-from backend.utils.network_utils import validate_url, extract_domain
-from backend.database import engine, Base
+from backend.utils.network_utils import validate_url, extract_domain, http_client
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database import engine, get_async_db, dispose_async_engine
+from backend.database.user_stats import get_user_stats
+from backend.database.migrations import AUTO_MIGRATE, migrate
+from backend.utils.template_utils import templates, precompile_templates, stream_template
+from backend.database.user_rows import USERS_PAGE_SIZE, USERS_PAGE_SIZE_MAX, UsersPage, iter_user_rows
+from backend.routers import users_router, domains_router, settings_router, subscription_router, system_router
 from backend.utils.logger import setup_logger
+from backend.utils.metrics_utils import registry
+from backend.middleware import RateLimitMiddleware, RequestContextMiddleware
+from backend.utils.ratelimit_utils import RATE_LIMIT_ENABLED
+from backend.utils.qr_utils import shutdown_qr_workers
+from backend.background import (
+    start_background_services, stop_background_services, system_sampler, user_status_counts,
+)
 
 # آی‌پی عمومی سرور
 SERVER_IP = os.getenv("SERVER_IP", "127.0.0.1")  # مقدار پیش‌فرض
@@ -18,15 +31,9 @@ SERVER_IP = os.getenv("SERVER_IP", "127.0.0.1")  # مقدار پیش‌فرض
 app = FastAPI(
     title="Management Panel API",
     description="Comprehensive API for managing users, domains, settings, and server operations.",
-    version="1.0.0"
+    version="1.0.0",
 )
 
-# تنظیم مسیر تمپلت‌ها
-templates = Jinja2Templates(directory="backend/templates")
-
-# ایجاد جداول پایگاه داده
-Base.metadata.create_all(bind=engine)
-
 # اضافه کردن فایل‌های استاتیک
 app.mount("/static", StaticFiles(directory="backend/static"), name="static")
 
@@ -42,32 +49,55 @@ app.add_middleware(
     TrustedHostMiddleware,
     allowed_hosts=["localhost", "127.0.0.1", "*"]
 )
+# محدودیت نرخ مسیرهای عمومی (داخل RequestContextMiddleware تا پاسخ‌های 429 هم شناسه درخواست و متریک داشته باشند)
+if RATE_LIMIT_ENABLED:
+    app.add_middleware(RateLimitMiddleware)
+# شناسه درخواست، لاگ و متریک‌ها (بیرونی‌ترین middleware تا زمان کامل درخواست اندازه‌گیری شود)
+app.add_middleware(RequestContextMiddleware, routes=app.router.routes)
 
 # تنظیم لاگر
 logger = setup_logger()
 
+# اتصال روترها
+app.include_router(users_router, prefix="/users", tags=["Users"])
+app.include_router(domains_router, prefix="/domains")
+app.include_router(settings_router, prefix="/settings")
+app.include_router(subscription_router)
+app.include_router(system_router, prefix="/system")
+
 # رویدادهای startup و shutdown
 @app.on_event("startup")
 async def startup_event():
     from backend.utils.time_utils import get_current_time, format_datetime
     current_time = get_current_time()
-    logger.info(f"🚀 Application started at {format_datetime(current_time)}")
+    logger.info("🚀 Application started at %s", format_datetime(current_time))
+    # در استقرار، مهاجرت‌ها یک بار توسط install.py اجرا می‌شوند (AUTO_MIGRATE=0)؛ در غیر این صورت اینجا
+    if AUTO_MIGRATE:
+        applied = migrate(engine)
+        if applied:
+            logger.info("Applied schema migrations: %s", ", ".join(str(version) for version in applied))
+    precompile_templates()
     ensure_directory_exists("backend/static")
     favicon_path = "backend/static/favicon.ico"
     if not os.path.exists(favicon_path):
         with open(favicon_path, "w") as f:
             pass
+    start_background_services()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     from backend.utils.time_utils import get_current_time, format_datetime
     current_time = get_current_time()
-    logger.info(f"🛑 Application shutting down at {format_datetime(current_time)}")
+    logger.info("🛑 Application shutting down at %s", format_datetime(current_time))
+    stop_background_services()
+    await dispose_async_engine()
+    await http_client.aclose()
+    shutdown_qr_workers()
 
 # مدیریت خطاهای عمومی
 @app.exception_handler(404)
 async def not_found_exception_handler(request: Request, exc):
-    logger.warning(f"404 Error: {request.url} not found.")
+    logger.warning("404 Error: %s not found.", request.url)
     return JSONResponse(
         status_code=404,
         content={"message": "The requested resource was not found."},
@@ -75,29 +105,42 @@ async def not_found_exception_handler(request: Request, exc):
 
 @app.exception_handler(422)
 async def validation_exception_handler(request: Request, exc):
-    logger.error(f"422 Validation Error at {request.url}: {exc.errors()}")
+    logger.error("422 Validation Error at %s: %s", request.url, exc.errors())
     return JSONResponse(
         status_code=422,
         content={"message": "Validation error occurred.", "details": exc.errors()},
     )
 
-# Middleware لاگ‌برداری
-@app.middleware("http")
-async def log_request_details(request: Request, call_next):
-    logger.debug(f"Headers: {request.headers}")
-    logger.debug(f"URL: {request.url}")
-    response = await call_next(request)
-    logger.debug(f"Response status: {response.status_code}")
-    return response
+# متریک‌های Prometheus
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 # مسیرهای جدید برای صفحات
 @app.get("/dashboard", response_class=HTMLResponse)
-async def dashboard_page(request: Request):
-    return templates.TemplateResponse("dashboard.html", {"request": request})
-
+async def dashboard_page(request: Request, db: AsyncSession = Depends(get_async_db)):
+    # مقادیر سرور از آخرین نمونه نمونه‌بردار پس‌زمینه و شمارنده‌های کاربران از user_stats خوانده می‌شوند (O(1))
+    snapshot = system_sampler.latest() or {}
+    context = {"request": request}
+    for key in ("cpu_usage", "ram_usage", "disk_usage", "bandwidth_speed"):
+        value = snapshot.get(key)
+        context[key] = "-" if value is None else value
+    counts = user_status_counts(await get_user_stats(db))
+    for key in ("total", "online", "offline", "inactive"):
+        value = counts[key]
+        context[f"{key}_users"] = "-" if value is None else value
+    return templates.TemplateResponse("dashboard.html", context)
+
+# صفحه کاربران به صورت استریمی رندر می‌شود تا ردیف‌های اول بدون انتظار برای کل جدول ارسال شوند
 @app.get("/users", response_class=HTMLResponse)
-async def users_page(request: Request):
-    return templates.TemplateResponse("users.html", {"request": request})
+async def users_page(
+    request: Request,
+    after: Optional[int] = Query(None, ge=0, description="Show users with id greater than this cursor"),
+    page_size: int = Query(USERS_PAGE_SIZE, ge=1, le=USERS_PAGE_SIZE_MAX, description="Rows per page"),
+):
+    page = UsersPage(after, page_size)
+    context = {"request": request, "rows": iter_user_rows(page), "page": page}
+    return StreamingResponse(stream_template("users.html", context), media_type="text/html; charset=utf-8")
 
 @app.get("/settings", response_class=HTMLResponse)
 async def settings_page(request: Request):
@@ -0,0 +1,136 @@
+import os
+import logging
+from typing import Optional
+from backend.database.database import SessionLocal, engine
+from backend.database.events import add_user_change_listener, set_change_publisher
+from backend.database.invalidation import ChangeLogPublisher, ChangeLogPoller, INVALIDATION_ENABLED
+from backend.utils.process_utils import LeaderLock, read_shared_state
+from backend.utils.xray_utils import XrayConfigCompiler, XrayCliApi, XrayStatsApi
+from backend.utils.traffic_utils import TrafficCollector
+from backend.utils.system_utils import SystemSampler
+from backend.utils.enforcement_utils import EnforcementScheduler, deactivate_users
+from backend.utils.connection_utils import (
+    ConnectionTracker, ConnectionMonitor, CONNECTION_LIMIT_ACTION, CONNECTION_STATE_PATH, CONNECTION_STATE_MAX_AGE,
+)
+
+logger = logging.getLogger("app_logger")
+
+# فعال‌سازی همگام‌سازی کاربران با Xray (روی سرور نصب‌شده توسط install.py)
+XRAY_SYNC_ENABLED = os.getenv("XRAY_SYNC_ENABLED", "0") == "1"
+TRAFFIC_STATS_ENABLED = os.getenv("TRAFFIC_STATS_ENABLED", "0") == "1"
+SYSTEM_SAMPLER_ENABLED = os.getenv("SYSTEM_SAMPLER_ENABLED", "1") == "1"
+ENFORCEMENT_ENABLED = os.getenv("ENFORCEMENT_ENABLED", "1") == "1"
+CONNECTION_TRACKER_ENABLED = os.getenv("CONNECTION_TRACKER_ENABLED", "0") == "1"
+
+# نمونه‌بردار منابع سیستم؛ داشبورد و API از آن می‌خوانند
+system_sampler = SystemSampler()
+
+# برخورد با کاربرانی که از سقف اتصال همزمان عبور کرده‌اند
+def _on_connection_violation(user_id: int, ip_count: int, limit: int) -> None:
+    logger.warning("User %d exceeded simultaneous connections: %d IPs (limit %d)", user_id, ip_count, limit)
+    if CONNECTION_LIMIT_ACTION == "disable":
+        db = SessionLocal()
+        try:
+            deactivate_users(db, [user_id])
+        finally:
+            db.close()
+
+# ردیاب اتصال‌ها؛ تعداد کاربران آنلاین داشبورد از آن خوانده می‌شود
+connection_tracker = ConnectionTracker(on_violation=_on_connection_violation)
+
+def connection_status() -> Optional[dict]:
+    """
+    وضعیت ردیاب اتصال؛ ردیاب فقط در worker رهبر اجرا می‌شود و workerهای دیگر آخرین وضعیت
+    منتشرشده آن را می‌خوانند.
+    Returns:
+        Optional[dict]: online_users، flagged_users و records_processed، یا None اگر ردیاب
+        غیرفعال باشد یا رهبر اخیرا وضعیتی منتشر نکرده باشد.
+    """
+    if not CONNECTION_TRACKER_ENABLED:
+        return None
+    if connection_monitor is not None:
+        return connection_tracker.status()
+    return read_shared_state(CONNECTION_STATE_PATH, CONNECTION_STATE_MAX_AGE)
+
+def user_status_counts(stats: dict) -> dict:
+    """
+    ترکیب شمارنده‌های user_stats با تعداد کاربران آنلاین ردیاب اتصال.
+    Args:
+        stats (dict): خروجی get_user_stats.
+    Returns:
+        dict: total، online، offline و inactive؛ online/offline بدون وضعیت ردیاب اتصال None هستند.
+    """
+    status = connection_status()
+    online = None if status is None else status["online_users"]
+    return {
+        "total": stats["total"],
+        "online": online,
+        "offline": None if online is None else max(stats["active"] - online, 0),
+        "inactive": stats["inactive"],
+    }
+
+# سرویس‌های پس‌زمینه؛ در startup ساخته می‌شوند
+xray_compiler = None
+traffic_collector = None
+enforcement = None
+connection_monitor = None
+
+# در حالت چند worker، سرویس‌های تک‌نمونه فقط در worker رهبر اجرا می‌شوند
+leader_lock = LeaderLock()
+change_poller = None
+
+def _start_singletons() -> None:
+    global xray_compiler, traffic_collector, enforcement, connection_monitor
+    if XRAY_SYNC_ENABLED:
+        xray_compiler = XrayConfigCompiler(XrayCliApi(), SessionLocal)
+        add_user_change_listener(xray_compiler.mark_changed)
+        xray_compiler.request_full_sync()
+        logger.info("Xray user sync enabled")
+    if ENFORCEMENT_ENABLED:
+        enforcement = EnforcementScheduler(SessionLocal)
+        add_user_change_listener(enforcement.mark_changed)
+        enforcement.start()
+        logger.info("Enforcement scheduler started with %d upcoming expirations", len(enforcement))
+    if TRAFFIC_STATS_ENABLED:
+        on_flush = enforcement.check_quota if enforcement is not None else None
+        traffic_collector = TrafficCollector(XrayStatsApi(), SessionLocal, on_flush=on_flush)
+        traffic_collector.start()
+        logger.info("Traffic collector started")
+    if CONNECTION_TRACKER_ENABLED:
+        connection_monitor = ConnectionMonitor(connection_tracker, SessionLocal)
+        add_user_change_listener(connection_monitor.mark_changed)
+        connection_monitor.start()
+        logger.info("Connection tracker started on %s", connection_monitor.ingestor.path)
+
+def _try_become_leader() -> None:
+    # با مرگ worker رهبر قفل آزاد می‌شود و یکی از workerهای دیگر در tick بعدی جای آن را می‌گیرد
+    if leader_lock.held or not leader_lock.try_acquire():
+        return
+    logger.info("Worker %d is the leader; starting background singletons", os.getpid())
+    if change_poller is not None:
+        change_poller.is_leader = True
+    _start_singletons()
+
+def start_background_services() -> None:
+    global change_poller
+    if SYSTEM_SAMPLER_ENABLED:
+        system_sampler.start()
+    if INVALIDATION_ENABLED:
+        set_change_publisher(ChangeLogPublisher(engine))
+        change_poller = ChangeLogPoller(engine, on_tick=_try_become_leader)
+        change_poller.start()
+    _try_become_leader()
+
+def stop_background_services() -> None:
+    system_sampler.stop()
+    if change_poller is not None:
+        change_poller.stop()
+    if connection_monitor is not None:
+        connection_monitor.stop()
+    if traffic_collector is not None:
+        traffic_collector.stop()
+    if enforcement is not None:
+        enforcement.stop()
+    if xray_compiler is not None:
+        xray_compiler.stop()
+    leader_lock.release()
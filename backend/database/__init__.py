@@ -1,3 +1,3 @@
-from .database import Base, engine, SessionLocal, get_db
+from .database import Base, engine, SessionLocal, get_db, get_async_engine, get_async_db, dispose_async_engine
 
-__all__ = ["Base", "engine", "SessionLocal", "get_db"]
+__all__ = ["Base", "engine", "SessionLocal", "get_db", "get_async_engine", "get_async_db", "dispose_async_engine"]
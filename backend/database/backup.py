@@ -0,0 +1,304 @@
+"""
+پشتیبان‌گیری و بازیابی پایگاه داده پنل.
+
+- snapshot: کپی آنلاین فایل SQLite با backup API در گام‌های چندصفحه‌ای از یک snapshot
+  خواندنی ثابت؛ در حالت WAL نوشتن‌های زنده در طول کپی متوقف نمی‌شوند.
+- export: خروجی فشرده gzip از NDJSON به صورت استریم و تکه‌تکه (برای همه پایگاه‌های داده)؛
+  کل خروجی در یک تراکنش خواندنی ساخته می‌شود تا snapshot سازگاری از همه جداول باشد.
+- restore: بازیابی استریمی همان خروجی با INSERT گروهی در یک تراکنش.
+
+اجرا:
+    python -m backend.database.backup snapshot [--output backups/panel.db]
+    python -m backend.database.backup export [--output backups/panel.ndjson.gz]
+    python -m backend.database.backup restore backups/panel.ndjson.gz [--replace]
+
+بازیابی روی پنل در حال اجرا انجام نشود (سرویس را پیش از restore متوقف کنید).
+"""
+import argparse
+import gzip
+import logging
+import os
+import glob
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import date, datetime
+from sqlalchemy import Date, DateTime, delete, func, insert, select, text
+from backend.database.database import Base, engine
+from backend.database.migrations import current_version, migrate
+from backend.database.user_search import create_search_index, suspend_search_index
+from backend.database.user_stats import recount_user_stats
+from backend.utils.json_utils import dumps, loads
+
+logger = logging.getLogger("app_logger")
+
+# تنظیمات پشتیبان‌گیری
+BACKUP_DIR = os.getenv("BACKUP_DIR", "backups")
+BACKUP_PAGES_PER_STEP = int(os.getenv("BACKUP_PAGES_PER_STEP", "1024"))  # صفحه‌های کپی‌شده در هر گام
+BACKUP_STEP_SLEEP = float(os.getenv("BACKUP_STEP_SLEEP", "0.005"))  # مکث بین گام‌ها، به ثانیه
+BACKUP_BATCH_SIZE = int(os.getenv("BACKUP_BATCH_SIZE", "5000"))  # ردیف در هر تکه export/restore
+BACKUP_COMPRESS_LEVEL = int(os.getenv("BACKUP_COMPRESS_LEVEL", "6"))
+BACKUP_KEEP = int(os.getenv("BACKUP_KEEP", "7"))  # تعداد snapshotهای نگهداری‌شده در BACKUP_DIR؛ 0 یعنی همه
+
+# snapshotهای همزمان در یک پردازه پشت سر هم اجرا می‌شوند
+_snapshot_lock = threading.Lock()
+
+DUMP_FORMAT = "panel-dump"
+DUMP_VERSION = 1
+# جداول مشتق‌شده یا موقت در خروجی نمی‌آیند و پس از بازیابی دوباره ساخته می‌شوند
+EXCLUDED_TABLES = {"user_stats", "change_log"}
+
+def dump_tables() -> list:
+    """
+    Returns:
+        list: جداول قابل پشتیبان‌گیری به ترتیب وابستگی کلید خارجی.
+    """
+    return [table for table in Base.metadata.sorted_tables if table.name not in EXCLUDED_TABLES]
+
+def _timestamp() -> str:
+    return time.strftime("%Y%m%d-%H%M%S")
+
+def prune_snapshots(directory: str = BACKUP_DIR, keep: int = BACKUP_KEEP) -> list:
+    """
+    حذف snapshotهای قدیمی‌تر از keep نسخه آخر در پوشه پشتیبان.
+    Args:
+        directory (str): پوشه snapshotها.
+        keep (int): تعداد نسخه‌های نگهداری‌شده؛ 0 یعنی بدون حذف.
+    Returns:
+        list: مسیر فایل‌های حذف‌شده.
+    """
+    if keep <= 0:
+        return []
+    # نام فایل‌ها با زمان ساخت شروع می‌شود، پس ترتیب الفبایی همان ترتیب زمانی است
+    snapshots = sorted(glob.glob(os.path.join(directory, "panel-*.db")))
+    removed = snapshots[:-keep]
+    for path in removed:
+        os.remove(path)
+    return removed
+
+def sqlite_snapshot(output: str = None, pages: int = BACKUP_PAGES_PER_STEP,
+                    sleep: float = BACKUP_STEP_SLEEP, bind=engine) -> str:
+    """
+    کپی آنلاین پایگاه داده SQLite با backup API، هر بار pages صفحه.
+    فایل ابتدا با پسوند موقت نوشته و پس از اتمام جایگزین می‌شود تا نسخه ناقص باقی نماند.
+    بدون output، فقط BACKUP_KEEP نسخه آخر در BACKUP_DIR نگه داشته می‌شود.
+    Args:
+        output (str): مسیر فایل مقصد (پیش‌فرض: BACKUP_DIR/panel-<زمان>.db).
+        pages (int): تعداد صفحه در هر گام.
+        sleep (float): مکث بین گام‌ها برای آزاد ماندن قفل.
+        bind: موتور پایگاه داده.
+    Returns:
+        str: مسیر فایل پشتیبان.
+    """
+    if bind.dialect.name != "sqlite" or bind.url.database in (None, "", ":memory:"):
+        raise ValueError("Online snapshot is only available for file-based SQLite; use export instead")
+    with _snapshot_lock:
+        if output is not None:
+            return _write_snapshot(output, pages, sleep, bind)
+        output = _write_snapshot(os.path.join(BACKUP_DIR, f"panel-{_timestamp()}.db"), pages, sleep, bind)
+        for path in prune_snapshots(BACKUP_DIR, BACKUP_KEEP):
+            logger.info("Removed old snapshot %s", path)
+        return output
+
+def _write_snapshot(output: str, pages: int, sleep: float, bind) -> str:
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    partial = output + ".partial"
+    started = time.monotonic()
+    raw = bind.raw_connection()
+    try:
+        source = raw.driver_connection
+        # backup API با هر نوشتن اتصال دیگری از ابتدا شروع می‌شود و زیر بار نوشتن دائمی تمام نمی‌شود؛
+        # با یک تراکنش خواندنی باز، snapshot ثابت می‌ماند (در حالت WAL نویسنده‌ها منتظر نمی‌مانند)
+        source.execute("BEGIN")
+        source.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+        target = sqlite3.connect(partial)
+        try:
+            source.backup(target, pages=pages, sleep=sleep)
+        finally:
+            target.close()
+            source.execute("ROLLBACK")
+    finally:
+        raw.close()
+    os.replace(partial, output)
+    logger.info("SQLite snapshot written to %s in %.2fs", output, time.monotonic() - started)
+    return output
+
+def _dump_lines(bind, batch_size: int):
+    with bind.connect() as conn, conn.begin():
+        yield dumps({
+            "format": DUMP_FORMAT,
+            "version": DUMP_VERSION,
+            "schema_version": current_version(conn),
+            "dialect": bind.dialect.name,
+            "created_at": datetime.now().astimezone(),
+        }) + b"\n"
+        for table in dump_tables():
+            columns = [column.name for column in table.columns]
+            count = conn.execute(select(func.count()).select_from(table)).scalar_one()
+            yield dumps({"table": table.name, "columns": columns, "rows": count}) + b"\n"
+            result = conn.execution_options(yield_per=batch_size).execute(
+                select(table).order_by(*table.primary_key.columns)
+            )
+            for partition in result.partitions():
+                # هر ردیف یک آرایه JSON به ترتیب columns (فشرده‌تر و سریع‌تر از شیء)
+                yield b"".join(dumps(list(row)) + b"\n" for row in partition)
+
+def export_dump(bind=engine, batch_size: int = BACKUP_BATCH_SIZE, level: int = BACKUP_COMPRESS_LEVEL):
+    """
+    تولید خروجی gzip از NDJSON به صورت استریم؛ حافظه مصرفی به اندازه یک تکه است.
+    قالب: خط سرآیند، و برای هر جدول یک خط {"table", "columns", "rows"} و سپس ردیف‌ها.
+    Args:
+        bind: موتور پایگاه داده.
+        batch_size (int): تعداد ردیف خوانده‌شده در هر تکه.
+        level (int): سطح فشرده‌سازی gzip.
+    Returns:
+        Iterator[bytes]: تکه‌های فایل gzip.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: قالب gzip
+    for lines in _dump_lines(bind, batch_size):
+        chunk = compressor.compress(lines)
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+def export_to_file(output: str = None, bind=engine, batch_size: int = BACKUP_BATCH_SIZE) -> str:
+    """
+    نوشتن خروجی export در فایل.
+    Returns:
+        str: مسیر فایل.
+    """
+    output = output or os.path.join(BACKUP_DIR, f"panel-{_timestamp()}.ndjson.gz")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    partial = output + ".partial"
+    with open(partial, "wb") as f:
+        for chunk in export_dump(bind, batch_size):
+            f.write(chunk)
+    os.replace(partial, output)
+    return output
+
+def _decoders(table, columns: list) -> list:
+    # تاریخ‌ها به صورت رشته ISO 8601 ذخیره شده‌اند؛ بقیه انواع همان مقدار JSON هستند
+    decoders = []
+    for name in columns:
+        column = table.columns.get(name)
+        if column is None:
+            decoders.append(None)
+        elif isinstance(column.type, DateTime):
+            decoders.append(datetime.fromisoformat)
+        elif isinstance(column.type, Date):
+            decoders.append(date.fromisoformat)
+        else:
+            decoders.append(False)
+    return decoders
+
+def _decode_row(values: list, columns: list, decoders: list) -> dict:
+    row = {}
+    for name, value, decode in zip(columns, values, decoders):
+        if decode is None:
+            continue  # ستونی که در schema فعلی وجود ندارد
+        row[name] = decode(value) if decode and value is not None else value
+    return row
+
+def _reset_sequences(conn, tables: list) -> None:
+    # در PostgreSQL شمارنده کلید اصلی پس از درج با id صریح جلو برده می‌شود
+    if conn.dialect.name != "postgresql":
+        return
+    for table in tables:
+        column = table.autoincrement_column
+        if column is not None:
+            conn.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', '{column.name}'), "
+                f"COALESCE((SELECT MAX({column.name}) FROM {table.name}), 0) + 1, false)"
+            ))
+
+def restore_dump(source: str, bind=engine, batch_size: int = BACKUP_BATCH_SIZE, replace: bool = False) -> dict:
+    """
+    بازیابی خروجی export به صورت استریم با INSERT گروهی؛ کل بازیابی در یک تراکنش است و
+    در صورت خطا هیچ تغییری باقی نمی‌ماند.
+    Args:
+        source (str): مسیر فایل gzip.
+        bind: موتور پایگاه داده (schema با migrate به آخرین نسخه رسانده می‌شود).
+        batch_size (int): تعداد ردیف در هر INSERT.
+        replace (bool): حذف داده‌های فعلی جداول پیش از بازیابی؛ بدون آن جداول باید خالی باشند.
+    Returns:
+        dict: تعداد ردیف‌های بازیابی‌شده هر جدول.
+    """
+    migrate(bind)
+    tables = {table.name: table for table in dump_tables()}
+    restored = {}
+    started = time.monotonic()
+    with gzip.open(source, "rb") as f, bind.begin() as conn:
+        header = loads(f.readline() or b"{}")
+        if header.get("format") != DUMP_FORMAT or header.get("version") != DUMP_VERSION:
+            raise ValueError(f"{source} is not a {DUMP_FORMAT} v{DUMP_VERSION} file")
+        if replace:
+            for table in reversed(dump_tables()):
+                conn.execute(delete(table))
+        else:
+            for table in dump_tables():
+                if conn.execute(select(func.count()).select_from(table)).scalar_one():
+                    raise ValueError(f"Table {table.name} is not empty; pass replace=True to overwrite")
+
+        # به‌روزرسانی ردیف‌به‌ردیف ایندکس جستجو کندترین بخش درج است؛ در پایان یک‌جا ساخته می‌شود
+        search_index_suspended = suspend_search_index(conn)
+        table = columns = decoders = None
+        batch = []
+        for line in f:
+            values = loads(line)
+            if isinstance(values, dict):
+                if batch:
+                    conn.execute(insert(table), batch)
+                    batch = []
+                table = tables.get(values["table"])
+                if table is None:
+                    logger.warning("Skipping unknown table %s in backup", values["table"])
+                    continue
+                columns = values["columns"]
+                decoders = _decoders(table, columns)
+                restored[table.name] = 0
+                continue
+            if table is None:
+                continue
+            batch.append(_decode_row(values, columns, decoders))
+            restored[table.name] += 1
+            if len(batch) >= batch_size:
+                conn.execute(insert(table), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(table), batch)
+        if search_index_suspended:
+            create_search_index(conn)
+        recount_user_stats(conn)
+        _reset_sequences(conn, list(tables.values()))
+    logger.info("Restored %s from %s in %.2fs", restored, source, time.monotonic() - started)
+    return restored
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    snapshot = commands.add_parser("snapshot", help="Online copy of the SQLite database file")
+    snapshot.add_argument("--output", help="Destination file")
+    snapshot.add_argument("--pages", type=int, default=BACKUP_PAGES_PER_STEP, help="Pages copied per step")
+    export = commands.add_parser("export", help="Compressed NDJSON dump (any database)")
+    export.add_argument("--output", help="Destination file")
+    export.add_argument("--batch-size", type=int, default=BACKUP_BATCH_SIZE)
+    restore = commands.add_parser("restore", help="Load a dump produced by export")
+    restore.add_argument("source", help="Dump file (.ndjson.gz)")
+    restore.add_argument("--batch-size", type=int, default=BACKUP_BATCH_SIZE)
+    restore.add_argument("--replace", action="store_true", help="Delete existing rows before restoring")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    if args.command == "snapshot":
+        print(sqlite_snapshot(args.output, pages=args.pages))
+    elif args.command == "export":
+        print(export_to_file(args.output, batch_size=args.batch_size))
+    else:
+        restored = restore_dump(args.source, batch_size=args.batch_size, replace=args.replace)
+        for name, count in restored.items():
+            print(f"{name}: {count}")
+    print(f"done in {time.monotonic() - started:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,99 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from backend.utils.metrics_utils import registry, db_queries_total, db_query_duration_seconds
 import os
+import time
 
 # خواندن تنظیمات پایگاه داده از محیط
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./test.db")  # پیش‌فرض SQLite
 
+# تنظیمات pool اتصال (برای MariaDB/PostgreSQL؛ SQLite از pool پیش‌فرض خودش استفاده می‌کند)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # به ثانیه
+DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))  # به ثانیه
+
+# حالت WAL در SQLite تا خواندن workerها با نوشتن یک worker مسدود نشود
+SQLITE_WAL = os.getenv("SQLITE_WAL", "1") == "1"
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # به میلی‌ثانیه
+
+# درایورهای async متناظر با هر backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "mysql": "mysql+asyncmy",
+    "mariadb": "mariadb+asyncmy",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    """
+    تبدیل آدرس پایگاه داده sync به آدرس معادل با درایور async.
+    Args:
+        url (str): آدرس پایگاه داده، مثلا sqlite:///./test.db یا mysql+pymysql://...
+    Returns:
+        str: آدرس با درایور async، مثلا sqlite+aiosqlite:///./test.db
+    """
+    scheme, separator, rest = url.partition("://")
+    backend = scheme.split("+", 1)[0]
+    return f"{ASYNC_DRIVERS.get(backend, scheme)}{separator}{rest}"
+
+def engine_options(url: str) -> dict:
+    """
+    تنظیمات مشترک ساخت موتور برای حالت sync و async.
+    Args:
+        url (str): آدرس پایگاه داده.
+    Returns:
+        dict: آرگومان‌های create_engine.
+    """
+    if url.startswith("sqlite"):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_pre_ping": True,
+    }
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+# نوع دستورهایی که در متریک‌ها جدا شمرده می‌شوند
+_SQL_OPERATIONS = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "PRAGMA", "CREATE", "ALTER"}
+
+def instrument_engine(sync_engine, label: str) -> None:
+    """
+    ثبت تعداد و مدت اجرای دستورهای SQL یک موتور در متریک‌ها.
+    Args:
+        sync_engine: موتور sync (برای موتور async، مقدار sync_engine آن).
+        label (str): برچسب موتور در متریک‌ها.
+    """
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_start
+        operation = statement[:8].lstrip().split(" ", 1)[0].upper()
+        if operation not in _SQL_OPERATIONS:
+            operation = "OTHER"
+        db_queries_total.inc(label, operation)
+        db_query_duration_seconds.observe(elapsed, label, operation)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT}")
+    if SQLITE_WAL:
+        cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.close()
+
 # ایجاد موتور اتصال به پایگاه داده
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+instrument_engine(engine, "sync")
+if DATABASE_URL.startswith("sqlite"):
+    event.listen(engine, "connect", _set_sqlite_pragmas)
 
 # ایجاد SessionLocal
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -22,3 +108,50 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# موتور async به صورت تنبل ساخته می‌شود تا درایور async فقط در صورت استفاده لازم باشد
+_async_engine = None
+_AsyncSessionLocal = None
+
+def get_async_engine():
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        _async_engine = create_async_engine(ASYNC_DATABASE_URL, **engine_options(ASYNC_DATABASE_URL))
+        instrument_engine(_async_engine.sync_engine, "async")
+        if ASYNC_DATABASE_URL.startswith("sqlite"):
+            event.listen(_async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+        _AsyncSessionLocal = async_sessionmaker(bind=_async_engine, autoflush=False, expire_on_commit=False)
+    return _async_engine
+
+# Dependency async برای روترهایی که به صورت async def نوشته شده‌اند
+async def get_async_db():
+    get_async_engine()
+    async with _AsyncSessionLocal() as db:
+        yield db
+
+async def dispose_async_engine() -> None:
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
+
+# وضعیت pool اتصال‌ها؛ فقط هنگام خواندن /metrics محاسبه می‌شود
+def _pool_samples(method: str):
+    def samples():
+        engines = [("sync", engine)]
+        if _async_engine is not None:
+            engines.append(("async", _async_engine.sync_engine))
+        result = []
+        for label, current in engines:
+            reader = getattr(current.pool, method, None)
+            if reader is not None:
+                # overflow() در SQLAlchemy تا پر شدن pool منفی است
+                result.append(((label,), max(reader(), 0)))
+        return result
+    return samples
+
+registry.callback_gauge("db_pool_checked_out", "Connections currently checked out.", _pool_samples("checkedout"), ("engine",))
+registry.callback_gauge("db_pool_overflow", "Connections open beyond pool_size.", _pool_samples("overflow"), ("engine",))
+registry.callback_gauge("db_pool_size", "Configured pool size.", _pool_samples("size"), ("engine",))
@@ -0,0 +1,120 @@
+from itertools import chain
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from backend.models import User, Domain
+from backend.database.user_stats import adjust_user_stats
+from backend.utils.time_utils import compute_expires_at
+
+# کلید نگهداری تغییرات کاربران در session.info تا زمان commit
+_CHANGED_USERS_KEY = "changed_users"
+
+# پرچم تغییر دامنه‌ها در session.info تا زمان commit
+_CHANGED_DOMAINS_KEY = "changed_domains"
+
+# توابعی که پس از commit تغییرات کاربران فراخوانی می‌شوند
+_user_change_listeners = []
+
+# توابعی که پس از commit تغییر دامنه‌ها فراخوانی می‌شوند
+_domain_change_listeners = []
+
+# انتشاردهنده تغییرات برای سایر workerها (فقط تغییرات همین پردازه منتشر می‌شوند)
+_change_publisher = None
+
+def set_change_publisher(publisher) -> None:
+    """
+    تنظیم شیئی با متدهای publish_users(changes) و publish_domains() که پس از commit فراخوانی می‌شود.
+    """
+    global _change_publisher
+    _change_publisher = publisher
+
+def add_user_change_listener(callback) -> None:
+    """
+    ثبت تابعی که پس از commit شدن تغییر کاربران فراخوانی می‌شود.
+    Args:
+        callback: تابعی با ورودی set از (id, uuid) کاربران تغییرکرده.
+    """
+    _user_change_listeners.append(callback)
+
+def mark_users_changed(session: Session, changes) -> None:
+    """
+    ثبت دستی تغییر کاربران برای عملیاتی که از flush عبور نمی‌کنند (INSERT/UPDATE گروهی).
+    Args:
+        session (Session): سشن جاری.
+        changes: مجموعه‌ای از (id, uuid).
+    """
+    session.info.setdefault(_CHANGED_USERS_KEY, set()).update(changes)
+
+def notify_user_changes(changes) -> None:
+    for callback in _user_change_listeners:
+        callback(changes)
+
+def add_domain_change_listener(callback) -> None:
+    """
+    ثبت تابعی (بدون ورودی) که پس از commit شدن افزودن/ویرایش/حذف دامنه فراخوانی می‌شود.
+    """
+    _domain_change_listeners.append(callback)
+
+def notify_domain_changes() -> None:
+    for callback in _domain_change_listeners:
+        callback()
+
+@event.listens_for(Session, "after_flush")
+def _collect_user_changes(session, flush_context):
+    # در after_flush لیست‌های new/dirty/deleted هنوز وضعیت پیش از flush را دارند و id تخصیص یافته است
+    changes = {
+        (obj.id, obj.uuid)
+        for obj in chain(session.new, session.dirty, session.deleted)
+        if isinstance(obj, User)
+    }
+    if changes:
+        mark_users_changed(session, changes)
+        _update_user_stats(session)
+    if any(isinstance(obj, Domain) for obj in chain(session.new, session.dirty, session.deleted)):
+        session.info[_CHANGED_DOMAINS_KEY] = True
+
+def _update_user_stats(session) -> None:
+    # شمارنده‌های وضعیت در همان تراکنش flush به‌روز می‌شوند تا با جدول users همخوان بمانند
+    total = active = 0
+    for obj in session.new:
+        if isinstance(obj, User):
+            total += 1
+            active += obj.is_active is not False
+    for obj in session.deleted:
+        if isinstance(obj, User):
+            total -= 1
+            active -= obj.is_active is not False
+    for obj in session.dirty:
+        if isinstance(obj, User) and obj not in session.deleted:
+            history = inspect(obj).attrs.is_active.history
+            if history.deleted and bool(history.deleted[0]) != bool(obj.is_active):
+                active += 1 if obj.is_active else -1
+    adjust_user_stats(session.connection(), total=total, active=active, inactive=total - active)
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_user_changes(session):
+    changes = session.info.pop(_CHANGED_USERS_KEY, None)
+    if changes:
+        notify_user_changes(changes)
+    domains_changed = session.info.pop(_CHANGED_DOMAINS_KEY, False)
+    if domains_changed:
+        notify_domain_changes()
+    if _change_publisher is not None:
+        if changes:
+            _change_publisher.publish_users(changes)
+        if domains_changed:
+            _change_publisher.publish_domains()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_user_changes(session):
+    session.info.pop(_CHANGED_USERS_KEY, None)
+    session.info.pop(_CHANGED_DOMAINS_KEY, None)
+
+# نگهداری زمان انقضای محاسبه‌شده کاربر همراه با usage_duration
+@event.listens_for(User, "before_insert")
+def _set_expires_at_on_insert(mapper, connection, target):
+    target.expires_at = compute_expires_at(target.created_at, target.usage_duration or 0)
+
+@event.listens_for(User, "before_update")
+def _set_expires_at_on_update(mapper, connection, target):
+    if inspect(target).attrs.usage_duration.history.has_changes():
+        target.expires_at = compute_expires_at(target.created_at, target.usage_duration or 0)
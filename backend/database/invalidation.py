@@ -0,0 +1,159 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, func, insert, or_, select
+from backend.models import ChangeEvent
+from backend.database.events import notify_user_changes, notify_domain_changes
+
+logger = logging.getLogger("app_logger")
+
+# تعداد workerهای پنل؛ کانال هماهنگ‌سازی فقط در حالت چند worker لازم است
+PANEL_WORKERS = int(os.getenv("PANEL_WORKERS", "1"))
+INVALIDATION_ENABLED = os.getenv("INVALIDATION_ENABLED", "1" if PANEL_WORKERS > 1 else "0") == "1"
+INVALIDATION_POLL_INTERVAL = float(os.getenv("INVALIDATION_POLL_INTERVAL", "1"))  # به ثانیه
+INVALIDATION_RETENTION = float(os.getenv("INVALIDATION_RETENTION", "3600"))  # به ثانیه
+# فاصله پاک‌سازی رویدادهای قدیمی (فقط توسط worker رهبر)
+INVALIDATION_PRUNE_INTERVAL = float(os.getenv("INVALIDATION_PRUNE_INTERVAL", "60"))
+# مدت انتظار برای idهای جاافتاده (تراکنش‌هایی که id کوچک‌تر گرفته‌اند ولی دیرتر commit می‌شوند)، به ثانیه
+INVALIDATION_GAP_TIMEOUT = float(os.getenv("INVALIDATION_GAP_TIMEOUT", "30"))
+INVALIDATION_MAX_GAPS = int(os.getenv("INVALIDATION_MAX_GAPS", "10000"))
+
+class ChangeLogPublisher:
+    """
+    نوشتن تغییرات commit‌شده این پردازه در جدول change_log تا workerهای دیگر کش‌هایشان را invalidate کنند.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def _publish(self, rows: list) -> None:
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(insert(ChangeEvent), rows)
+        except Exception:
+            # داده اصلی commit شده است؛ در بدترین حالت کش سایر workerها تا TTL کهنه می‌ماند
+            logger.exception("Failed to publish change events")
+
+    def publish_users(self, changes) -> None:
+        origin = os.getpid()
+        self._publish([
+            {"kind": "user", "user_id": user_id, "user_uuid": user_uuid, "origin": origin}
+            for user_id, user_uuid in changes
+        ])
+
+    def publish_domains(self) -> None:
+        self._publish([{"kind": "domain", "origin": os.getpid()}])
+
+class ChangeLogPoller:
+    """
+    خواندن دوره‌ای رویدادهای جدید change_log که پردازه‌های دیگر نوشته‌اند و ارسال آن‌ها
+    به listenerهای همین پردازه (کش‌ها و در worker رهبر، سرویس‌های پس‌زمینه).
+    در MariaDB و PostgreSQL ترتیب commit با ترتیب id یکی نیست، پس idهای جاافتاده بین رویدادهای
+    خوانده‌شده تا gap_timeout ثانیه در هر poll دوباره خوانده می‌شوند.
+    """
+
+    def __init__(self, engine, interval: float = INVALIDATION_POLL_INTERVAL,
+                 retention: float = INVALIDATION_RETENTION, on_tick=None,
+                 gap_timeout: float = INVALIDATION_GAP_TIMEOUT, max_gaps: int = INVALIDATION_MAX_GAPS):
+        self.engine = engine
+        self.interval = interval
+        self.retention = retention
+        self.on_tick = on_tick
+        self.gap_timeout = gap_timeout
+        self.max_gaps = max_gaps
+        self.is_leader = False
+        self.last_id = 0
+        self.events_applied = 0
+        self.late_events = 0
+        self._gaps = {}  # id جاافتاده به مهلت انتظار (monotonic)، به ترتیب درج
+        self._stop = threading.Event()
+        self._thread = None
+        self._next_prune = 0.0
+
+    def _latest_id(self) -> int:
+        with self.engine.connect() as conn:
+            return conn.execute(select(func.max(ChangeEvent.id))).scalar() or 0
+
+    def poll(self, now: float = None) -> int:
+        """
+        اعمال رویدادهای جدید و رویدادهایی که با id کوچک‌تر دیرتر commit شده‌اند.
+        Args:
+            now (float): (اختیاری) زمان monotonic فعلی.
+        Returns:
+            int: تعداد رویدادهای اعمال‌شده.
+        """
+        now = time.monotonic() if now is None else now
+        gaps = self._gaps
+        for gap_id in [gap_id for gap_id, deadline in gaps.items() if deadline < now]:
+            del gaps[gap_id]
+        condition = ChangeEvent.id > self.last_id
+        if gaps:
+            condition = or_(condition, ChangeEvent.id.in_(list(gaps)))
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                select(ChangeEvent.id, ChangeEvent.kind, ChangeEvent.user_id, ChangeEvent.user_uuid, ChangeEvent.origin)
+                .where(condition)
+                .order_by(ChangeEvent.id)
+            ).all()
+        if not rows:
+            return 0
+        self._track_gaps(rows, now)
+        origin = os.getpid()
+        remote = [row for row in rows if row.origin != origin]
+        users = {(row.user_id, row.user_uuid) for row in remote if row.kind == "user"}
+        if users:
+            notify_user_changes(users)
+        if any(row.kind == "domain" for row in remote):
+            notify_domain_changes()
+        self.events_applied += len(remote)
+        return len(remote)
+
+    def _track_gaps(self, rows, now: float) -> None:
+        # idهای بین last_id قبلی و بزرگ‌ترین id خوانده‌شده که هنوز دیده نشده‌اند جاافتاده‌اند
+        gaps = self._gaps
+        expected = self.last_id + 1
+        deadline = now + self.gap_timeout
+        for row in rows:
+            if row.id <= self.last_id:
+                gaps.pop(row.id, None)
+                self.late_events += 1
+                continue
+            for gap_id in range(max(expected, row.id - self.max_gaps), row.id):
+                gaps[gap_id] = deadline
+            expected = row.id + 1
+        self.last_id = max(self.last_id, rows[-1].id)
+        while len(gaps) > self.max_gaps:
+            del gaps[next(iter(gaps))]
+
+    def prune(self) -> None:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.retention)
+        with self.engine.begin() as conn:
+            conn.execute(delete(ChangeEvent).where(ChangeEvent.created_at < cutoff))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+                if self.on_tick is not None:
+                    self.on_tick()
+                if self.is_leader and time.monotonic() >= self._next_prune:
+                    self._next_prune = time.monotonic() + INVALIDATION_PRUNE_INTERVAL
+                    self.prune()
+            except Exception:
+                logger.exception("Change log poll failed")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self.last_id = self._latest_id()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="change-log-poller", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,137 @@
+"""
+اجرای مهاجرت‌های نسخه‌دار schema پایگاه داده.
+
+هر مهاجرت یک شماره نسخه دارد و در جدول schema_version ثبت می‌شود؛ اگر schema به‌روز باشد
+اجرا فقط یک کوئری هزینه دارد. مهاجرت‌ها باید idempotent باشند، چون نسخه 1 روی پایگاه داده
+جدید همه جداول مدل‌های فعلی را می‌سازد.
+
+اجرا (مرحله استقرار):
+    python -m backend.database.migrations
+    python -m backend.database.migrations --status
+"""
+import argparse
+import logging
+import os
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, inspect, insert, select, text, update
+from backend.database.database import Base, engine
+from backend.models import User
+from backend.database.user_stats import recount_user_stats
+from backend.database.user_search import create_search_index
+from backend.utils.process_utils import PANEL_LEADER_LOCK, file_lock
+from backend.utils.time_utils import compute_expires_at
+
+logger = logging.getLogger("app_logger")
+
+# اجرای خودکار مهاجرت‌ها در startup (در استقرار با install.py غیرفعال است)
+AUTO_MIGRATE = os.getenv("AUTO_MIGRATE", "1") == "1"
+MIGRATION_LOCK = os.getenv("MIGRATION_LOCK", PANEL_LEADER_LOCK + ".migrate")
+BACKFILL_BATCH_SIZE = 1000
+
+# جدول نسخه schema جدا از metadata مدل‌ها تا create_all آن را مدیریت نکند
+_version_metadata = MetaData()
+schema_version = Table(
+    "schema_version",
+    _version_metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String(255), nullable=False),
+    Column("applied_at", DateTime(timezone=True), server_default=func.now()),
+)
+
+def _create_tables(conn) -> None:
+    Base.metadata.create_all(bind=conn)
+
+def _add_users_expires_at(conn) -> None:
+    # پایگاه‌های داده قدیمی‌تر از محاسبه expires_at این ستون را ندارند
+    columns = {column["name"] for column in inspect(conn).get_columns("users")}
+    if "expires_at" not in columns:
+        column_type = User.__table__.c.expires_at.type.compile(dialect=conn.dialect)
+        conn.execute(text(f"ALTER TABLE users ADD COLUMN expires_at {column_type}"))
+    for index in User.__table__.indexes:
+        if "expires_at" in index.columns:
+            index.create(conn, checkfirst=True)
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            select(User.id, User.created_at, User.usage_duration)
+            .where(User.id > last_id, User.expires_at.is_(None), User.usage_duration > 0)
+            .order_by(User.id)
+            .limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        for row in rows:
+            conn.execute(
+                update(User).where(User.id == row.id)
+                .values(expires_at=compute_expires_at(row.created_at, row.usage_duration))
+            )
+        last_id = rows[-1].id
+
+def _add_user_stats(conn) -> None:
+    Base.metadata.tables["user_stats"].create(conn, checkfirst=True)
+    for index in User.__table__.indexes:
+        if len(index.columns) > 1:
+            index.create(conn, checkfirst=True)
+    recount_user_stats(conn)
+
+def _add_username_search_index(conn) -> None:
+    # در پایگاه‌هایی که trigram ندارند جستجوی زیررشته به LIKE برمی‌گردد
+    create_search_index(conn)
+
+# (نسخه، توضیح، تابع) به ترتیب صعودی؛ نسخه‌های ثبت‌شده هرگز تغییر نمی‌کنند
+MIGRATIONS = [
+    (1, "create tables", _create_tables),
+    (2, "users.expires_at column, index and backfill", _add_users_expires_at),
+    (3, "user_stats counters and composite status indexes", _add_user_stats),
+    (4, "username trigram search index", _add_username_search_index),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def current_version(conn) -> int:
+    """
+    Returns:
+        int: آخرین نسخه اعمال‌شده (0 برای پایگاه داده بدون جدول schema_version).
+    """
+    if not inspect(conn).has_table("schema_version"):
+        return 0
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+def migrate(bind=engine) -> list:
+    """
+    اعمال مهاجرت‌های باقی‌مانده، هر کدام در تراکنش جداگانه.
+    Args:
+        bind: موتور پایگاه داده.
+    Returns:
+        list: شماره نسخه‌های اعمال‌شده در این اجرا.
+    """
+    with bind.connect() as conn:
+        if current_version(conn) >= LATEST_VERSION:
+            return []
+    applied = []
+    # چند worker ممکن است همزمان شروع شوند؛ فقط یکی مهاجرت را اجرا می‌کند و بقیه منتظر می‌مانند
+    with file_lock(MIGRATION_LOCK):
+        with bind.begin() as conn:
+            _version_metadata.create_all(bind=conn)
+            version = current_version(conn)
+        for number, description, apply in MIGRATIONS:
+            if number <= version:
+                continue
+            with bind.begin() as conn:
+                apply(conn)
+                conn.execute(insert(schema_version).values(version=number, description=description))
+            logger.info("Applied migration %d: %s", number, description)
+            applied.append(number)
+    return applied
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="Print the current and latest schema versions")
+    args = parser.parse_args()
+    if args.status:
+        with engine.connect() as conn:
+            print(f"current: {current_version(conn)}  latest: {LATEST_VERSION}")
+        return
+    applied = migrate(engine)
+    print(f"applied: {', '.join(map(str, applied))}" if applied else f"schema is up to date (version {LATEST_VERSION})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import logging
+import os
+import threading
+import time
+from backend.models import Domain
+from backend.database.database import SessionLocal
+from backend.database.events import add_user_change_listener, add_domain_change_listener
+from backend.utils.cache_utils import TTLCache, MISSING
+from backend.utils.subscription_utils import SubscriptionBundle, build_bundle, render_links
+from backend.utils.xray_utils import XRAY_CONFIG_PATH, load_xray_config, managed_inbounds
+
+logger = logging.getLogger("app_logger")
+
+# تنظیمات کش بسته‌های اشتراک
+SUBSCRIPTION_CACHE_SIZE = int(os.getenv("SUBSCRIPTION_CACHE_SIZE", "50000"))
+SUBSCRIPTION_CACHE_TTL = float(os.getenv("SUBSCRIPTION_CACHE_TTL", "3600"))
+# فاصله بررسی تغییر فایل کانفیگ Xray (ثانیه)
+SUBSCRIPTION_CONFIG_CHECK_INTERVAL = float(os.getenv("SUBSCRIPTION_CONFIG_CHECK_INTERVAL", "5"))
+# آدرس پیش‌فرض سرور وقتی هیچ دامنه‌ای ثبت نشده است
+SUBSCRIPTION_DEFAULT_HOST = os.getenv("SERVER_IP", "127.0.0.1")
+
+class SubscriptionTopology:
+    """
+    نسخه فعلی inboundهای Xray و دامنه‌ها که همه بسته‌های اشتراک از آن ساخته می‌شوند.
+    با تغییر mtime فایل کانفیگ یا commit تغییر دامنه‌ها، generation افزایش می‌یابد و
+    بسته‌های ساخته‌شده با generation قدیمی در اولین درخواست دوباره ساخته می‌شوند.
+    """
+
+    def __init__(self, config_path: str = XRAY_CONFIG_PATH, session_factory=SessionLocal,
+                 check_interval: float = SUBSCRIPTION_CONFIG_CHECK_INTERVAL):
+        self.config_path = config_path
+        self.session_factory = session_factory
+        self.check_interval = check_interval
+        self.generation = 0
+        self.inbounds = []
+        self.hosts = [SUBSCRIPTION_DEFAULT_HOST]
+        self._lock = threading.Lock()
+        self._dirty = True
+        self._config_mtime = None
+        self._next_check = 0.0
+
+    def invalidate(self) -> None:
+        self._dirty = True
+
+    def _read_config_mtime(self):
+        try:
+            return os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def needs_reload(self) -> bool:
+        """
+        بررسی ارزان (حداکثر هر check_interval ثانیه یک stat) برای نیاز به بارگذاری مجدد.
+        """
+        if self._dirty:
+            return True
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+        if self._read_config_mtime() != self._config_mtime:
+            self._dirty = True
+        return self._dirty
+
+    def reload(self) -> None:
+        """
+        بارگذاری inboundها از کانفیگ و دامنه‌ها از پایگاه داده (کار blocking؛ خارج از event loop اجرا شود).
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+            mtime = self._read_config_mtime()
+            try:
+                inbounds = managed_inbounds(load_xray_config(self.config_path))
+            except (OSError, ValueError) as e:
+                logger.warning("Subscription topology: cannot read Xray config %s: %s", self.config_path, e)
+                inbounds = []
+            db = self.session_factory()
+            try:
+                hosts = [name for (name,) in db.query(Domain.name).order_by(Domain.id)]
+            finally:
+                db.close()
+            self.inbounds = inbounds
+            self.hosts = hosts or [SUBSCRIPTION_DEFAULT_HOST]
+            self._config_mtime = mtime
+            self.generation += 1
+
+subscription_topology = SubscriptionTopology()
+
+bundle_cache = TTLCache(maxsize=SUBSCRIPTION_CACHE_SIZE, ttl=SUBSCRIPTION_CACHE_TTL, name="subscription_bundles")
+
+def get_subscription_bundle(user: dict) -> SubscriptionBundle:
+    """
+    دریافت بسته اشتراک کاربر؛ فقط در صورت تغییر کاربر یا inbound/دامنه‌ها دوباره ساخته می‌شود.
+    Args:
+        user (dict): snapshot کاربر.
+    Returns:
+        SubscriptionBundle: ETag و بدنه base64.
+    """
+    topology = subscription_topology
+    generation = topology.generation
+    version = (generation, user["username"])
+    cached = bundle_cache.get(user["uuid"])
+    if cached is not MISSING and cached[0] == version:
+        return cached[1]
+    cache_generation = bundle_cache.generation
+    bundle = build_bundle(render_links(topology.inbounds, topology.hosts, user))
+    bundle_cache.set(user["uuid"], (version, bundle), generation=cache_generation)
+    return bundle
+
+def _invalidate_bundles(changes) -> None:
+    bundle_cache.invalidate_many(user_uuid for _, user_uuid in changes)
+
+add_user_change_listener(_invalidate_bundles)
+add_domain_change_listener(subscription_topology.invalidate)
@@ -0,0 +1,84 @@
+import os
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.models import User, UserUsage
+from backend.database.events import add_user_change_listener
+from backend.utils.cache_utils import TTLCache, MISSING
+
+# تنظیمات کش کاربران بر اساس UUID
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "50000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+# UUIDهای ناموجود در کش جداگانه، کوچک و کوتاه‌عمر نگه داشته می‌شوند تا درخواست‌های UUID تصادفی
+# (مسیر اشتراک بدون احراز هویت است) کاربران واقعی را از user_cache بیرون نکنند
+USER_NEGATIVE_CACHE_SIZE = int(os.getenv("USER_NEGATIVE_CACHE_SIZE", "4096"))
+USER_NEGATIVE_CACHE_TTL = float(os.getenv("USER_NEGATIVE_CACHE_TTL", "30"))
+
+# مصرف ترافیک رویداد تغییر کاربر تولید نمی‌کند، پس جدا و با عمر کوتاه (هم‌اندازه فاصله flush ترافیک) کش می‌شود
+USAGE_CACHE_TTL = float(os.getenv("USAGE_CACHE_TTL", os.getenv("TRAFFIC_FLUSH_INTERVAL", "30")))
+
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL, name="users_by_uuid")
+unknown_uuid_cache = TTLCache(maxsize=USER_NEGATIVE_CACHE_SIZE, ttl=USER_NEGATIVE_CACHE_TTL, name="unknown_user_uuids")
+usage_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USAGE_CACHE_TTL, name="user_usage")
+
+# ستون‌هایی که endpointهای اشتراک به آن نیاز دارند
+_SNAPSHOT_COLUMNS = (
+    User.id,
+    User.username,
+    User.uuid,
+    User.traffic_limit,
+    User.usage_duration,
+    User.simultaneous_connections,
+    User.is_active,
+    User.expires_at,
+)
+
+async def get_user_snapshot(db: AsyncSession, user_uuid: str) -> Optional[dict]:
+    """
+    دریافت اطلاعات کاربر بر اساس UUID از کش، و در صورت نبودن از پایگاه داده.
+    UUIDهای ناموجود در unknown_uuid_cache کش می‌شوند و با ایجاد کاربر invalidate می‌شوند.
+    Args:
+        db (AsyncSession): سشن async پایگاه داده.
+        user_uuid (str): UUID کاربر.
+    Returns:
+        Optional[dict]: اطلاعات کاربر یا None.
+    """
+    snapshot = user_cache.get(user_uuid)
+    if snapshot is not MISSING:
+        return snapshot
+    if unknown_uuid_cache.get(user_uuid) is not MISSING:
+        return None
+    generation = user_cache.generation
+    unknown_generation = unknown_uuid_cache.generation
+    row = (await db.execute(select(*_SNAPSHOT_COLUMNS).where(User.uuid == user_uuid))).first()
+    if row is None:
+        unknown_uuid_cache.set(user_uuid, None, generation=unknown_generation)
+        return None
+    snapshot = dict(row._mapping)
+    user_cache.set(user_uuid, snapshot, generation=generation)
+    return snapshot
+
+async def get_user_usage(db: AsyncSession, user_id: int) -> tuple:
+    """
+    دریافت مصرف ترافیک کاربر از کش کوتاه‌مدت، و در صورت نبودن از جدول user_usage.
+    Args:
+        db (AsyncSession): سشن async پایگاه داده.
+        user_id (int): شناسه کاربر.
+    Returns:
+        tuple: (uplink، downlink) به بایت؛ کاربر بدون ترافیک (0، 0).
+    """
+    usage = usage_cache.get(user_id)
+    if usage is MISSING:
+        row = (await db.execute(
+            select(UserUsage.uplink, UserUsage.downlink).where(UserUsage.user_id == user_id)
+        )).first()
+        usage = (row.uplink, row.downlink) if row else (0, 0)
+        usage_cache.set(user_id, usage)
+    return usage
+
+def _invalidate_users(changes) -> None:
+    uuids = [user_uuid for _, user_uuid in changes]
+    user_cache.invalidate_many(uuids)
+    unknown_uuid_cache.invalidate_many(uuids)
+
+add_user_change_listener(_invalidate_users)
@@ -0,0 +1,118 @@
+import math
+import os
+from datetime import datetime, timezone
+from typing import Optional
+from markupsafe import Markup
+from backend.models import User, UserUsage
+from backend.database.database import SessionLocal
+from backend.database.events import add_user_change_listener
+from backend.utils.cache_utils import TTLCache, MISSING
+from backend.utils.template_utils import templates
+from backend.utils.time_utils import as_utc
+
+# تنظیمات صفحه کاربران: اندازه صفحه و تعداد ردیف خوانده‌شده در هر رفت‌وبرگشت پایگاه داده
+USERS_PAGE_SIZE = int(os.getenv("USERS_PAGE_SIZE", "100"))
+USERS_PAGE_SIZE_MAX = int(os.getenv("USERS_PAGE_SIZE_MAX", "50000"))
+USERS_PAGE_CHUNK_SIZE = int(os.getenv("USERS_PAGE_CHUNK_SIZE", "500"))
+# کش HTML ردیف‌های جدول کاربران
+USER_ROW_CACHE_SIZE = int(os.getenv("USER_ROW_CACHE_SIZE", "50000"))
+USER_ROW_CACHE_TTL = float(os.getenv("USER_ROW_CACHE_TTL", "3600"))
+
+row_cache = TTLCache(maxsize=USER_ROW_CACHE_SIZE, ttl=USER_ROW_CACHE_TTL, name="user_rows")
+
+_ROW_COLUMNS = (
+    User.id,
+    User.username,
+    User.is_active,
+    User.traffic_limit,
+    User.expires_at,
+    UserUsage.uplink,
+    UserUsage.downlink,
+)
+
+class UsersPage:
+    """
+    وضعیت صفحه‌بندی صفحه کاربران؛ next_cursor پس از پیمایش کامل ردیف‌ها مقدار می‌گیرد،
+    پس تمپلت باید آن را بعد از حلقه ردیف‌ها بخواند.
+    """
+
+    def __init__(self, after: Optional[int], page_size: int):
+        self.after = after
+        self.page_size = page_size
+        self.next_cursor = None
+
+def _row_values(row, now: datetime) -> dict:
+    days_left = None
+    if row.expires_at is not None:
+        days_left = max(0, math.ceil((as_utc(row.expires_at) - now).total_seconds() / 86400))
+    usage_percent = 0
+    if row.traffic_limit:
+        used = (row.uplink or 0) + (row.downlink or 0)
+        usage_percent = min(100, int(used * 100 / (row.traffic_limit * 1048576)))
+    return {
+        "id": row.id,
+        "username": row.username,
+        "is_active": row.is_active,
+        "days_left": days_left,
+        "usage_percent": usage_percent,
+    }
+
+def render_user_row(user: dict, generation: int = None) -> Markup:
+    """
+    HTML یک ردیف جدول کاربران از کش، و در صورت تغییر مقادیر نمایشی رندر مجدد آن.
+    Args:
+        user (dict): مقادیر نمایشی ردیف (خروجی _row_values).
+        generation (int): generation کش پیش از خواندن ردیف از پایگاه داده.
+    Returns:
+        Markup: HTML ردیف.
+    """
+    # مصرف ترافیک و روزهای باقی‌مانده بدون رویداد تغییر کاربر عوض می‌شوند، پس بخشی از کلید نسخه‌اند
+    version = tuple(user.values())
+    cached = row_cache.get(user["id"])
+    if cached is not MISSING and cached[0] == version:
+        return cached[1]
+    html = Markup(templates.env.get_template("user_row.html").render(user=user))
+    row_cache.set(user["id"], (version, html), generation=generation)
+    return html
+
+def iter_user_rows(page: UsersPage, chunk_size: int = USERS_PAGE_CHUNK_SIZE):
+    """
+    تولید ردیف‌های HTML یک صفحه به صورت تکه‌تکه (keyset روی User.id)؛ در هر لحظه فقط
+    یک تکه در حافظه است و اتصال پایگاه داده بین تکه‌ها آزاد می‌شود.
+    Args:
+        page (UsersPage): وضعیت صفحه‌بندی؛ next_cursor در پایان تنظیم می‌شود.
+        chunk_size (int): تعداد ردیف در هر کوئری.
+    """
+    db = SessionLocal()
+    try:
+        last_id = page.after or 0
+        remaining = page.page_size
+        while remaining > 0:
+            generation = row_cache.generation
+            # یک ردیف اضافه در آخرین تکه برای تشخیص وجود صفحه بعد
+            limit = min(chunk_size, remaining)
+            rows = (
+                db.query(*_ROW_COLUMNS)
+                .outerjoin(UserUsage, UserUsage.user_id == User.id)
+                .filter(User.id > last_id)
+                .order_by(User.id)
+                .limit(limit + 1 if limit == remaining else limit)
+                .all()
+            )
+            db.close()
+            now = datetime.now(timezone.utc)
+            for row in rows[:limit]:
+                yield render_user_row(_row_values(row, now), generation)
+            if len(rows) < limit:
+                break
+            last_id = rows[limit - 1].id
+            remaining -= limit
+            if remaining == 0 and len(rows) > limit:
+                page.next_cursor = last_id
+    finally:
+        db.close()
+
+def _invalidate_rows(changes) -> None:
+    row_cache.invalidate_many(user_id for user_id, _ in changes)
+
+add_user_change_listener(_invalidate_rows)
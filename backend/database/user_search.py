@@ -0,0 +1,155 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import exists, inspect, literal_column, select, text
+from sqlalchemy.exc import DBAPIError
+from backend.models import User, UserUsage
+
+logger = logging.getLogger("app_logger")
+
+# جدول FTS5 با توکنایزر trigram برای جستجوی زیررشته در SQLite (همگام با users از طریق trigger)
+_SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+    "username, content='users', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_fts(rowid, username) VALUES (new.id, new.username); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, username) VALUES ('delete', old.id, old.username); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF username ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, username) VALUES ('delete', old.id, old.username); "
+    "INSERT INTO users_fts(rowid, username) VALUES (new.id, new.username); END",
+    "INSERT INTO users_fts(users_fts) VALUES ('rebuild')",
+)
+
+_POSTGRES_TRGM_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_username_trgm ON users USING gin (username gin_trgm_ops)",
+)
+
+# حداقل طول عبارت برای استفاده از ایندکس trigram
+TRIGRAM_MIN_LENGTH = 3
+
+def create_search_index(conn) -> bool:
+    """
+    ساخت ایندکس جستجوی زیررشته نام کاربری در پایگاه‌هایی که پشتیبانی می‌کنند.
+    Args:
+        conn: اتصال تراکنش مهاجرت.
+    Returns:
+        bool: آیا ایندکس ساخته شد (MySQL/MariaDB یا SQLite بدون trigram: خیر).
+    """
+    dialect = conn.dialect.name
+    statements = {"sqlite": _SQLITE_FTS_DDL, "postgresql": _POSTGRES_TRGM_DDL}.get(dialect)
+    if statements is None:
+        return False
+    savepoint = conn.begin_nested()
+    try:
+        for statement in statements:
+            conn.execute(text(statement))
+    except DBAPIError as e:
+        savepoint.rollback()
+        logger.warning("Username trigram index not available on %s: %s", dialect, e)
+        return False
+    savepoint.commit()
+    return True
+
+def suspend_search_index(conn) -> bool:
+    """
+    حذف موقت triggerهای همگام‌سازی FTS پیش از درج گروهی بزرگ (مانند بازیابی پشتیبان)؛
+    پس از درج، create_search_index آن‌ها را دوباره می‌سازد و ایندکس را یک‌جا rebuild می‌کند.
+    Args:
+        conn: اتصال تراکنش جاری.
+    Returns:
+        bool: آیا triggerها حذف شدند.
+    """
+    if conn.dialect.name != "sqlite" or not inspect(conn).has_table("users_fts"):
+        return False
+    for name in ("users_fts_ai", "users_fts_ad", "users_fts_au"):
+        conn.execute(text(f"DROP TRIGGER IF EXISTS {name}"))
+    return True
+
+_search_backend = None
+
+def search_backend(db) -> str:
+    """
+    نوع جستجوی زیررشته قابل استفاده (یک بار برای هر پردازه تشخیص داده می‌شود).
+    Returns:
+        str: fts5، trgm یا like.
+    """
+    global _search_backend
+    if _search_backend is None:
+        dialect = db.get_bind().dialect.name
+        if dialect == "sqlite":
+            has_fts = inspect(db.connection()).has_table("users_fts")
+            _search_backend = "fts5" if has_fts else "like"
+        elif dialect == "postgresql":
+            _search_backend = "trgm"
+        else:
+            _search_backend = "like"
+    return _search_backend
+
+def prefix_bounds(prefix: str) -> tuple:
+    """
+    تبدیل جستجوی پیشوندی به بازه [lower, upper) تا مستقیما از ایندکس B-tree نام کاربری استفاده شود.
+    Args:
+        prefix (str): پیشوند.
+    Returns:
+        tuple: کران پایین و بالا.
+    """
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def _escape_like(value: str) -> str:
+    return value.replace("/", "//").replace("%", "/%").replace("_", "/_")
+
+def search_users_query(
+    db,
+    q: Optional[str] = None,
+    mode: str = "prefix",
+    is_active: Optional[bool] = None,
+    usage_above: Optional[float] = None,
+    expiring_within: Optional[int] = None,
+):
+    """
+    ساخت کوئری جستجوی کاربران با فیلترهای ترکیبی.
+    Args:
+        db (Session): سشن پایگاه داده.
+        q (str): عبارت جستجو در نام کاربری.
+        mode (str): prefix یا substring.
+        is_active (bool): وضعیت فعال بودن.
+        usage_above (float): مصرف ترافیک بیشتر یا مساوی این درصد از سقف.
+        expiring_within (int): انقضا در N روز آینده.
+    Returns:
+        Query: کوئری مرتب‌نشده روی User.
+    """
+    query = db.query(User)
+    if q:
+        if mode == "prefix":
+            lower, upper = prefix_bounds(q)
+            query = query.filter(User.username >= lower, User.username < upper)
+        else:
+            backend = search_backend(db) if len(q) >= TRIGRAM_MIN_LENGTH else "like"
+            if backend == "fts5":
+                phrase = '"' + q.replace('"', '""') + '"'
+                matches = select(literal_column("rowid")).select_from(text("users_fts")).where(
+                    text("users_fts MATCH :phrase").bindparams(phrase=phrase)
+                )
+                query = query.filter(User.id.in_(matches))
+            else:
+                # در PostgreSQL با ایندکس gin_trgm_ops؛ در MySQL/MariaDB و SQLite بدون FTS5 اسکن کامل جدول
+                # (اسکن با رسیدن به limit متوقف می‌شود، ولی برای عبارت کم‌تکرار تا انتهای جدول ادامه دارد)
+                query = query.filter(User.username.like(f"%{_escape_like(q)}%", escape="/"))
+    if is_active is not None:
+        query = query.filter(User.is_active == is_active)
+    if expiring_within is not None:
+        now = datetime.now(timezone.utc)
+        query = query.filter(User.expires_at >= now, User.expires_at < now + timedelta(days=expiring_within))
+    if usage_above is not None:
+        # traffic_limit به مگابایت و مصرف به بایت ذخیره می‌شود؛ سقف صفر یعنی نامحدود
+        used = UserUsage.uplink + UserUsage.downlink
+        query = query.filter(
+            User.traffic_limit > 0,
+            exists().where(
+                UserUsage.user_id == User.id,
+                used * 100 >= User.traffic_limit * 1048576 * usage_above,
+            ),
+        )
+    return query
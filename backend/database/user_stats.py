@@ -0,0 +1,63 @@
+from sqlalchemy import bindparam, delete, func, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.models import User, UserStat
+
+# نام شمارنده‌ها در جدول user_stats
+STAT_TOTAL = "total"
+STAT_ACTIVE = "active"
+STAT_INACTIVE = "inactive"
+
+# دستور Core روی جدول (نه مدل) تا با سشن ORM هم به صورت executemany ساده اجرا شود
+_stats_table = UserStat.__table__
+_adjust_statement = (
+    update(_stats_table)
+    .where(_stats_table.c.name == bindparam("stat_name"))
+    .values(value=_stats_table.c.value + bindparam("delta"))
+)
+
+def adjust_user_stats(connection, total: int = 0, active: int = 0, inactive: int = 0) -> None:
+    """
+    اعمال تغییر شمارنده‌ها در تراکنش جاری (UPDATE اتمیک value = value + delta).
+    Args:
+        connection: اتصال یا سشن تراکنش جاری.
+        total (int): تغییر تعداد کل کاربران.
+        active (int): تغییر تعداد کاربران فعال.
+        inactive (int): تغییر تعداد کاربران غیرفعال.
+    """
+    deltas = [
+        {"stat_name": name, "delta": delta}
+        for name, delta in ((STAT_TOTAL, total), (STAT_ACTIVE, active), (STAT_INACTIVE, inactive))
+        if delta
+    ]
+    if deltas:
+        connection.execute(_adjust_statement, deltas)
+
+def recount_user_stats(connection) -> dict:
+    """
+    محاسبه دوباره شمارنده‌ها با COUNT روی جدول users (فقط برای مهاجرت یا اصلاح انحراف).
+    Args:
+        connection: اتصال تراکنش جاری.
+    Returns:
+        dict: مقادیر جدید شمارنده‌ها.
+    """
+    counts = dict(connection.execute(select(User.is_active, func.count()).group_by(User.is_active)).all())
+    stats = {
+        STAT_ACTIVE: counts.get(True, 0),
+        STAT_INACTIVE: counts.get(False, 0),
+    }
+    stats[STAT_TOTAL] = stats[STAT_ACTIVE] + stats[STAT_INACTIVE]
+    connection.execute(delete(UserStat))
+    connection.execute(insert(UserStat), [{"name": name, "value": value} for name, value in stats.items()])
+    return stats
+
+async def get_user_stats(db: AsyncSession) -> dict:
+    """
+    خواندن شمارنده‌های وضعیت کاربران (چند ردیف با کلید اصلی؛ مستقل از تعداد کاربران).
+    Args:
+        db (AsyncSession): سشن async پایگاه داده.
+    Returns:
+        dict: total، active و inactive.
+    """
+    stats = {STAT_TOTAL: 0, STAT_ACTIVE: 0, STAT_INACTIVE: 0}
+    stats.update((await db.execute(select(UserStat.name, UserStat.value))).all())
+    return stats
@@ -0,0 +1,149 @@
+import logging
+import time
+import uuid
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from starlette.routing import Match
+from backend.utils.logger import request_id_var, should_sample_debug
+from backend.utils.metrics_utils import http_requests_total, http_request_duration_seconds, http_requests_in_flight
+from backend.utils.ratelimit_utils import rate_limiter, rate_limit_requests_total, retry_after_header
+
+logger = logging.getLogger("app_logger")
+
+class RoutePathResolver:
+    """
+    یافتن الگوی مسیر منطبق با درخواست پیش از مسیریابی (همان route.path که مسیریاب بعدا در scope
+    می‌گذارد). مسیرها بر اساس اولین بخش ثابت آدرس گروه‌بندی می‌شوند تا برای هر درخواست فقط
+    چند regex بررسی شود؛ با اضافه شدن مسیر جدید، ایندکس دوباره ساخته می‌شود.
+    Args:
+        routes: مسیرهای برنامه (app.router.routes).
+    """
+
+    def __init__(self, routes=()):
+        self.routes = routes
+        self._index = {}
+        self._dynamic = []
+        self._indexed = -1
+
+    @staticmethod
+    def _first_segment(path: str) -> str:
+        return path.lstrip("/").split("/", 1)[0]
+
+    def _build(self) -> None:
+        keyed = []
+        for route in self.routes:
+            segment = self._first_segment(getattr(route, "path", "") or "")
+            keyed.append((None if "{" in segment else segment, route))
+        self._dynamic = [route for segment, route in keyed if segment is None]
+        self._index = {
+            key: [route for segment, route in keyed if segment in (key, None)]
+            for key in {segment for segment, _ in keyed if segment is not None}
+        }
+        self._indexed = len(self.routes)
+
+    def resolve(self, scope) -> str:
+        """
+        Returns:
+            str: الگوی مسیر یا "unmatched".
+        """
+        if self._indexed != len(self.routes):
+            self._build()
+        path = scope["path"]
+        partial = None
+        for route in self._index.get(self._first_segment(path), self._dynamic):
+            if route.path_regex.match(path) is None:
+                continue
+            methods = getattr(route, "methods", None)
+            if methods is None or scope["method"] in methods:
+                return route.path
+            # مانند مسیریاب: اگر متد هیچ مسیری منطبق نباشد، اولین مسیر هم‌آدرس (پاسخ 405) گزارش می‌شود
+            partial = partial or route.path
+        return partial or "unmatched"
+
+class RequestContextMiddleware:
+    """
+    Middleware خالص ASGI برای هر درخواست HTTP: شناسه درخواست، لاگ debug نمونه‌برداری‌شده
+    و ثبت زمان پاسخ و درخواست‌های در حال اجرا در متریک‌ها بر اساس الگوی مسیر (نه آدرس خام).
+    درخواست تا ارسال آخرین بخش بدنه پاسخ (از جمله پاسخ‌های استریمی و SSE) در حال اجرا شمرده می‌شود.
+    Args:
+        routes: (اختیاری) مسیرهای برنامه برای برچسب متریک درخواست‌های در حال اجرا.
+    """
+
+    def __init__(self, app, routes=()):
+        self.app = app
+        self.route_resolver = RoutePathResolver(routes)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = ""
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+        # پیام‌ها فقط وقتی ساخته می‌شوند که سطح debug فعال و این درخواست نمونه‌برداری شده باشد
+        verbose = logger.isEnabledFor(logging.DEBUG) and should_sample_debug()
+        if verbose:
+            logger.debug("Request %s %s headers=%s", scope["method"], scope["path"], Request(scope).headers)
+
+        status = 500
+        start = time.perf_counter()
+        in_flight_path = self.route_resolver.resolve(scope)
+        http_requests_in_flight.inc(in_flight_path)
+
+        async def send_with_request_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            http_requests_in_flight.dec(in_flight_path)
+            elapsed = time.perf_counter() - start
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            http_requests_total.inc(scope["method"], route_path, str(status))
+            http_request_duration_seconds.observe(elapsed, scope["method"], route_path)
+            if verbose:
+                logger.debug("Response status: %s (%.1f ms)", status, elapsed * 1000)
+            request_id_var.reset(token)
+
+class RateLimitMiddleware:
+    """
+    Middleware خالص ASGI برای محدودیت نرخ مسیرهای عمومی پیش از رسیدن به پایگاه داده یا
+    تولید QR. درخواست‌های رد شده پاسخ 429 با هدر Retry-After می‌گیرند.
+    محدودیت‌ها برای هر worker جداگانه نگهداری می‌شوند.
+    """
+
+    def __init__(self, app, limiter=rate_limiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        client = scope.get("client")
+        rule, wait = self.limiter.check(scope["method"], scope["path"], client[0] if client else "unknown")
+        if rule is None:
+            await self.app(scope, receive, send)
+            return
+        if not wait:
+            rate_limit_requests_total.inc(rule, "allowed")
+            await self.app(scope, receive, send)
+            return
+        rate_limit_requests_total.inc(rule, "limited")
+        response = JSONResponse(
+            status_code=429,
+            content={"message": "Too many requests."},
+            headers={"Retry-After": retry_after_header(wait)},
+        )
+        await response(scope, receive, send)
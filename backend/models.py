@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSON  # برای فیلدهای پویا
@@ -15,12 +15,19 @@ class User(Base):
     usage_duration = Column(Integer, nullable=False, default=0)  # به دقیقه
     simultaneous_connections = Column(Integer, nullable=False, default=1)
     is_active = Column(Boolean, nullable=False, default=True)  # کاربر فعال یا غیرفعال
+    expires_at = Column(DateTime(timezone=True), nullable=True, index=True)  # محاسبه‌شده از usage_duration؛ NULL یعنی نامحدود
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # رابطه با دامنه‌ها
     domains = relationship("Domain", back_populates="owner")
 
+    # ایندکس‌های ترکیبی برای فیلتر وضعیت همراه با انقضا (enforcement) و صفحه‌بندی keyset
+    __table_args__ = (
+        Index("ix_users_is_active_expires_at", "is_active", "expires_at"),
+        Index("ix_users_is_active_id", "is_active", "id"),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -30,11 +37,50 @@ class User(Base):
             "usage_duration": self.usage_duration,
             "simultaneous_connections": self.simultaneous_connections,
             "is_active": self.is_active,
-            "created_at": self.created_at,
-            "updated_at": self.updated_at,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
+        }
+
+
+# مدل مصرف ترافیک کاربران (تجمعی، به بایت)
+class UserUsage(Base):
+    __tablename__ = "user_usage"
+
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    uplink = Column(BigInteger, nullable=False, default=0)
+    downlink = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "uplink": self.uplink,
+            "downlink": self.downlink,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None,
         }
 
 
+# شمارنده‌های وضعیت کاربران (total/active/inactive)؛ در همان تراکنش تغییر کاربر به‌روز می‌شوند
+class UserStat(Base):
+    __tablename__ = "user_stats"
+
+    name = Column(String(32), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+
+
+# رویدادهای تغییر برای هماهنگ‌سازی کش workerها (در حالت چند پردازه‌ای)
+class ChangeEvent(Base):
+    __tablename__ = "change_log"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    kind = Column(String(16), nullable=False)  # user یا domain
+    user_id = Column(Integer, nullable=True)
+    user_uuid = Column(String(36), nullable=True)
+    origin = Column(Integer, nullable=False)  # pid پردازه نویسنده
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
 # مدل دامنه‌ها
 class Domain(Base):
     __tablename__ = "domains"
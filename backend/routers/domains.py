@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Request, Query
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import StreamingResponse
-from backend.utils.network_utils import validate_url, extract_domain
-from backend.utils.qr_utils import generate_qr_code
-
-# تنظیم مسیر تمپلت‌ها
-templates = Jinja2Templates(directory="backend/templates")
+from fastapi import APIRouter, Body, HTTPException, Request, Query
+from fastapi.responses import Response, StreamingResponse
+from backend.models import User
+from backend.database.database import SessionLocal
+from backend.schemas import UrlValidationRequest
+from backend.utils.template_utils import templates
+from backend.utils.network_utils import URL_PROBE_MAX_ITEMS, validate_url, validate_urls, extract_domain, etag_matches, build_subscription_link
+from backend.utils.qr_utils import get_qr_png, get_qr_png_async, qr_cache_key
+from datetime import datetime
+import zipfile
 
 # ایجاد Router
 router = APIRouter()
 
+# محدودیت خروجی گروهی QR Code و تعداد UUID در هر کوئری
+QR_BULK_MAX_ITEMS = 10000
+QR_BULK_CHUNK_SIZE = 500
+
 # مسیر بخش دامنه‌ها
 @router.get("/", tags=["Domains"])
 def domains_page(request: Request):
@@ -26,8 +32,87 @@ def validate_url_api(url: str = Query(..., description="URL to validate")):
         "domain": domain
     }
 
-# مسیر تولید QR Code
+# مسیر بررسی گروهی URLها (با بررسی اختیاری در دسترس بودن)
+@router.post("/validate-urls", tags=["Network Tools"])
+async def validate_urls_api(payload: UrlValidationRequest):
+    if payload.probe and len(payload.urls) > URL_PROBE_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {URL_PROBE_MAX_ITEMS} URLs can be probed per request")
+    results = await validate_urls(payload.urls, probe=payload.probe)
+    return {
+        "total": len(results),
+        "valid": sum(1 for result in results if result["is_valid"]),
+        "results": results,
+    }
+
+# مسیر تولید QR Code (با کش محتوایی و ETag)
 @router.get("/generate-qr", tags=["QR Code"])
-def generate_qr(data: str = Query(..., description="Data to encode in QR Code")):
-    qr_buffer = generate_qr_code(data)
-    return StreamingResponse(qr_buffer, media_type="image/png")
+async def generate_qr(
+    request: Request,
+    data: str = Query(..., max_length=2048, description="Data to encode in QR Code"),
+    box_size: int = Query(10, ge=1, le=40, description="Pixel size of each box"),
+    border: int = Query(4, ge=0, le=20, description="Border width in boxes"),
+    error_correction: str = Query("L", pattern="^[LMQH]$", description="Error correction level"),
+):
+    etag = f'"{qr_cache_key(data, box_size, border, error_correction)}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    _, png = await get_qr_png_async(data, box_size, border, error_correction)
+    return Response(content=png, media_type="image/png", headers=headers)
+
+# بافر خروجی ZIP بدون قابلیت seek؛ پس از هر فایل خالی می‌شود تا کل آرشیو در حافظه نماند
+class _ZipChunkWriter:
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+def _iter_qr_zip(user_uuids: list, box_size: int, border: int, error_correction: str):
+    writer = _ZipChunkWriter()
+    timestamp = datetime.now().timetuple()[:6]
+    missing = []
+    db = SessionLocal()
+    try:
+        with zipfile.ZipFile(writer, mode="w", compression=zipfile.ZIP_STORED) as archive:
+            for start in range(0, len(user_uuids), QR_BULK_CHUNK_SIZE):
+                chunk = user_uuids[start:start + QR_BULK_CHUNK_SIZE]
+                usernames = dict(db.query(User.uuid, User.username).filter(User.uuid.in_(chunk)))
+                db.close()
+                for user_uuid in chunk:
+                    if user_uuid not in usernames:
+                        missing.append(user_uuid)
+                        continue
+                    _, png = get_qr_png(build_subscription_link(user_uuid), box_size, border, error_correction)
+                    archive.writestr(zipfile.ZipInfo(f"{usernames[user_uuid]}_{user_uuid}.png", timestamp), png)
+                    yield writer.drain()
+            if missing:
+                archive.writestr(zipfile.ZipInfo("missing.txt", timestamp), "\n".join(missing) + "\n")
+        yield writer.drain()
+    finally:
+        db.close()
+
+# خروجی گروهی QR Code لینک اشتراک کاربران به صورت ZIP استریم‌شده
+@router.post("/generate-qr/bulk", tags=["QR Code"])
+def generate_qr_bulk(
+    user_uuids: list[str] = Body(..., min_length=1, max_length=QR_BULK_MAX_ITEMS, description="User UUIDs"),
+    box_size: int = Query(10, ge=1, le=40),
+    border: int = Query(4, ge=0, le=20),
+    error_correction: str = Query("L", pattern="^[LMQH]$"),
+):
+    # حذف تکراری‌ها با حفظ ترتیب
+    user_uuids = list(dict.fromkeys(user_uuids))
+    return StreamingResponse(
+        _iter_qr_zip(user_uuids, box_size, border, error_correction),
+        media_type="application/zip",
+        headers={"Content-Disposition": 'attachment; filename="qr-codes.zip"'},
+    )
@@ -1,49 +1,57 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from backend.models import Setting, User  # اصلاح ایمپورت
-from backend.database.database import get_db
+from backend.models import Setting  # اصلاح ایمپورت
+from backend.database.database import get_db, get_async_db
+from backend.database.user_cache import get_user_snapshot, user_cache
+from backend.utils.network_utils import build_subscription_link
+from backend.utils.json_utils import FastJSONResponse
 
 router = APIRouter()
 
 # دریافت تنظیمات عمومی سیستم (برای مدیر سیستم)
 @router.get("/admin", tags=["Admin"])
 def get_all_settings(db: Session = Depends(get_db)):
-    settings = db.query(Setting).all()
+    settings = db.execute(select(Setting.__table__)).all()
     if not settings:
         raise HTTPException(status_code=404, detail="No settings found")
-    return settings
+    return FastJSONResponse([row._asdict() for row in settings])
+
+# آمار کش جستجوی کاربران
+@router.get("/admin/cache", tags=["Admin"])
+def get_cache_stats():
+    return user_cache.stats()
 
 # دریافت تنظیمات مختص کاربر بر اساس UUID
 @router.get("/subscription/{user_uuid}", tags=["Subscription"])
-def get_user_settings(user_uuid: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.uuid == user_uuid).first()
+async def get_user_settings(user_uuid: str, db: AsyncSession = Depends(get_async_db)):
+    user = await get_user_snapshot(db, user_uuid)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return {
-        "username": user.username,
-        "uuid": user.uuid,
-        "traffic_limit": user.traffic_limit,
-        "usage_duration": user.usage_duration,
-        "simultaneous_connections": user.simultaneous_connections,
-    }
+    return FastJSONResponse({
+        "username": user["username"],
+        "uuid": user["uuid"],
+        "traffic_limit": user["traffic_limit"],
+        "usage_duration": user["usage_duration"],
+        "simultaneous_connections": user["simultaneous_connections"],
+    })
 
 # ایجاد لینک اشتراک برای کاربران
 @router.get("/generate-link/{user_uuid}", tags=["Subscription"])
 def generate_subscription_link(user_uuid: str):
-    base_url = "https://your-domain.com/settings/subscription/"
-    subscription_link = f"{base_url}{user_uuid}"
-    return {"link": subscription_link}
+    return {"link": build_subscription_link(user_uuid)}
 
 # کپی کردن تنظیمات کاربر
 @router.get("/copy-config/{user_uuid}", tags=["Subscription"])
-def copy_user_config(user_uuid: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.uuid == user_uuid).first()
+async def copy_user_config(user_uuid: str, db: AsyncSession = Depends(get_async_db)):
+    user = await get_user_snapshot(db, user_uuid)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     # اطلاعات کانفیگ برای کپی
-    return {
-        "uuid": user.uuid,
-        "traffic_limit": user.traffic_limit,
-        "usage_duration": user.usage_duration,
-        "simultaneous_connections": user.simultaneous_connections,
-    }
+    return FastJSONResponse({
+        "uuid": user["uuid"],
+        "traffic_limit": user["traffic_limit"],
+        "usage_duration": user["usage_duration"],
+        "simultaneous_connections": user["simultaneous_connections"],
+    })
@@ -1,20 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from backend.models import User  # اصلاح ایمپورت
-from backend.database.database import get_db
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database.database import get_async_db
+from backend.database.user_cache import get_user_snapshot, get_user_usage
+from backend.database.subscription_cache import get_subscription_bundle, subscription_topology
+from backend.utils.network_utils import etag_matches
+from backend.utils.subscription_utils import subscription_userinfo
 
 router = APIRouter()
 
-# مسیر نمایش تنظیمات اشتراک
+# مسیر اشتراک کاربر: لینک‌های vmess/vless/ss به صورت base64 (قابل import در کلاینت‌ها)، با ETag
 @router.get("/subscription/{user_uuid}")
-def get_subscription(user_uuid: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.uuid == user_uuid).first()
+async def get_subscription(user_uuid: str, request: Request, db: AsyncSession = Depends(get_async_db)):
+    user = await get_user_snapshot(db, user_uuid)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return {
-        "username": user.username,
-        "traffic_limit": user.traffic_limit,
-        "usage_duration": user.usage_duration,
-        "simultaneous_connections": user.simultaneous_connections,
-        "uuid": user.uuid
+    if not user["is_active"]:
+        raise HTTPException(status_code=403, detail="User is inactive")
+    if subscription_topology.needs_reload():
+        await run_in_threadpool(subscription_topology.reload)
+    bundle = get_subscription_bundle(user)
+    upload, download = await get_user_usage(db, user["id"])
+    headers = {
+        "ETag": bundle.etag,
+        "Cache-Control": "no-cache",
+        "Profile-Update-Interval": "12",
+        "Subscription-Userinfo": subscription_userinfo(user, upload, download),
     }
+    if etag_matches(request.headers.get("if-none-match"), bundle.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=bundle.body, media_type="text/plain", headers=headers)
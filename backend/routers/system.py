@@ -0,0 +1,91 @@
+import os
+import time
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.database.database import get_async_db, get_async_engine
+from backend.database.user_stats import get_user_stats
+from backend.background import system_sampler, connection_status, user_status_counts
+from backend.database.backup import export_dump, sqlite_snapshot
+from backend.utils.broadcast_utils import Broadcaster
+
+router = APIRouter()
+
+# فاصله محاسبه وضعیت داشبورد زنده، به ثانیه
+DASHBOARD_STREAM_INTERVAL = float(os.getenv("DASHBOARD_STREAM_INTERVAL", "2"))
+
+async def _dashboard_state() -> dict:
+    # یک بار برای همه کلاینت‌های متصل محاسبه می‌شود
+    state = {}
+    snapshot = system_sampler.latest() or {}
+    for key in ("cpu_usage", "ram_usage", "disk_usage", "bandwidth_speed"):
+        state[key] = snapshot.get(key)
+    async with AsyncSession(get_async_engine()) as db:
+        counts = user_status_counts(await get_user_stats(db))
+    for key, value in counts.items():
+        state[f"{key}_users"] = value
+    return state
+
+dashboard_broadcaster = Broadcaster(_dashboard_state, interval=DASHBOARD_STREAM_INTERVAL)
+
+# آخرین نمونه منابع سرور
+@router.get("/metrics", tags=["System"])
+def get_system_metrics():
+    return system_sampler.latest() or {}
+
+# تاریخچه اخیر منابع سرور
+@router.get("/metrics/history", tags=["System"])
+def get_system_metrics_history(limit: int = Query(60, ge=1, le=10000, description="Number of recent samples")):
+    return system_sampler.history(limit)
+
+# کاربران آنلاین و کاربرانی که از سقف اتصال همزمان عبور کرده‌اند (از worker رهبر)
+@router.get("/connections", tags=["System"])
+def get_connections():
+    status = connection_status()
+    if status is None:
+        return {"online_users": None, "flagged_users": [], "records_processed": None}
+    return status
+
+# شمارنده‌های وضعیت کاربران (بدون COUNT روی جدول users)
+@router.get("/user-stats", tags=["System"])
+async def get_user_status_counts(db: AsyncSession = Depends(get_async_db)):
+    stats = await get_user_stats(db)
+    return {**user_status_counts(stats), "active": stats["active"]}
+
+# پخش زنده تغییرات داشبورد (Server-Sent Events)
+@router.get("/stream", tags=["System"])
+async def stream_dashboard(request: Request):
+    return StreamingResponse(
+        dashboard_broadcaster.stream(request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# تعداد کلاینت‌های متصل به پخش زنده و فریم‌های دورریخته برای کلاینت‌های کند
+@router.get("/stream/stats", tags=["System"])
+def get_stream_stats():
+    return {
+        "clients": len(dashboard_broadcaster),
+        "frames_produced": dashboard_broadcaster.frames_produced,
+        "frames_dropped": dashboard_broadcaster.frames_dropped,
+    }
+
+# کپی آنلاین فایل SQLite در پوشه پشتیبان (بدون توقف سرویس)؛ فقط BACKUP_KEEP نسخه آخر نگه داشته می‌شود
+@router.post("/backup/snapshot", tags=["Backup"])
+async def create_snapshot():
+    try:
+        path = await run_in_threadpool(sqlite_snapshot)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"path": path, "size": os.path.getsize(path)}
+
+# دانلود خروجی فشرده NDJSON از همه جداول (قابل بازیابی با python -m backend.database.backup restore)
+@router.get("/backup/export", tags=["Backup"])
+def download_export():
+    filename = f"panel-{time.strftime('%Y%m%d-%H%M%S')}.ndjson.gz"
+    return StreamingResponse(
+        export_dump(),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
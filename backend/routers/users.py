@@ -1,25 +1,318 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from typing import Literal, Optional
 from backend.models import User  # مدل SQLAlchemy
-from backend.database.database import get_db
-from backend.schemas import UserResponse, UserCreate, UserUpdate  # اسکیمای Pydantic
+from backend.database.database import get_db, SessionLocal
+from backend.database.events import mark_users_changed
+from backend.database.user_stats import adjust_user_stats
+from backend.database.user_search import search_users_query
+from backend.utils.time_utils import compute_expires_at
+from backend.utils.json_utils import FastJSONResponse, dumps
+from backend.schemas import (  # اسکیمای Pydantic
+    UserResponse, UserCreate, UserUpdate, UserPage, UserBulkUpdate, BulkResult,
+)
 import uuid
 
 router = APIRouter()
 
-# دریافت لیست کاربران
-@router.get("/", response_model=list[UserResponse])
-def get_users(db: Session = Depends(get_db)):
-    users = db.query(User).all()
-    return [user.to_dict() for user in users]
+# حداکثر اندازه هر صفحه و اندازه هر تکه در حالت استریم
+USERS_PAGE_MAX = 1000
+STREAM_CHUNK_SIZE = 1000
+
+# محدودیت‌های عملیات گروهی: تعداد کل آیتم‌ها و تعداد ردیف در هر تراکنش
+BULK_MAX_ITEMS = 10000
+BULK_CHUNK_SIZE = 500
+
+# ستون‌های پاسخ کاربر، به ترتیب فیلدهای UserResponse
+_USER_COLUMNS = (
+    User.id,
+    User.username,
+    User.uuid,
+    User.traffic_limit,
+    User.usage_duration,
+    User.simultaneous_connections,
+    User.is_active,
+    User.expires_at,
+    User.created_at,
+    User.updated_at,
+)
+
+# مسیر سریع خواندن: ستون‌ها به صورت tuple خوانده و مستقیم به JSON تبدیل می‌شوند
+# (بدون ساخت شیء ORM، to_dict و اعتبارسنجی دوباره با pydantic)
+def _user_page(query, limit: int) -> FastJSONResponse:
+    # یک ردیف اضافه برای تشخیص وجود صفحه بعد
+    rows = query.with_entities(*_USER_COLUMNS).order_by(User.id).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return FastJSONResponse({"items": [row._asdict() for row in rows[:limit]], "next_cursor": next_cursor})
+
+# اعمال فیلترهای مشترک لیست کاربران
+def _filter_users(query, is_active: Optional[bool], username: Optional[str]):
+    if is_active is not None:
+        query = query.filter(User.is_active == is_active)
+    if username:
+        query = query.filter(User.username.startswith(username, autoescape=True))
+    return query
+
+# دریافت لیست کاربران (صفحه‌بندی keyset روی User.id)
+@router.get("/", response_model=UserPage)
+def get_users(
+    after: Optional[int] = Query(None, ge=0, description="Return users with id greater than this cursor"),
+    limit: int = Query(100, ge=1, le=USERS_PAGE_MAX, description="Page size"),
+    is_active: Optional[bool] = Query(None, description="Filter by active status"),
+    username: Optional[str] = Query(None, max_length=50, description="Filter by username prefix"),
+    db: Session = Depends(get_db),
+):
+    query = _filter_users(db.query(User), is_active, username)
+    if after is not None:
+        query = query.filter(User.id > after)
+    return _user_page(query, limit)
+
+# تولید NDJSON به صورت تکه‌تکه؛ در هر لحظه فقط یک تکه در حافظه است
+def _iter_users_ndjson(is_active: Optional[bool], username: Optional[str], chunk_size: int):
+    db = SessionLocal()
+    try:
+        last_id = 0
+        while True:
+            rows = (
+                _filter_users(db.query(User), is_active, username)
+                .with_entities(*_USER_COLUMNS)
+                .filter(User.id > last_id)
+                .order_by(User.id)
+                .limit(chunk_size)
+                .all()
+            )
+            if not rows:
+                break
+            last_id = rows[-1].id
+            chunk = b"".join(dumps(row._asdict()) + b"\n" for row in rows)
+            # آزاد کردن اتصال بین تکه‌ها
+            db.close()
+            yield chunk
+            if len(rows) < chunk_size:
+                break
+    finally:
+        db.close()
+
+# دریافت همه کاربران به صورت استریم NDJSON
+@router.get("/stream")
+def stream_users(
+    is_active: Optional[bool] = Query(None, description="Filter by active status"),
+    username: Optional[str] = Query(None, max_length=50, description="Filter by username prefix"),
+    chunk_size: int = Query(STREAM_CHUNK_SIZE, ge=1, le=10000, description="Rows fetched per database round-trip"),
+):
+    return StreamingResponse(
+        _iter_users_ndjson(is_active, username, chunk_size),
+        media_type="application/x-ndjson",
+    )
+
+# --- عملیات گروهی ---
+
+def _check_bulk_size(items: list) -> None:
+    if not items:
+        raise HTTPException(status_code=422, detail="At least one item is required")
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ITEMS} items are allowed per request")
+
+def _chunks(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def _failure(index: int, error, **extra) -> dict:
+    if isinstance(error, ValidationError):
+        error = "; ".join(
+            f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in error.errors()
+        )
+    return {"index": index, "success": False, "error": str(error), **extra}
+
+def _bulk_result(results: list) -> dict:
+    succeeded = sum(1 for result in results if result["success"])
+    return {"succeeded": succeeded, "failed": len(results) - succeeded, "results": results}
+
+# درج یک تکه با یک INSERT چندردیفی؛ در صورت تداخل همزمان، ردیف‌ها تک‌تک درج می‌شوند
+def _insert_chunk(db: Session, chunk: list, results: list) -> None:
+    names = [user.username for _, user in chunk]
+    taken = {name for (name,) in db.query(User.username).filter(User.username.in_(names))}
+    pending = []
+    for index, user in chunk:
+        if user.username in taken:
+            results[index] = _failure(index, "Username already exists")
+            continue
+        pending.append((index, {
+            "username": user.username,
+            "uuid": str(uuid.uuid4()),  # مانند create_user، UUID سمت سرور تولید می‌شود
+            "traffic_limit": user.traffic_limit,
+            "usage_duration": user.usage_duration,
+            "simultaneous_connections": user.simultaneous_connections,
+            "is_active": True,
+            "expires_at": compute_expires_at(None, user.usage_duration),
+        }))
+    if not pending:
+        return
+
+    try:
+        ids = _insert_rows(db, [row for _, row in pending])
+    except IntegrityError:
+        db.rollback()
+        ids = {}
+        for index, row in pending:
+            try:
+                ids.update(_insert_rows(db, [row]))
+            except IntegrityError:
+                db.rollback()
+                results[index] = _failure(index, "Username already exists")
+
+    for index, row in pending:
+        if row["uuid"] in ids:
+            results[index] = {"index": index, "success": True, "id": ids[row["uuid"]], "uuid": row["uuid"]}
+
+# INSERT چندردیفی و commit؛ خروجی نگاشت uuid به id است
+def _insert_rows(db: Session, rows: list) -> dict:
+    db.execute(insert(User), rows)
+    ids = dict(db.query(User.uuid, User.id).filter(User.uuid.in_([row["uuid"] for row in rows])))
+    # INSERT گروهی از flush عبور نمی‌کند، پس تغییرات دستی ثبت می‌شوند
+    mark_users_changed(db, {(user_id, user_uuid) for user_uuid, user_id in ids.items()})
+    adjust_user_stats(db, total=len(rows), active=len(rows))
+    db.commit()
+    return ids
+
+# ایجاد گروهی کاربران
+@router.post("/bulk", response_model=BulkResult)
+def bulk_create_users(items: list[dict] = Body(...), db: Session = Depends(get_db)):
+    _check_bulk_size(items)
+    results = [None] * len(items)
+    valid = []
+    seen = set()
+    # اعتبارسنجی همه آیتم‌ها در یک مرحله
+    for index, item in enumerate(items):
+        try:
+            user = UserCreate(**item)
+        except ValidationError as exc:
+            results[index] = _failure(index, exc)
+            continue
+        if user.username in seen:
+            results[index] = _failure(index, "Duplicate username in request")
+            continue
+        seen.add(user.username)
+        valid.append((index, user))
+
+    for chunk in _chunks(valid, BULK_CHUNK_SIZE):
+        _insert_chunk(db, chunk, results)
+    return _bulk_result(results)
+
+# به‌روزرسانی یک تکه با executemany روی کلید اصلی
+def _update_chunk(db: Session, chunk: list, results: list) -> None:
+    existing = {}
+    created = {}
+    for user_id, user_uuid, created_at in db.query(User.id, User.uuid, User.created_at).filter(
+        User.id.in_([user.id for _, user in chunk])
+    ):
+        existing[user_id] = user_uuid
+        created[user_id] = created_at
+    new_names = [user.username for _, user in chunk if user.username is not None]
+    owners = dict(db.query(User.username, User.id).filter(User.username.in_(new_names))) if new_names else {}
+    pending = []
+    for index, user in chunk:
+        if user.id not in existing:
+            results[index] = _failure(index, "User not found", id=user.id)
+            continue
+        if user.username is not None and owners.get(user.username, user.id) != user.id:
+            results[index] = _failure(index, "Username already exists", id=user.id)
+            continue
+        values = user.dict(exclude_unset=True, exclude_none=True, exclude={"id"})
+        if "usage_duration" in values:
+            values["expires_at"] = compute_expires_at(created[user.id], values["usage_duration"])
+        results[index] = {"index": index, "success": True, "id": user.id, "uuid": existing[user.id]}
+        if values:
+            pending.append((index, {"id": user.id, **values}))
+    if not pending:
+        return
+
+    try:
+        _update_rows(db, [row for _, row in pending], existing)
+    except IntegrityError:
+        db.rollback()
+        for index, row in pending:
+            try:
+                _update_rows(db, [row], existing)
+            except IntegrityError:
+                db.rollback()
+                results[index] = _failure(index, "Username already exists", id=row["id"])
+
+def _update_rows(db: Session, rows: list, uuids: dict) -> None:
+    db.execute(update(User), rows)
+    mark_users_changed(db, {(row["id"], uuids[row["id"]]) for row in rows})
+    db.commit()
+
+# به‌روزرسانی گروهی کاربران
+@router.patch("/bulk", response_model=BulkResult)
+def bulk_update_users(items: list[dict] = Body(...), db: Session = Depends(get_db)):
+    _check_bulk_size(items)
+    results = [None] * len(items)
+    valid = []
+    seen_ids = set()
+    seen_names = set()
+    for index, item in enumerate(items):
+        try:
+            user = UserBulkUpdate(**item)
+        except ValidationError as exc:
+            results[index] = _failure(index, exc)
+            continue
+        if user.id in seen_ids:
+            results[index] = _failure(index, "Duplicate id in request", id=user.id)
+            continue
+        if user.username is not None and user.username in seen_names:
+            results[index] = _failure(index, "Duplicate username in request", id=user.id)
+            continue
+        seen_ids.add(user.id)
+        if user.username is not None:
+            seen_names.add(user.username)
+        valid.append((index, user))
+
+    for chunk in _chunks(valid, BULK_CHUNK_SIZE):
+        _update_chunk(db, chunk, results)
+    return _bulk_result(results)
+
+# جستجوی کاربران با فیلترهای ترکیبی (پیش از مسیر /{user_id} تعریف می‌شود)
+# جستجوی substring فقط روی SQLite با FTS5 و PostgreSQL با pg_trgm ایندکس دارد؛ در MySQL/MariaDB،
+# SQLite بدون FTS5 و عبارت‌های کوتاه‌تر از سه حرف، جدول users به صورت کامل با LIKE اسکن می‌شود
+@router.get(
+    "/search",
+    response_model=UserPage,
+    description=(
+        "Search users with combined filters. Prefix mode uses the username index on every database. "
+        "Substring mode is indexed only on SQLite with FTS5 and on PostgreSQL with pg_trgm, for terms of "
+        "three or more characters; otherwise it is a full LIKE scan of the users table."
+    ),
+)
+def search_users(
+    q: Optional[str] = Query(None, min_length=1, max_length=50, description="Username search term"),
+    mode: Literal["prefix", "substring"] = Query(
+        "prefix",
+        description="Match the term as a prefix (indexed) or anywhere in the username (full scan on MySQL/MariaDB)",
+    ),
+    is_active: Optional[bool] = Query(None, description="Filter by active status"),
+    usage_above: Optional[float] = Query(None, ge=0, le=100, description="Traffic used at or above this percent of the limit"),
+    expiring_within: Optional[int] = Query(None, ge=0, le=3650, description="Expiring within this many days"),
+    after: Optional[int] = Query(None, ge=0, description="Return users with id greater than this cursor"),
+    limit: int = Query(100, ge=1, le=USERS_PAGE_MAX, description="Page size"),
+    db: Session = Depends(get_db),
+):
+    query = search_users_query(db, q, mode, is_active, usage_above, expiring_within)
+    if after is not None:
+        query = query.filter(User.id > after)
+    return _user_page(query, limit)
 
 # دریافت جزئیات یک کاربر
 @router.get("/{user_id}", response_model=UserResponse)
 def get_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+    row = db.execute(select(*_USER_COLUMNS).where(User.id == user_id)).first()
+    if not row:
         raise HTTPException(status_code=404, detail="User not found")
-    return user.to_dict()
+    return FastJSONResponse(row._asdict())
 
 # ایجاد یک کاربر جدید
 @router.post("/", response_model=UserResponse)
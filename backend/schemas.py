@@ -27,8 +27,37 @@ class UserUpdate(BaseModel):
 class UserResponse(UserBase):
     id: int
     is_active: bool
+    expires_at: Optional[str] = None
     created_at: Optional[str]
     updated_at: Optional[str]
 
     class Config:
         orm_mode = True
+
+# پاسخ صفحه‌بندی‌شده لیست کاربران (keyset بر اساس id)
+class UserPage(BaseModel):
+    items: list[UserResponse]
+    next_cursor: Optional[int] = Field(None, description="Pass as `after` to fetch the next page.")
+
+# به‌روزرسانی گروهی: شناسه کاربر به همراه فیلدهای قابل تغییر
+class UserBulkUpdate(UserUpdate):
+    id: int = Field(..., ge=1, description="ID of the user to update.")
+
+# نتیجه هر آیتم در عملیات گروهی
+class BulkItemResult(BaseModel):
+    index: int
+    success: bool
+    id: Optional[int] = None
+    uuid: Optional[str] = None
+    error: Optional[str] = None
+
+# نتیجه کلی عملیات گروهی
+class BulkResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: list[BulkItemResult]
+
+# اسکیمای بررسی گروهی URLها
+class UrlValidationRequest(BaseModel):
+    urls: list[str] = Field(..., min_length=1, max_length=10000)
+    probe: bool = Field(False, description="Also check that each valid URL responds.")
@@ -0,0 +1,118 @@
+import asyncio
+import json
+import logging
+import os
+
+logger = logging.getLogger("app_logger")
+
+# تنظیمات پخش زنده داشبورد
+STREAM_QUEUE_SIZE = int(os.getenv("STREAM_QUEUE_SIZE", "8"))  # فریم‌های منتظر هر کلاینت
+STREAM_KEEPALIVE = float(os.getenv("STREAM_KEEPALIVE", "15"))  # به ثانیه
+
+def sse_frame(event: str, data: dict) -> bytes:
+    """
+    ساخت یک فریم Server-Sent Events.
+    Args:
+        event (str): نام رویداد.
+        data (dict): داده (به JSON تبدیل می‌شود).
+    Returns:
+        bytes: فریم آماده ارسال.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+SSE_KEEPALIVE_FRAME = b": keepalive\n\n"
+
+class Broadcaster:
+    """
+    پخش یک جریان به همه کلاینت‌ها با یک تولیدکننده.
+    تولیدکننده هر interval ثانیه وضعیت را یک بار محاسبه می‌کند و فقط کلیدهای تغییرکرده را،
+    یک بار سریال‌شده، در صف محدود هر کلاینت می‌گذارد. اگر صف کلاینت کندی پر باشد فریم‌های منتظرش
+    با یک snapshot کامل جایگزین می‌شوند، پس تولیدکننده هرگز منتظر کلاینت‌ها نمی‌ماند و هیچ تغییری
+    گم نمی‌شود. تولیدکننده فقط تا وقتی کلاینتی متصل است اجرا می‌شود.
+    Args:
+        produce: تابع async بدون ورودی که وضعیت کامل (dict) را برمی‌گرداند.
+        interval (float): فاصله محاسبه وضعیت، به ثانیه.
+        queue_size (int): حداکثر فریم‌های منتظر هر کلاینت.
+    """
+
+    def __init__(self, produce, interval: float, queue_size: int = STREAM_QUEUE_SIZE):
+        self.produce = produce
+        self.interval = interval
+        self.queue_size = queue_size
+        self.state = {}
+        self.frames_produced = 0
+        self.frames_dropped = 0
+        self._subscribers = set()
+        self._task = None
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+    def publish(self, frame: bytes) -> None:
+        """
+        افزودن فریم به صف همه کلاینت‌ها. فریم‌ها فقط کلیدهای تغییرکرده را دارند، پس دور ریختن
+        یکی از آن‌ها داشبورد را تا تغییر بعدی همان کلید کهنه نگه می‌دارد؛ برای کلاینتی که صفش
+        پر است فریم‌های منتظر با یک snapshot کامل از وضعیت فعلی جایگزین می‌شوند.
+        """
+        self.frames_produced += 1
+        snapshot = None
+        for queue in self._subscribers:
+            if queue.full():
+                while not queue.empty():
+                    queue.get_nowait()
+                    self.frames_dropped += 1
+                if snapshot is None:
+                    snapshot = sse_frame("snapshot", self.state)
+                queue.put_nowait(snapshot)
+            else:
+                queue.put_nowait(frame)
+
+    async def _run(self) -> None:
+        while self._subscribers:
+            try:
+                state = await self.produce()
+                previous = self.state
+                delta = {key: value for key, value in state.items() if key not in previous or previous[key] != value}
+                if delta:
+                    self.state = state
+                    self.publish(sse_frame("update", delta))
+            except Exception:
+                logger.exception("Broadcast producer failed")
+            await asyncio.sleep(self.interval)
+        self._task = None
+
+    def subscribe(self) -> asyncio.Queue:
+        """
+        ثبت کلاینت جدید؛ اولین فریم صف، وضعیت کامل فعلی است.
+        Returns:
+            asyncio.Queue: صف فریم‌های کلاینت.
+        """
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        if self.state:
+            queue.put_nowait(sse_frame("snapshot", self.state))
+        self._subscribers.add(queue)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    async def stream(self, is_disconnected=None, keepalive: float = STREAM_KEEPALIVE):
+        """
+        تولید فریم‌های یک کلاینت برای StreamingResponse.
+        Args:
+            is_disconnected: تابع async برای تشخیص قطع اتصال (مثلا request.is_disconnected).
+            keepalive (float): ارسال کامنت keepalive در نبود تغییر، به ثانیه.
+        """
+        queue = self.subscribe()
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=keepalive)
+                except asyncio.TimeoutError:
+                    if is_disconnected is not None and await is_disconnected():
+                        break
+                    yield SSE_KEEPALIVE_FRAME
+        finally:
+            self.unsubscribe(queue)
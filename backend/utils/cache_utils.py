@@ -0,0 +1,135 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from backend.utils.metrics_utils import registry
+
+# نشانگر نبودن کلید در کش (برای تمایز با مقدار None که خودش قابل کش شدن است)
+MISSING = object()
+
+# همه کش‌های ساخته‌شده، برای گزارش در /metrics
+_caches = weakref.WeakSet()
+
+def all_caches() -> list:
+    return sorted(_caches, key=lambda cache: cache.name)
+
+class TTLCache:
+    """
+    کش LRU با حداکثر اندازه و انقضای زمانی، امن برای استفاده بین چند thread.
+    Args:
+        maxsize (int): حداکثر تعداد آیتم‌ها؛ با پر شدن، قدیمی‌ترین آیتم حذف می‌شود.
+        ttl (float): عمر هر آیتم به ثانیه.
+        name (str): نام کش برای گزارش آمار.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 300.0, name: str = "cache"):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        # با هر invalidate افزایش می‌یابد تا نتیجه کوئری‌های قدیمی‌تر در کش ننشیند
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        _caches.add(self)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key, default=MISSING):
+        """
+        خواندن مقدار از کش.
+        Args:
+            key: کلید.
+            default: مقدار بازگشتی در صورت نبودن یا منقضی شدن کلید.
+        Returns:
+            مقدار ذخیره‌شده یا default.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key, value, generation: int = None) -> None:
+        """
+        ذخیره مقدار در کش.
+        Args:
+            key: کلید.
+            value: مقدار.
+            generation (int): (اختیاری) مقدار generation پیش از خواندن داده؛ اگر در این فاصله
+                invalidate رخ داده باشد، مقدار ذخیره نمی‌شود.
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key) -> None:
+        self.invalidate_many((key,))
+
+    def invalidate_many(self, keys) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                if self._data.pop(key, None) is not None:
+                    self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self.invalidations += len(self._data)
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """
+        آمار کش.
+        Returns:
+            dict: اندازه، تعداد hit/miss/eviction و نسبت hit.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+def _cache_samples(field: str):
+    def samples():
+        return [((cache.name,), cache.stats()[field]) for cache in all_caches()]
+    return samples
+
+for _field, _doc in (
+    ("hits", "Cache hits."),
+    ("misses", "Cache misses."),
+    ("evictions", "Entries evicted by the size bound."),
+    ("size", "Entries currently cached."),
+    ("hit_ratio", "Hits divided by lookups since start."),
+):
+    registry.callback_gauge(f"cache_{_field}", _doc, _cache_samples(_field), ("cache",))
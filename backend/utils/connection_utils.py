@@ -0,0 +1,206 @@
+import logging
+import os
+import threading
+import tempfile
+import time
+from collections import OrderedDict
+from backend.utils.xray_utils import parse_client_email
+from backend.utils.ingest_utils import LogIngestor, CheckpointStore, parse_xray_access
+from backend.utils.process_utils import write_shared_state
+
+logger = logging.getLogger("app_logger")
+
+# تنظیمات ردیابی اتصال‌های همزمان
+XRAY_ACCESS_LOG = os.getenv("XRAY_ACCESS_LOG", "/var/log/xray/access.log")
+CONNECTION_WINDOW = float(os.getenv("CONNECTION_WINDOW", "60"))  # به ثانیه
+CONNECTION_MAX_IPS_PER_USER = int(os.getenv("CONNECTION_MAX_IPS_PER_USER", "32"))
+CONNECTION_LIMIT_ACTION = os.getenv("CONNECTION_LIMIT_ACTION", "flag")  # flag یا disable
+# وضعیت ردیاب (فقط در worker رهبر اجرا می‌شود) برای workerهای دیگر در این فایل منتشر می‌شود
+CONNECTION_STATE_PATH = os.getenv("CONNECTION_STATE_PATH", os.path.join(tempfile.gettempdir(), "panel-connections.json"))
+CONNECTION_STATE_MAX_AGE = float(os.getenv("CONNECTION_STATE_MAX_AGE", "10"))  # به ثانیه
+
+class ConnectionTracker:
+    """
+    نگهداری مجموعه IPهای متمایز هر کاربر در یک پنجره لغزان با حافظه محدود.
+    Args:
+        window (float): طول پنجره به ثانیه.
+        max_ips_per_user (int): سقف IPهای نگهداری‌شده برای هر کاربر (قدیمی‌ترین حذف می‌شود).
+        on_violation: (اختیاری) تابعی با ورودی (user_id، تعداد IP، سقف) هنگام عبور از سقف.
+    """
+
+    def __init__(self, window: float = CONNECTION_WINDOW, max_ips_per_user: int = CONNECTION_MAX_IPS_PER_USER,
+                 on_violation=None):
+        self.window = window
+        self.max_ips_per_user = max_ips_per_user
+        self.on_violation = on_violation
+        self.records = 0
+        self.violations = 0
+        self._ips = {}  # user_id -> OrderedDict(ip -> last_seen)
+        self._limits = {}  # user_id -> simultaneous_connections
+        self._flagged = {}  # user_id -> زمان آخرین گزارش
+        self._lock = threading.Lock()
+
+    def set_limits(self, limits: dict) -> None:
+        with self._lock:
+            self._limits.update(limits)
+
+    def remove_limits(self, user_ids) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._limits.pop(user_id, None)
+
+    def observe(self, user_id: int, ip: str, now: float = None) -> None:
+        now = time.monotonic() if now is None else now
+        violation = None
+        with self._lock:
+            ips = self._ips.get(user_id)
+            if ips is None:
+                ips = self._ips[user_id] = OrderedDict()
+            ips[ip] = now
+            ips.move_to_end(ip)
+            if len(ips) > self.max_ips_per_user:
+                ips.popitem(last=False)
+            limit = self._limits.get(user_id)
+            if limit is not None and len(ips) > limit:
+                # حذف IPهای منقضی این کاربر پیش از تصمیم‌گیری
+                cutoff = now - self.window
+                while ips and next(iter(ips.values())) < cutoff:
+                    ips.popitem(last=False)
+                # هر کاربر حداکثر یک بار در هر پنجره گزارش می‌شود
+                if len(ips) > limit and now - self._flagged.get(user_id, -self.window) >= self.window:
+                    self._flagged[user_id] = now
+                    self.violations += 1
+                    violation = (user_id, len(ips), limit)
+        if violation is not None and self.on_violation is not None:
+            self.on_violation(*violation)
+
+    def process_records(self, records, now: float = None) -> None:
+        """
+        Args:
+            records: رکوردهای XrayAccessRecord.
+            now (float): (اختیاری) زمان monotonic دریافت.
+        """
+        now = time.monotonic() if now is None else now
+        for record in records:
+            user_id = parse_client_email(record.email)
+            if user_id is not None:
+                self.observe(user_id, record.ip, now)
+        self.records += len(records)
+
+    def prune(self, now: float = None) -> None:
+        now = time.monotonic() if now is None else now
+        cutoff = now - self.window
+        with self._lock:
+            for user_id in list(self._ips):
+                ips = self._ips[user_id]
+                while ips and next(iter(ips.values())) < cutoff:
+                    ips.popitem(last=False)
+                if not ips:
+                    del self._ips[user_id]
+            for user_id in [user_id for user_id, flagged_at in self._flagged.items() if flagged_at < cutoff]:
+                del self._flagged[user_id]
+
+    def online_count(self) -> int:
+        """
+        تعداد کاربرانی که در پنجره اخیر اتصال داشته‌اند.
+        """
+        return len(self._ips)
+
+    def connection_counts(self) -> dict:
+        with self._lock:
+            return {user_id: len(ips) for user_id, ips in self._ips.items()}
+
+    def flagged_users(self) -> list:
+        with self._lock:
+            return sorted(self._flagged)
+
+    def status(self) -> dict:
+        return {
+            "online_users": self.online_count(),
+            "flagged_users": self.flagged_users(),
+            "records_processed": self.records,
+        }
+
+class ConnectionMonitor:
+    """
+    اجرای پس‌زمینه ردیاب اتصال روی لاگ دسترسی Xray همراه با بارگذاری سقف اتصال کاربران.
+    Args:
+        tracker (ConnectionTracker): ردیاب.
+        session_factory: سازنده سشن sync پایگاه داده.
+        log_path (str): مسیر لاگ دسترسی Xray.
+        idle_sleep (float): مکث هنگام نبود خط جدید، به ثانیه.
+        state_path (str): فایل انتشار وضعیت برای workerهای دیگر؛ None برای غیرفعال کردن.
+    """
+
+    def __init__(self, tracker: ConnectionTracker, session_factory, log_path: str = XRAY_ACCESS_LOG,
+                 idle_sleep: float = 0.2, state_path: str = CONNECTION_STATE_PATH):
+        self.tracker = tracker
+        self.state_path = state_path
+        self.session_factory = session_factory
+        # پنجره اتصال‌ها کوتاه است؛ پس از ری‌استارت از انتهای فایل شروع می‌شود و checkpoint فقط در حافظه است
+        self.ingestor = LogIngestor(log_path, parse_xray_access, CheckpointStore(None), start_at_end=True)
+        self.idle_sleep = idle_sleep
+        self._pending_ids = set()
+        self._pending_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load_limits(self, user_ids=None) -> None:
+        from backend.models import User
+        db = self.session_factory()
+        try:
+            query = db.query(User.id, User.simultaneous_connections, User.is_active)
+            if user_ids is None:
+                rows = query.filter(User.is_active.is_(True)).yield_per(10000)
+                self.tracker.set_limits({user_id: limit for user_id, limit, _ in rows})
+                return
+            ids = list(user_ids)
+            rows = query.filter(User.id.in_(ids)).all()
+        finally:
+            db.close()
+        self.tracker.remove_limits(ids)
+        self.tracker.set_limits({user_id: limit for user_id, limit, is_active in rows if is_active})
+
+    def mark_changed(self, changes) -> None:
+        """
+        ثبت کاربران تغییرکرده (مناسب برای add_user_change_listener).
+        """
+        with self._pending_lock:
+            self._pending_ids.update(user_id for user_id, _ in changes)
+
+    def _run(self) -> None:
+        last_prune = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                with self._pending_lock:
+                    pending, self._pending_ids = self._pending_ids, set()
+                if pending:
+                    self.load_limits(pending)
+                found = False
+                for records in self.ingestor.read_batches():
+                    found = True
+                    self.tracker.process_records(records)
+                now = time.monotonic()
+                if now - last_prune >= 1:
+                    self.tracker.prune(now)
+                    last_prune = now
+                    if self.state_path is not None:
+                        write_shared_state(self.state_path, self.tracker.status())
+                if not found:
+                    self._stop.wait(self.idle_sleep)
+            except Exception:
+                logger.exception("Connection tracking failed")
+                self._stop.wait(1)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self.load_limits()
+            self._thread = threading.Thread(target=self._run, name="connection-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,233 @@
+import heapq
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from sqlalchemy import update
+from backend.utils.time_utils import as_utc
+
+logger = logging.getLogger("app_logger")
+
+# تنظیمات اعمال محدودیت زمان و حجم
+ENFORCEMENT_BATCH_SIZE = int(os.getenv("ENFORCEMENT_BATCH_SIZE", "500"))
+ENFORCEMENT_MAX_SLEEP = float(os.getenv("ENFORCEMENT_MAX_SLEEP", "60"))  # به ثانیه
+# مکث پیش از تلاش دوباره پس از خطای پایگاه داده (مثلا قفل بودن SQLite)، به ثانیه
+ENFORCEMENT_RETRY_DELAY = float(os.getenv("ENFORCEMENT_RETRY_DELAY", "5"))
+
+BYTES_PER_MB = 1024 * 1024
+
+def deactivate_users(db, user_ids: list, *conditions) -> list:
+    """
+    غیرفعال کردن کاربران فعالی از لیست که شرط‌های داده‌شده را دارند، در یک UPDATE و commit.
+    Args:
+        db (Session): سشن پایگاه داده.
+        user_ids (list): idهای کاندید.
+        conditions: شرط‌های SQL اضافه.
+    Returns:
+        list: idهای غیرفعال‌شده.
+    """
+    from backend.models import User
+    from backend.database.events import mark_users_changed
+    from backend.database.user_stats import adjust_user_stats
+    rows = db.query(User.id, User.uuid).filter(User.id.in_(user_ids), User.is_active.is_(True), *conditions).all()
+    if rows:
+        result = db.execute(
+            update(User)
+            .where(User.id.in_([user_id for user_id, _ in rows]), User.is_active.is_(True))
+            .values(is_active=False),
+            execution_options={"synchronize_session": False},
+        )
+        # UPDATE گروهی از flush عبور نمی‌کند؛ تغییرات برای کش‌ها، Xray و شمارنده‌ها ثبت می‌شوند
+        mark_users_changed(db, set(rows))
+        adjust_user_stats(db, active=-result.rowcount, inactive=result.rowcount)
+    db.commit()
+    return [user_id for user_id, _ in rows]
+
+class EnforcementScheduler:
+    """
+    غیرفعال‌سازی کاربران در لحظه انقضا یا عبور از سقف ترافیک.
+    زمان‌های انقضای آینده در یک min-heap نگهداری می‌شوند؛ هر دور فقط کاربران سررسیده پردازش
+    می‌شوند و شرط انقضا دوباره در SQL بررسی می‌شود، پس ورودی‌های قدیمی heap بی‌خطرند.
+    Args:
+        session_factory: سازنده سشن sync پایگاه داده.
+        batch_size (int): حداکثر کاربران در هر UPDATE.
+        max_sleep (float): حداکثر فاصله بیدار شدن، به ثانیه.
+        retry_delay (float): مکث پیش از تلاش دوباره کاربران یک دور ناموفق، به ثانیه.
+    """
+
+    def __init__(self, session_factory, batch_size: int = ENFORCEMENT_BATCH_SIZE,
+                 max_sleep: float = ENFORCEMENT_MAX_SLEEP, retry_delay: float = ENFORCEMENT_RETRY_DELAY):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.max_sleep = max_sleep
+        self.retry_delay = retry_delay
+        self.failures = 0
+        self.expired_total = 0
+        self.over_quota_total = 0
+        self._heap = []
+        self._pending_ids = set()
+        self._cond = threading.Condition()
+        self._stop = False
+        self._thread = None
+
+    def seed(self) -> int:
+        """
+        بارگذاری زمان انقضای کاربران فعال (با استفاده از ایندکس expires_at).
+        Returns:
+            int: تعداد ورودی‌های heap.
+        """
+        from backend.models import User
+        db = self.session_factory()
+        try:
+            rows = db.query(User.expires_at, User.id).filter(
+                User.is_active.is_(True), User.expires_at.isnot(None)
+            ).yield_per(10000)
+            heap = [(as_utc(expires_at).timestamp(), user_id) for expires_at, user_id in rows]
+        finally:
+            db.close()
+        heapq.heapify(heap)
+        with self._cond:
+            self._heap = heap
+            self._cond.notify()
+        return len(heap)
+
+    def schedule(self, user_id: int, expires_at: datetime) -> None:
+        with self._cond:
+            heapq.heappush(self._heap, (as_utc(expires_at).timestamp(), user_id))
+            self._cond.notify()
+
+    def mark_changed(self, changes) -> None:
+        """
+        ثبت کاربران تغییرکرده (مناسب برای add_user_change_listener)؛ خواندن زمان انقضای جدید
+        در thread زمان‌بند انجام می‌شود تا commit درخواست معطل نشود.
+        """
+        with self._cond:
+            self._pending_ids.update(user_id for user_id, _ in changes)
+            self._cond.notify()
+
+    def _load_pending(self, user_ids: set) -> None:
+        from backend.models import User
+        ids = list(user_ids)
+        db = self.session_factory()
+        try:
+            for start in range(0, len(ids), self.batch_size):
+                rows = db.query(User.id, User.expires_at).filter(
+                    User.id.in_(ids[start:start + self.batch_size]),
+                    User.is_active.is_(True),
+                    User.expires_at.isnot(None),
+                ).all()
+                for user_id, expires_at in rows:
+                    self.schedule(user_id, expires_at)
+        finally:
+            db.close()
+
+    def deactivate_expired(self, user_ids: list) -> list:
+        """
+        غیرفعال کردن کاربرانی از لیست که واقعا منقضی شده‌اند.
+        Returns:
+            list: idهای غیرفعال‌شده.
+        """
+        from backend.models import User
+        now = datetime.now(timezone.utc)
+        db = self.session_factory()
+        try:
+            deactivated = deactivate_users(db, user_ids, User.expires_at.isnot(None), User.expires_at <= now)
+        finally:
+            db.close()
+        if deactivated:
+            self.expired_total += len(deactivated)
+            logger.info("Deactivated %d expired users", len(deactivated))
+        return deactivated
+
+    def check_quota(self, user_ids: list) -> list:
+        """
+        بررسی سقف ترافیک فقط برای کاربرانی که مصرفشان تغییر کرده است (مناسب برای on_flush جمع‌آورنده ترافیک).
+        Returns:
+            list: idهای غیرفعال‌شده.
+        """
+        from backend.models import User, UserUsage
+        deactivated = []
+        db = self.session_factory()
+        try:
+            for start in range(0, len(user_ids), self.batch_size):
+                batch = user_ids[start:start + self.batch_size]
+                over_quota = db.query(UserUsage.user_id).join(User, User.id == UserUsage.user_id).filter(
+                    UserUsage.user_id.in_(batch),
+                    User.traffic_limit > 0,
+                    UserUsage.uplink + UserUsage.downlink >= User.traffic_limit * BYTES_PER_MB,
+                )
+                deactivated.extend(deactivate_users(db, batch, User.id.in_(over_quota.scalar_subquery())))
+        finally:
+            db.close()
+        if deactivated:
+            self.over_quota_total += len(deactivated)
+            logger.info("Deactivated %d users over traffic quota", len(deactivated))
+        return deactivated
+
+    def _take_due(self) -> tuple:
+        # باید با قفل فراخوانی شود
+        now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            due.append(heapq.heappop(self._heap)[1])
+        pending, self._pending_ids = self._pending_ids, set()
+        if due or pending:
+            return due, pending, 0
+        timeout = self.max_sleep
+        if self._heap:
+            timeout = min(timeout, max(self._heap[0][0] - now, 0))
+        return due, pending, timeout
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                if self._stop:
+                    return
+                due, pending, timeout = self._take_due()
+                if timeout:
+                    self._cond.wait(timeout)
+                    continue
+            # در صورت خطا کاربران برداشته‌شده دور ریخته نمی‌شوند و پس از retry_delay دوباره بررسی می‌شوند
+            failed = False
+            if pending:
+                try:
+                    self._load_pending(pending)
+                except Exception:
+                    logger.exception("Enforcement failed to load changed users; retrying in %.0fs", self.retry_delay)
+                    failed = True
+                    with self._cond:
+                        self._pending_ids.update(pending)
+            if due:
+                try:
+                    self.deactivate_expired(list(dict.fromkeys(due)))
+                except Exception:
+                    logger.exception("Enforcement failed to deactivate expired users; retrying in %.0fs", self.retry_delay)
+                    failed = True
+                    retry_at = time.time() + self.retry_delay
+                    with self._cond:
+                        for user_id in due:
+                            heapq.heappush(self._heap, (retry_at, user_id))
+            if failed:
+                self.failures += 1
+                with self._cond:
+                    if not self._stop:
+                        self._cond.wait(self.retry_delay)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop = False
+            self.seed()
+            self._thread = threading.Thread(target=self._run, name="enforcement", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            with self._cond:
+                self._stop = True
+                self._cond.notify()
+            self._thread.join(timeout=5)
+            self._thread = None
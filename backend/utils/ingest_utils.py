@@ -0,0 +1,221 @@
+import json
+import logging
+import mmap
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger("app_logger")
+
+# تنظیمات موتور خواندن لاگ
+LOG_CHECKPOINT_PATH = os.getenv("LOG_CHECKPOINT_PATH", "log_checkpoints.json")
+INGEST_CHUNK_SIZE = int(os.getenv("INGEST_CHUNK_SIZE", str(8 * 1024 * 1024)))
+
+class XrayAccessRecord(NamedTuple):
+    timestamp: str
+    ip: str
+    destination: str
+    email: str
+
+class NginxAccessRecord(NamedTuple):
+    ip: str
+    time: str
+    method: str
+    path: str
+    status: int
+    size: int
+
+# نمونه: 2024/03/05 10:20:30 from 1.2.3.4:51234 accepted tcp:example.com:443 [vless-ws >> direct] email: 12.alice
+_XRAY_ACCESS = re.compile(
+    r"(\S+ \S+) (?:from )?(?:tcp:|udp:)?\[?([0-9A-Fa-f:.]+?)\]?:\d+ accepted (\S+).*email: (\S+)"
+)
+# قالب combined در nginx
+_NGINX_ACCESS = re.compile(r'(\S+) \S+ \S+ \[([^\]]+)\] "(\S+) (\S+)[^"]*" (\d{3}) (\d+|-)')
+
+# ساخت مستقیم tuple بدون عبور از __new__ پایتونی NamedTuple
+_new_tuple = tuple.__new__
+
+def parse_xray_access(line: bytes, _match=_XRAY_ACCESS.match) -> Optional[XrayAccessRecord]:
+    """
+    تجزیه یک خط لاگ دسترسی Xray.
+    Args:
+        line (bytes): خط لاگ بدون کاراکتر پایان خط.
+    Returns:
+        Optional[XrayAccessRecord]: رکورد یا None برای خطوط بدون کاربر.
+    """
+    # مسیر سریع: خطوط بدون ایمیل بدون decode و اجرای regex رد می‌شوند
+    if b"email: " not in line:
+        return None
+    match = _match(line.decode("utf-8", "replace"))
+    if match is None:
+        return None
+    return _new_tuple(XrayAccessRecord, match.groups())
+
+def parse_nginx_access(line: bytes, _match=_NGINX_ACCESS.match) -> Optional[NginxAccessRecord]:
+    """
+    تجزیه یک خط لاگ دسترسی nginx با قالب combined.
+    Args:
+        line (bytes): خط لاگ.
+    Returns:
+        Optional[NginxAccessRecord]: رکورد یا None برای خطوط نامعتبر.
+    """
+    match = _match(line.decode("utf-8", "replace"))
+    if match is None:
+        return None
+    ip, when, method, path, status, size = match.groups()
+    return _new_tuple(NginxAccessRecord, (ip, when, method, path, int(status), 0 if size == "-" else int(size)))
+
+class CheckpointStore:
+    """
+    ذخیره موقعیت خواندن (inode و offset) هر فایل لاگ در یک فایل JSON.
+    Args:
+        path (str): مسیر فایل checkpoint؛ اگر None باشد فقط در حافظه نگهداری می‌شود.
+    """
+
+    def __init__(self, path: Optional[str] = LOG_CHECKPOINT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._data = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                self._data = json.load(file)
+
+    def get(self, log_path: str) -> Optional[dict]:
+        return self._data.get(log_path)
+
+    def set(self, log_path: str, inode: int, offset: int) -> None:
+        with self._lock:
+            self._data[log_path] = {"inode": inode, "offset": offset}
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        with self._lock:
+            payload = json.dumps(self._data)
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".checkpoints.")
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            file.write(payload)
+        os.replace(tmp_path, self.path)
+
+class LogIngestor:
+    """
+    خواندن تدریجی یک فایل لاگ با mmap در تکه‌های بزرگ و تبدیل خطوط به رکورد.
+    موقعیت خواندن در CheckpointStore ذخیره می‌شود تا پس از ری‌استارت از همان نقطه ادامه یابد.
+    پس از rotate، باقیمانده فایل قبلی (path.1) پیش از فایل جدید خوانده می‌شود.
+    Args:
+        path (str): مسیر فایل لاگ.
+        parser: تابع تبدیل خط (bytes) به رکورد؛ None یعنی رد شدن خط.
+        checkpoints (CheckpointStore): محل ذخیره موقعیت.
+        chunk_size (int): اندازه هر تکه خواندن به بایت.
+        start_at_end (bool): برای فایلی که checkpoint ندارد، شروع از انتهای فایل.
+    """
+
+    def __init__(self, path: str, parser, checkpoints: CheckpointStore = None,
+                 chunk_size: int = INGEST_CHUNK_SIZE, start_at_end: bool = False):
+        self.path = path
+        self.parser = parser
+        self.checkpoints = checkpoints if checkpoints is not None else CheckpointStore(None)
+        self.chunk_size = chunk_size
+        self.start_at_end = start_at_end
+        self.lines = 0
+        self.records = 0
+        self.bytes = 0
+
+    def _read_file(self, path: str, inode: int, offset: int):
+        """
+        خواندن خطوط کامل فایل از offset؛ خروجی دسته‌های رکورد است و checkpoint پس از هر تکه به‌روز می‌شود.
+        """
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_ino != inode:
+                return
+            size = os.fstat(file.fileno()).st_size
+            if size <= offset:
+                return
+            with mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ) as view:
+                parser = self.parser
+                while offset < size:
+                    end = min(offset + self.chunk_size, size)
+                    if end < size or view[size - 1:size] != b"\n":
+                        # فقط خطوط کامل؛ خط نیمه‌کاره انتهایی در دور بعد خوانده می‌شود
+                        newline = view.rfind(b"\n", offset, end)
+                        if newline == -1:
+                            if end == size:
+                                return
+                            newline = view.find(b"\n", end)
+                            if newline == -1:
+                                return
+                        end = newline + 1
+                    lines = view[offset:end].split(b"\n")
+                    lines.pop()
+                    records = [record for record in map(parser, lines) if record is not None]
+                    self.lines += len(lines)
+                    self.records += len(records)
+                    self.bytes += end - offset
+                    offset = end
+                    self.checkpoints.set(self.path, inode, offset)
+                    if records:
+                        yield records
+
+    def read_batches(self):
+        """
+        خواندن همه خطوط جدید از آخرین checkpoint.
+        Yields:
+            list: دسته‌ای از رکوردها.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        checkpoint = self.checkpoints.get(self.path)
+
+        if checkpoint is None:
+            offset = stat.st_size if self.start_at_end else 0
+            self.checkpoints.set(self.path, stat.st_ino, offset)
+        elif checkpoint["inode"] != stat.st_ino:
+            # فایل rotate شده است؛ ابتدا باقیمانده فایل قبلی
+            rotated = f"{self.path}.1"
+            try:
+                if os.stat(rotated).st_ino == checkpoint["inode"]:
+                    yield from self._read_file(rotated, checkpoint["inode"], checkpoint["offset"])
+            except FileNotFoundError:
+                pass
+            offset = 0
+            self.checkpoints.set(self.path, stat.st_ino, 0)
+        elif stat.st_size < checkpoint["offset"]:
+            # فایل truncate شده است
+            offset = 0
+        else:
+            offset = checkpoint["offset"]
+
+        yield from self._read_file(self.path, stat.st_ino, offset)
+
+    def poll(self) -> list:
+        """
+        Returns:
+            list: همه رکوردهای جدید.
+        """
+        records = []
+        for batch in self.read_batches():
+            records.extend(batch)
+        return records
+
+    def follow(self, callback, stop_event: threading.Event, interval: float = 0.5, save_every: float = 5.0) -> None:
+        """
+        دنبال کردن فایل تا تنظیم شدن stop_event؛ هر دسته رکورد به callback داده می‌شود.
+        """
+        last_save = time.monotonic()
+        while not stop_event.is_set():
+            found = False
+            for batch in self.read_batches():
+                found = True
+                callback(batch)
+            if time.monotonic() - last_save >= save_every:
+                self.checkpoints.save()
+                last_save = time.monotonic()
+            if not found:
+                stop_event.wait(interval)
+        self.checkpoints.save()
@@ -0,0 +1,44 @@
+import json
+from datetime import date
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # orjson اختیاری است؛ بدون آن از json کتابخانه استاندارد استفاده می‌شود
+    orjson = None
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(data) -> bytes:
+    """
+    سریال‌سازی مستقیم به بایت‌های JSON؛ تاریخ‌ها با قالب ISO 8601 (مانند to_dict مدل‌ها) نوشته می‌شوند.
+    Args:
+        data: داده قابل سریال‌سازی (dict، list، datetime و ...).
+    Returns:
+        bytes: JSON با کدگذاری UTF-8.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def loads(data):
+    """
+    خواندن JSON از bytes یا str با orjson در صورت وجود.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+class FastJSONResponse(Response):
+    """
+    پاسخ JSON بدون عبور از jsonable_encoder و اعتبارسنجی response_model؛ فقط برای داده‌ای
+    که شکل آن از پیش با اسکیمای مستند endpoint یکسان است.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -1,23 +1,111 @@
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
 
-def setup_logger(name: str = "app_logger", level: int = logging.INFO) -> logging.Logger:
+# تنظیمات لاگ از محیط
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # text یا json
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0"))  # سهم درخواست‌هایی که لاگ debug دارند
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] - %(message)s"
+
+# شناسه درخواست جاری؛ توسط middleware تنظیم و به همه لاگ‌های همان درخواست اضافه می‌شود
+request_id_var = contextvars.ContextVar("request_id", default="-")
+
+# listenerهای فعال بر اساس نام لاگر؛ هر لاگر فقط یک بار پیکربندی می‌شود
+_listeners = {}
+
+class RequestIdFilter(logging.Filter):
+    """
+    افزودن شناسه درخواست جاری به رکورد لاگ (در thread فراخواننده اجرا می‌شود).
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+class JsonFormatter(logging.Formatter):
+    """
+    قالب JSON تک‌خطی برای ارسال لاگ به سیستم‌های جمع‌آوری.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False)
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    # فقط پیام و traceback در thread فراخواننده ساخته می‌شوند؛ قالب‌بندی و نوشتن در listener انجام می‌شود
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def should_sample_debug() -> bool:
+    """
+    تصمیم‌گیری برای ثبت لاگ‌های debug یک درخواست بر اساس LOG_DEBUG_SAMPLE_RATE.
+    Returns:
+        bool: آیا لاگ debug این درخواست ثبت شود.
+    """
+    return LOG_DEBUG_SAMPLE_RATE >= 1.0 or random.random() < LOG_DEBUG_SAMPLE_RATE
+
+def setup_logger(name: str = "app_logger", level: int = None) -> logging.Logger:
     """
-    تنظیم لاگر برای ثبت اطلاعات.
+    تنظیم لاگر برای ثبت اطلاعات. لاگ‌ها در یک صف قرار می‌گیرند و یک thread پس‌زمینه
+    آن‌ها را قالب‌بندی و در خروجی می‌نویسد، پس ثبت لاگ event loop را مسدود نمی‌کند.
+    فراخوانی دوباره هندلر جدیدی اضافه نمی‌کند.
     Args:
         name (str): نام لاگر، پیش‌فرض: app_logger.
-        level (int): سطح لاگ، پیش‌فرض: INFO.
+        level (int): سطح لاگ، پیش‌فرض: مقدار LOG_LEVEL (INFO).
     Returns:
         logging.Logger: شیء لاگر تنظیم‌شده.
     """
     logger = logging.getLogger(name)
-    logger.setLevel(level)
+    logger.setLevel(level if level is not None else LOG_LEVEL)
+    if name in _listeners:
+        return logger
 
     # قالب لاگ
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    formatter = JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT)
 
-    # هندلر کنسول
-    console_handler = logging.StreamHandler()
+    # هندلر کنسول که فقط در thread پس‌زمینه استفاده می‌شود
+    console_handler = logging.StreamHandler(sys.stderr)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
 
+    queue_handler = _DeferredQueueHandler(queue.SimpleQueue())
+    queue_handler.addFilter(RequestIdFilter())
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+
+    listener = logging.handlers.QueueListener(queue_handler.queue, console_handler, respect_handler_level=True)
+    listener.start()
+    _listeners[name] = listener
     return logger
+
+def shutdown_loggers() -> None:
+    """
+    توقف listenerها پس از نوشتن لاگ‌های باقیمانده در صف.
+    """
+    while _listeners:
+        _, listener = _listeners.popitem()
+        listener.stop()
+
+atexit.register(shutdown_loggers)
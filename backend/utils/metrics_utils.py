@@ -0,0 +1,161 @@
+import threading
+from bisect import bisect_left
+
+# مرزهای پیش‌فرض هیستوگرام زمان (ثانیه)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """
+    شمارنده افزایشی با برچسب‌های اختیاری. هر متریک قفل خودش را دارد و بخش بحرانی فقط یک جمع است.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, _format_labels(self.labelnames, labels), value
+
+class Gauge(Counter):
+    """
+    مقدار لحظه‌ای با برچسب‌های اختیاری.
+    """
+    kind = "gauge"
+
+    def set(self, *labels, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+    def dec(self, *labels, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+class CallbackGauge:
+    """
+    مقداری که فقط هنگام خواندن /metrics محاسبه می‌شود و هزینه‌ای در مسیر درخواست ندارد.
+    Args:
+        callback: تابعی که لیست (مقادیر برچسب، مقدار) برمی‌گرداند.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+
+    def samples(self):
+        for labels, value in self.callback():
+            if value is not None:
+                yield self.name, _format_labels(self.labelnames, tuple(labels)), value
+
+class Histogram:
+    """
+    هیستوگرام با مرزهای ثابت؛ هر مشاهده یک جستجوی دودویی و چند جمع است.
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [شمارش هر bucket..., +Inf, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(series)) for labels, series in self._series.items()]
+        for labels, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series):
+                cumulative += count
+                extra = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, labels, extra), cumulative
+            yield f"{self.name}_count", _format_labels(self.labelnames, labels), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, labels), series[-1]
+
+class MetricsRegistry:
+    """
+    مجموعه متریک‌ها و تولید خروجی متنی سازگار با Prometheus.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def callback_gauge(self, name: str, documentation: str, callback, labelnames: tuple = ()) -> CallbackGauge:
+        return self.register(CallbackGauge(name, documentation, callback, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """
+        Returns:
+            str: متریک‌ها در قالب متنی Prometheus (نسخه 0.0.4).
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        lines.append("")
+        return "\n".join(lines)
+
+# رجیستری سراسری برنامه
+registry = MetricsRegistry()
+
+http_requests_total = registry.counter(
+    "http_requests_total", "Total HTTP requests.", ("method", "route", "status"))
+http_request_duration_seconds = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency in seconds.", ("method", "route"))
+http_requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests currently being handled.", ("route",))
+db_queries_total = registry.counter(
+    "db_queries_total", "Total SQL statements executed.", ("engine", "operation"))
+db_query_duration_seconds = registry.histogram(
+    "db_query_duration_seconds", "SQL statement duration in seconds.", ("engine", "operation"))
@@ -1,5 +1,70 @@
-from urllib.parse import urlparse
-import requests
+from urllib.parse import urljoin, urlparse
+import asyncio
+import ipaddress
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from typing import TYPE_CHECKING
+from backend.utils.cache_utils import TTLCache, MISSING
+
+# httpx و requests سنگین‌اند و فقط با اولین درخواست خروجی بارگذاری می‌شوند
+if TYPE_CHECKING:
+    import httpx
+    import requests
+
+logger = logging.getLogger("app_logger")
+
+# آدرس عمومی پنل برای ساخت لینک اشتراک کاربران
+PANEL_BASE_URL = os.getenv("PANEL_BASE_URL", "https://your-domain.com")
+
+# تنظیمات کلاینت HTTP (اتصال به نودها و APIهای خارجی)
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "10"))  # به ثانیه
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_CONCURRENCY = int(os.getenv("HTTP_MAX_CONCURRENCY", "50"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))  # پایه backoff نمایی، به ثانیه
+
+# کش نتیجه بررسی در دسترس بودن URLها
+URL_PROBE_CACHE_SIZE = int(os.getenv("URL_PROBE_CACHE_SIZE", "10000"))
+URL_PROBE_CACHE_TTL = float(os.getenv("URL_PROBE_CACHE_TTL", "300"))
+URL_PROBE_TIMEOUT = float(os.getenv("URL_PROBE_TIMEOUT", "5"))
+URL_PROBE_MAX_ITEMS = int(os.getenv("URL_PROBE_MAX_ITEMS", "500"))  # حداکثر URL در هر درخواست با probe
+URL_PROBE_MAX_REDIRECTS = int(os.getenv("URL_PROBE_MAX_REDIRECTS", "5"))
+# شبکه‌های غیرعمومی که بررسی آن‌ها مجاز است (CIDR با کاما جدا شده؛ پیش‌فرض: هیچ)
+URL_PROBE_ALLOWED_NETWORKS = tuple(
+    ipaddress.ip_network(network.strip())
+    for network in os.getenv("URL_PROBE_ALLOWED_NETWORKS", "").split(",") if network.strip()
+)
+PROBE_SCHEMES = ("http", "https")
+
+# وضعیت‌هایی که ارزش تلاش دوباره دارند
+RETRY_STATUSES = (429, 502, 503, 504)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+
+# Session مشترک برای مسیرهای sync؛ اتصال‌های TCP/TLS بین فراخوانی‌ها دوباره استفاده می‌شوند
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session() -> "requests.Session":
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+
+                session = requests.Session()
+                retry = Retry(total=HTTP_RETRIES, backoff_factor=HTTP_BACKOFF, status_forcelist=RETRY_STATUSES)
+                adapter = HTTPAdapter(pool_maxsize=HTTP_MAX_CONNECTIONS, max_retries=retry)
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = session
+    return _session
 
 def validate_url(url: str) -> bool:
     """
@@ -9,7 +74,10 @@ def validate_url(url: str) -> bool:
     Returns:
         bool: معتبر بودن یا نبودن.
     """
-    parsed = urlparse(url)
+    try:
+        parsed = urlparse(url)
+    except ValueError:  # مثلا آدرس IPv6 ناقص
+        return False
     return all([parsed.scheme, parsed.netloc])
 
 def extract_domain(url: str) -> str:
@@ -32,6 +100,265 @@ def fetch_data_from_api(url: str, params: dict = None) -> dict:
     Returns:
         dict: داده‌های دریافتی از API.
     """
-    response = requests.get(url, params=params)
+    response = _get_session().get(url, params=params, timeout=(HTTP_CONNECT_TIMEOUT, HTTP_TIMEOUT))
     response.raise_for_status()
     return response.json()
+
+class AsyncHttpClient:
+    """
+    کلاینت HTTP async با pool اتصال مشترک، timeout، محدودیت همزمانی و تلاش دوباره با backoff نمایی.
+    کلاینت httpx در اولین استفاده ساخته می‌شود و با aclose بسته می‌شود.
+    """
+
+    def __init__(self, timeout: float = HTTP_TIMEOUT, connect_timeout: float = HTTP_CONNECT_TIMEOUT,
+                 max_connections: int = HTTP_MAX_CONNECTIONS, max_concurrency: int = HTTP_MAX_CONCURRENCY,
+                 retries: int = HTTP_RETRIES, backoff: float = HTTP_BACKOFF, transport=None):
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.transport = transport
+        self._client = None
+        self._semaphore = None
+
+    def _get_client(self) -> "httpx.AsyncClient":
+        if self._client is None or self._client.is_closed:
+            import httpx
+
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+                transport=self.transport,
+                follow_redirects=True,
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    @staticmethod
+    def _should_retry(method: str, error: Exception = None, status: int = None) -> bool:
+        import httpx
+
+        if error is not None:
+            # درخواست‌های غیر idempotent فقط وقتی تکرار می‌شوند که اصلا ارسال نشده باشند
+            return method in IDEMPOTENT_METHODS or isinstance(error, httpx.ConnectError)
+        return status in RETRY_STATUSES and method in IDEMPOTENT_METHODS
+
+    async def request(self, method: str, url: str, retries: int = None, **kwargs) -> "httpx.Response":
+        """
+        ارسال درخواست با تلاش دوباره برای خطاهای شبکه و وضعیت‌های 429/502/503/504.
+        Args:
+            method (str): متد HTTP.
+            url (str): آدرس.
+            retries (int): تعداد تلاش دوباره (پیش‌فرض: تنظیم کلاینت).
+            **kwargs: پارامترهای httpx (params، json، headers، timeout و ...).
+        Returns:
+            httpx.Response: آخرین پاسخ دریافتی.
+        """
+        import httpx
+
+        client = self._get_client()
+        method = method.upper()
+        max_retries = self.retries if retries is None else retries
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    response = await client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                if attempt >= max_retries or not self._should_retry(method, error=e):
+                    raise
+            else:
+                if attempt >= max_retries or not self._should_retry(method, status=response.status_code):
+                    return response
+                await response.aclose()
+            # backoff نمایی با jitter تا تلاش‌های همزمان روی هم نیفتند
+            await asyncio.sleep(self.backoff * (2 ** attempt) * (0.5 + random.random() / 2))
+            attempt += 1
+
+    async def get_json(self, url: str, params: dict = None) -> dict:
+        response = await self.request("GET", url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+http_client = AsyncHttpClient()
+
+async def fetch_data_from_api_async(url: str, params: dict = None) -> dict:
+    """
+    نسخه async و بدون مسدودسازی fetch_data_from_api روی pool اتصال مشترک.
+    Args:
+        url (str): آدرس API.
+        params (dict): پارامترهای کوئری.
+    Returns:
+        dict: داده‌های دریافتی از API.
+    """
+    return await http_client.get_json(url, params=params)
+
+probe_cache = TTLCache(maxsize=URL_PROBE_CACHE_SIZE, ttl=URL_PROBE_CACHE_TTL, name="url_probes")
+
+class ProbeBlocked(Exception):
+    """
+    مقصد بررسی مجاز نیست (طرح غیر HTTP یا آدرس loopback، خصوصی، link-local یا رزروشده).
+    """
+
+def _is_public_address(address: str, allowed_networks: tuple) -> bool:
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped is not None:
+        ip = ip.ipv4_mapped
+    if any(ip in network for network in allowed_networks):
+        return True
+    return ip.is_global and not ip.is_multicast
+
+async def check_probe_target(url: str, allowed_networks: tuple = URL_PROBE_ALLOWED_NETWORKS) -> str:
+    """
+    بررسی امن بودن مقصد probe پیش از ارسال درخواست (جلوگیری از SSRF به سرویس‌های داخلی
+    مانند API محلی Xray یا metadata ابری): همه آدرس‌های resolve‌شده باید عمومی باشند.
+    Args:
+        url (str): آدرس.
+        allowed_networks (tuple): شبکه‌های غیرعمومی مجاز.
+    Returns:
+        str: آدرس IP بررسی‌شده؛ اتصال باید مستقیما به همین آدرس باشد تا resolve دوباره
+        (DNS rebinding) مقصد را به شبکه داخلی تغییر ندهد.
+    Raises:
+        ProbeBlocked: مقصد مجاز نیست.
+        OSError: خطای resolve نام.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme.lower() not in PROBE_SCHEMES or not parsed.hostname:
+        raise ProbeBlocked("only http and https URLs can be probed")
+    port = parsed.port or (443 if parsed.scheme.lower() == "https" else 80)
+    infos = await asyncio.get_running_loop().getaddrinfo(parsed.hostname, port, type=socket.SOCK_STREAM)
+    for info in infos:
+        if not _is_public_address(info[4][0], allowed_networks):
+            raise ProbeBlocked(f"{parsed.hostname} resolves to a non-public address")
+    if not infos:
+        raise ProbeBlocked(f"{parsed.hostname} does not resolve")
+    return infos[0][4][0]
+
+def _pin_to_address(url: str, address: str) -> tuple:
+    """
+    ساخت درخواست به IP بررسی‌شده با Host و SNI نام اصلی (گواهی TLS همچنان با نام اصلی بررسی می‌شود).
+    Args:
+        url (str): آدرس اصلی.
+        address (str): خروجی check_probe_target.
+    Returns:
+        tuple: (آدرس با IP، هدرها، extensionهای httpx).
+    """
+    import httpx
+
+    original = httpx.URL(url)
+    # اتصال نگه داشته نمی‌شود تا درخواست نام دیگری روی همان IP از اتصال TLS این SNI استفاده نکند
+    headers = {"Host": original.netloc.decode("ascii"), "Connection": "close"}
+    extensions = {"sni_hostname": original.raw_host.decode("ascii")} if original.scheme == "https" else {}
+    return original.copy_with(host=address.split("%", 1)[0]), headers, extensions
+
+async def probe_url(url: str, client: AsyncHttpClient = None,
+                    allowed_networks: tuple = URL_PROBE_ALLOWED_NETWORKS) -> dict:
+    """
+    بررسی در دسترس بودن URL با درخواست HEAD (و GET اگر HEAD پشتیبانی نشود)؛ نتیجه کش می‌شود.
+    redirectها دستی دنبال می‌شوند تا مقصد هر مرحله هم با check_probe_target بررسی شود؛ هر درخواست
+    به همان IP بررسی‌شده فرستاده می‌شود و httpx نام را دوباره resolve نمی‌کند.
+    Args:
+        url (str): آدرس معتبر.
+        client (AsyncHttpClient): کلاینت HTTP (پیش‌فرض: کلاینت مشترک).
+        allowed_networks (tuple): شبکه‌های غیرعمومی مجاز.
+    Returns:
+        dict: reachable، status و زمان پاسخ یا متن خطا.
+    """
+    cache_key = (url, allowed_networks)
+    cached = probe_cache.get(cache_key)
+    if cached is not MISSING:
+        return cached
+    import httpx
+
+    client = client or http_client
+    generation = probe_cache.generation
+    start = time.perf_counter()
+    try:
+        target = url
+        for _ in range(URL_PROBE_MAX_REDIRECTS + 1):
+            address = await check_probe_target(target, allowed_networks)
+            pinned, headers, extensions = _pin_to_address(target, address)
+            options = {
+                "retries": 0, "timeout": URL_PROBE_TIMEOUT, "follow_redirects": False,
+                "headers": headers, "extensions": extensions,
+            }
+            response = await client.request("HEAD", pinned, **options)
+            if response.status_code in (405, 501):
+                response = await client.request("GET", pinned, **options)
+            if not response.is_redirect:
+                break
+            target = urljoin(target, response.headers["location"])
+        else:
+            raise ProbeBlocked("too many redirects")
+        result = {
+            "reachable": response.status_code < 500,
+            "status": response.status_code,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+    except ProbeBlocked as e:
+        result = {"reachable": False, "status": None, "error": f"blocked: {e}"}
+    except (httpx.HTTPError, httpx.InvalidURL, OSError, ValueError) as e:
+        # ValueError/UnicodeError برای آدرس‌هایی که urlparse قبول می‌کند ولی قابل ارسال نیستند
+        result = {"reachable": False, "status": None, "error": type(e).__name__}
+    probe_cache.set(cache_key, result, generation=generation)
+    return result
+
+async def validate_urls(urls: list, probe: bool = False, client: AsyncHttpClient = None,
+                        allowed_networks: tuple = URL_PROBE_ALLOWED_NETWORKS) -> list:
+    """
+    بررسی گروهی URLها و استخراج دامنه؛ در صورت درخواست، بررسی همزمان در دسترس بودن.
+    خطای یک آدرس فقط نتیجه همان آیتم را نامعتبر می‌کند.
+    Args:
+        urls (list): آدرس‌ها.
+        probe (bool): ارسال درخواست به URLهای معتبر.
+        client (AsyncHttpClient): کلاینت HTTP (پیش‌فرض: کلاینت مشترک).
+        allowed_networks (tuple): شبکه‌های غیرعمومی مجاز برای probe.
+    Returns:
+        list: نتیجه هر URL به ترتیب ورودی.
+    """
+    results = []
+    for url in urls:
+        is_valid = validate_url(url)
+        results.append({"url": url, "is_valid": is_valid, "domain": extract_domain(url) if is_valid else None})
+    if probe:
+        # هر URL تکراری فقط یک بار بررسی می‌شود؛ همزمانی با semaphore کلاینت محدود است
+        targets = list(dict.fromkeys(result["url"] for result in results if result["is_valid"]))
+        probes = await asyncio.gather(*(probe_url(url, client, allowed_networks) for url in targets))
+        by_url = dict(zip(targets, probes))
+        for result in results:
+            if result["is_valid"]:
+                result["probe"] = by_url[result["url"]]
+    return results
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    بررسی تطابق هدر If-None-Match با ETag (مقایسه ضعیف طبق RFC 9110).
+    Args:
+        if_none_match (str): مقدار هدر If-None-Match.
+        etag (str): ETag فعلی منبع، همراه با کوتیشن.
+    Returns:
+        bool: آیا نسخه کلاینت هنوز معتبر است.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def build_subscription_link(user_uuid: str) -> str:
+    """
+    ساخت لینک اشتراک یک کاربر.
+    Args:
+        user_uuid (str): UUID کاربر.
+    Returns:
+        str: لینک اشتراک.
+    """
+    return f"{PANEL_BASE_URL.rstrip('/')}/subscription/{user_uuid}"
@@ -0,0 +1,94 @@
+import fcntl
+import json
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+# قفل انتخاب worker رهبر (سرویس‌های پس‌زمینه تک‌نمونه فقط در رهبر اجرا می‌شوند)
+PANEL_LEADER_LOCK = os.getenv("PANEL_LEADER_LOCK", os.path.join(tempfile.gettempdir(), "panel-leader.lock"))
+
+class LeaderLock:
+    """
+    انتخاب رهبر بین workerها با flock غیرمسدودکننده روی یک فایل.
+    قفل تا پایان عمر پردازه (یا release) نگه داشته می‌شود و با مرگ پردازه خودکار آزاد می‌شود،
+    پس workerهای دیگر با تلاش دوباره می‌توانند رهبری را به دست بگیرند.
+    """
+
+    def __init__(self, path: str = PANEL_LEADER_LOCK):
+        self.path = path
+        self._fd = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        """
+        Returns:
+            bool: آیا این پردازه رهبر است.
+        """
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        return True
+
+    def release(self) -> None:
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+
+@contextmanager
+def file_lock(path: str):
+    """
+    قفل انحصاری و مسدودکننده بین پردازه‌ها (مثلا برای اجرای همزمان مهاجرت در چند worker).
+    Args:
+        path (str): مسیر فایل قفل.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+def write_shared_state(path: str, data: dict) -> None:
+    """
+    انتشار وضعیتی که فقط worker رهبر محاسبه می‌کند برای workerهای دیگر (نوشتن اتمیک با rename).
+    Args:
+        path (str): مسیر فایل وضعیت.
+        data (dict): داده قابل سریال‌سازی با JSON.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"updated_at": time.time(), "data": data}, f)
+    os.replace(tmp_path, path)
+
+def read_shared_state(path: str, max_age: float) -> Optional[dict]:
+    """
+    خواندن وضعیت منتشرشده توسط write_shared_state.
+    Args:
+        path (str): مسیر فایل وضعیت.
+        max_age (float): حداکثر عمر قابل قبول، به ثانیه.
+    Returns:
+        Optional[dict]: داده یا None اگر فایل نباشد یا رهبر مدتی آن را به‌روز نکرده باشد.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if time.time() - state.get("updated_at", 0) > max_age:
+        return None
+    return state.get("data")
@@ -1,26 +1,60 @@
-import qrcode
+import asyncio
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from io import BytesIO
+from backend.utils.cache_utils import TTLCache, MISSING
 
-def generate_qr_code(data: str, file_path: str = None) -> BytesIO:
+# تنظیمات کش QR Code: لایه حافظه و لایه اختیاری دیسک
+QR_CACHE_SIZE = int(os.getenv("QR_CACHE_SIZE", "2048"))
+QR_CACHE_TTL = float(os.getenv("QR_CACHE_TTL", "86400"))
+QR_CACHE_DIR = os.getenv("QR_CACHE_DIR")  # اگر تنظیم نشود، کش دیسکی غیرفعال است
+QR_WORKERS = int(os.getenv("QR_WORKERS", "2"))
+
+# سطوح تصحیح خطا؛ ثابت متناظر در qrcode.constants با نام ERROR_CORRECT_<سطح> است
+ERROR_CORRECTION_LEVELS = ("L", "M", "Q", "H")
+
+qr_cache = TTLCache(maxsize=QR_CACHE_SIZE, ttl=QR_CACHE_TTL, name="qr_codes")
+
+_executor = None
+
+# رندرهای در جریان به ازای کلید؛ درخواست‌های همزمان یک QR منتظر همان یک رندر می‌مانند
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def _build_qr(data: str, box_size: int, border: int, error_correction: str):
+    # ایمپورت تنبل: qrcode (و PIL) فقط با اولین QR ساخته‌شده بارگذاری می‌شوند
+    import qrcode
+
+    if error_correction not in ERROR_CORRECTION_LEVELS:
+        raise KeyError(error_correction)
+    qr = qrcode.QRCode(
+        version=1,  # تنظیم پیچیدگی QR Code (1 ساده‌ترین)
+        error_correction=getattr(qrcode.constants, f"ERROR_CORRECT_{error_correction}"),
+        box_size=box_size,  # اندازه هر خانه در QR Code
+        border=border,  # میزان فاصله حاشیه
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.make_image(fill="black", back_color="white")
+
+def generate_qr_code(data: str, file_path: str = None, box_size: int = 10, border: int = 4,
+                     error_correction: str = "L") -> BytesIO:
     """
     تولید QR Code برای داده ورودی.
     Args:
         data (str): داده‌ای که به QR Code تبدیل می‌شود.
         file_path (str): (اختیاری) مسیر ذخیره QR Code به‌عنوان فایل.
+        box_size (int): اندازه هر خانه به پیکسل.
+        border (int): میزان فاصله حاشیه.
+        error_correction (str): سطح تصحیح خطا (L, M, Q, H).
     Returns:
         BytesIO: شیء QR Code به صورت بایت‌ها.
     """
-    qr = qrcode.QRCode(
-        version=1,  # تنظیم پیچیدگی QR Code (1 ساده‌ترین)
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size=10,  # اندازه هر خانه در QR Code
-        border=4,  # میزان فاصله حاشیه
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
+    img = _build_qr(data, box_size, border, error_correction)
 
-    img = qr.make_image(fill="black", back_color="white")
-    
     if file_path:
         img.save(file_path)  # ذخیره به‌عنوان فایل
         return None
@@ -29,3 +63,121 @@ def generate_qr_code(data: str, file_path: str = None) -> BytesIO:
         img.save(buffer, format="PNG")
         buffer.seek(0)
         return buffer
+
+def qr_cache_key(data: str, box_size: int = 10, border: int = 4, error_correction: str = "L") -> str:
+    """
+    کلید محتوایی QR Code؛ برای ورودی یکسان همیشه تصویر یکسان تولید می‌شود.
+    Args:
+        data (str): داده QR Code.
+        box_size (int): اندازه هر خانه.
+        border (int): فاصله حاشیه.
+        error_correction (str): سطح تصحیح خطا.
+    Returns:
+        str: هش SHA256 پارامترها.
+    """
+    digest = hashlib.sha256()
+    digest.update(f"{box_size}:{border}:{error_correction}:".encode())
+    digest.update(data.encode("utf-8"))
+    return digest.hexdigest()
+
+def _disk_path(key: str) -> str:
+    return os.path.join(QR_CACHE_DIR, key[:2], f"{key}.png")
+
+def _load_or_render(key: str, data: str, box_size: int, border: int, error_correction: str) -> bytes:
+    if QR_CACHE_DIR:
+        path = _disk_path(key)
+        try:
+            with open(path, "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            pass
+
+    png = generate_qr_code(data, box_size=box_size, border=border, error_correction=error_correction).getvalue()
+
+    if QR_CACHE_DIR:
+        path = _disk_path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # نوشتن اتمیک با فایل موقت یکتا تا خواننده‌ها و نویسنده‌های همزمان فایل نیمه‌کاره نبینند
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".qr.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(png)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    return png
+
+def _claim(key: str) -> tuple:
+    """
+    Returns:
+        tuple: (Future رندر، آیا این فراخواننده باید رندر را انجام دهد).
+    """
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            return future, False
+        future = _inflight[key] = Future()
+        return future, True
+
+def _render_into(future: Future, key: str, data: str, box_size: int, border: int, error_correction: str) -> None:
+    try:
+        png = _load_or_render(key, data, box_size, border, error_correction)
+        qr_cache.set(key, png)
+    except BaseException as e:
+        future.set_exception(e)
+    else:
+        future.set_result(png)
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+def get_qr_png(data: str, box_size: int = 10, border: int = 4, error_correction: str = "L") -> tuple:
+    """
+    دریافت تصویر PNG یک QR Code از کش (حافظه، سپس دیسک) یا تولید آن.
+    Args:
+        data (str): داده QR Code.
+        box_size (int): اندازه هر خانه.
+        border (int): فاصله حاشیه.
+        error_correction (str): سطح تصحیح خطا.
+    Returns:
+        tuple: (کلید محتوایی، بایت‌های PNG)
+    """
+    key = qr_cache_key(data, box_size, border, error_correction)
+    png = qr_cache.get(key)
+    if png is MISSING:
+        future, owner = _claim(key)
+        if owner:
+            _render_into(future, key, data, box_size, border, error_correction)
+        png = future.result()
+    return key, png
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=QR_WORKERS, thread_name_prefix="qr-render")
+    return _executor
+
+async def get_qr_png_async(data: str, box_size: int = 10, border: int = 4, error_correction: str = "L") -> tuple:
+    """
+    نسخه async از get_qr_png؛ در صورت miss، تولید تصویر در worker pool انجام می‌شود
+    تا event loop مسدود نشود. miss‌های همزمان یک کلید فقط یک بار رندر می‌شوند.
+    Returns:
+        tuple: (کلید محتوایی، بایت‌های PNG)
+    """
+    key = qr_cache_key(data, box_size, border, error_correction)
+    png = qr_cache.get(key)
+    if png is MISSING:
+        future, owner = _claim(key)
+        if owner:
+            _get_executor().submit(_render_into, future, key, data, box_size, border, error_correction)
+        png = await asyncio.wrap_future(future)
+    return key, png
+
+def shutdown_qr_workers() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
@@ -0,0 +1,179 @@
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+from starlette.routing import compile_path
+from backend.utils.metrics_utils import registry
+
+# تنظیمات محدودیت نرخ مسیرهای عمومی
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_CAPACITY = int(os.getenv("RATE_LIMIT_CAPACITY", "100000"))  # حداکثر تعداد bucketهای نگهداری‌شده
+
+def parse_rate(value: str) -> Optional[tuple]:
+    """
+    تبدیل محدودیت به شکل "تعداد/ثانیه" (مثلا "30/60") به نرخ پر شدن و ظرفیت bucket.
+    Args:
+        value (str): محدودیت؛ "0" یا رشته خالی یعنی بدون محدودیت.
+    Returns:
+        Optional[tuple]: (توکن در ثانیه، ظرفیت) یا None.
+    """
+    value = (value or "").strip()
+    if value in ("", "0"):
+        return None
+    count, _, period = value.partition("/")
+    count = float(count)
+    period = float(period or 1)
+    if count <= 0 or period <= 0:
+        return None
+    return count / period, count
+
+class TokenBucketTable:
+    """
+    bucketهای توکن با ظرفیت ثابت و حذف LRU؛ هر دسترسی O(1) است و حافظه با تعداد
+    کلیدهای مهاجم رشد نمی‌کند. فقط از event loop استفاده می‌شود، پس قفل لازم ندارد.
+    bucket حذف‌شده در بازگشت دوباره پر شروع می‌کند؛ ظرفیت باید بسیار بیشتر از
+    تعداد کلاینت‌های فعال همزمان باشد.
+    Args:
+        capacity (int): حداکثر تعداد bucketها.
+    """
+
+    def __init__(self, capacity: int = RATE_LIMIT_CAPACITY):
+        self.capacity = capacity
+        self.evictions = 0
+        self._buckets = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, limits: list, now: float = None) -> float:
+        """
+        برداشتن یک توکن از همه bucketهای درخواست، فقط اگر همه توکن داشته باشند.
+        Args:
+            limits (list): فهرست (کلید، توکن در ثانیه، ظرفیت).
+            now (float): زمان فعلی (monotonic).
+        Returns:
+            float: صفر در صورت مجاز بودن، وگرنه ثانیه‌های لازم تا توکن بعدی.
+        """
+        now = time.monotonic() if now is None else now
+        buckets = self._buckets
+        entries = []
+        wait = 0.0
+        for key, rate, burst in limits:
+            entry = buckets.get(key)
+            if entry is None:
+                entry = buckets[key] = [burst, now]
+                if len(buckets) > self.capacity:
+                    buckets.popitem(last=False)
+                    self.evictions += 1
+            else:
+                buckets.move_to_end(key)
+                entry[0] = min(burst, entry[0] + (now - entry[1]) * rate)
+                entry[1] = now
+            if entry[0] < 1:
+                wait = max(wait, (1 - entry[0]) / rate)
+            entries.append(entry)
+        if wait:
+            return wait
+        for entry in entries:
+            entry[0] -= 1
+        return 0.0
+
+class RateLimitRule(NamedTuple):
+    """
+    محدودیت یک مسیر؛ keys نام منبع هر bucket است: "ip" برای آدرس کلاینت یا نام پارامتر مسیر.
+    """
+    name: str
+    path: str
+    methods: tuple
+    limits: tuple  # (منبع کلید، نرخ، ظرفیت)
+
+def build_rule(name: str, path: str, methods: tuple, **limits) -> Optional[RateLimitRule]:
+    """
+    ساخت قاعده از رشته‌های محدودیت؛ منابع بدون محدودیت حذف می‌شوند.
+    Args:
+        name (str): نام قاعده (برچسب متریک‌ها).
+        path (str): الگوی مسیر به سبک FastAPI (مثلا /subscription/{user_uuid}).
+        methods (tuple): متدهای HTTP.
+        limits: منبع کلید به محدودیت، مثلا ip="120/60".
+    Returns:
+        Optional[RateLimitRule]: قاعده یا None اگر هیچ محدودیتی فعال نباشد.
+    """
+    parsed = []
+    for source, value in limits.items():
+        rate = parse_rate(value)
+        if rate is not None:
+            parsed.append((source, *rate))
+    if not parsed:
+        return None
+    return RateLimitRule(name, path, tuple(methods), tuple(parsed))
+
+# محدودیت‌های پیش‌فرض مسیرهای بدون احراز هویت (قابل تغییر با متغیرهای محیطی، "0" برای غیرفعال کردن)
+DEFAULT_RULES = [rule for rule in (
+    build_rule("subscription", "/subscription/{user_uuid}", ("GET",),
+               ip=os.getenv("RATE_LIMIT_SUBSCRIPTION_IP", "120/60"),
+               user_uuid=os.getenv("RATE_LIMIT_SUBSCRIPTION_UUID", "30/60")),
+    build_rule("user_settings", "/settings/subscription/{user_uuid}", ("GET",),
+               ip=os.getenv("RATE_LIMIT_CONFIG_IP", "60/60"),
+               user_uuid=os.getenv("RATE_LIMIT_CONFIG_UUID", "30/60")),
+    build_rule("copy_config", "/settings/copy-config/{user_uuid}", ("GET",),
+               ip=os.getenv("RATE_LIMIT_CONFIG_IP", "60/60"),
+               user_uuid=os.getenv("RATE_LIMIT_CONFIG_UUID", "30/60")),
+    build_rule("generate_qr", "/domains/generate-qr", ("GET",),
+               ip=os.getenv("RATE_LIMIT_QR_IP", "30/60")),
+    build_rule("validate_urls", "/domains/validate-urls", ("POST",),
+               ip=os.getenv("RATE_LIMIT_VALIDATE_URLS_IP", "10/60")),
+    build_rule("generate_qr_bulk", "/domains/generate-qr/bulk", ("POST",),
+               ip=os.getenv("RATE_LIMIT_QR_BULK_IP", "5/60")),
+    build_rule("backup_snapshot", "/system/backup/snapshot", ("POST",),
+               ip=os.getenv("RATE_LIMIT_BACKUP_IP", "2/3600")),
+    build_rule("backup_export", "/system/backup/export", ("GET",),
+               ip=os.getenv("RATE_LIMIT_BACKUP_IP", "2/3600")),
+) if rule is not None]
+
+class RateLimiter:
+    """
+    تطبیق درخواست با قاعده‌ها و اعمال محدودیت روی جدول مشترک bucketها.
+    Args:
+        rules (list): قاعده‌ها؛ اولین قاعده منطبق اعمال می‌شود.
+        capacity (int): ظرفیت جدول bucketها.
+    """
+
+    def __init__(self, rules: list = None, capacity: int = RATE_LIMIT_CAPACITY):
+        self.rules = [(rule, compile_path(rule.path)[0]) for rule in (DEFAULT_RULES if rules is None else rules)]
+        self.table = TokenBucketTable(capacity)
+
+    def check(self, method: str, path: str, client: str) -> tuple:
+        """
+        Args:
+            method (str): متد HTTP.
+            path (str): مسیر درخواست.
+            client (str): آدرس کلاینت.
+        Returns:
+            tuple: (نام قاعده یا None، ثانیه‌های انتظار؛ صفر یعنی مجاز).
+        """
+        for rule, regex in self.rules:
+            if method not in rule.methods:
+                continue
+            match = regex.match(path)
+            if match is None:
+                continue
+            params = match.groupdict()
+            limits = []
+            for source, rate, burst in rule.limits:
+                value = client if source == "ip" else params.get(source, "")[:64]
+                limits.append(((rule.name, source, value), rate, burst))
+            return rule.name, self.table.acquire(limits)
+        return None, 0.0
+
+def retry_after_header(wait: float) -> str:
+    return str(max(1, math.ceil(wait)))
+
+rate_limiter = RateLimiter()
+
+rate_limit_requests_total = registry.counter(
+    "rate_limit_requests_total", "Requests checked by the rate limiter.", ("rule", "result"))
+registry.callback_gauge(
+    "rate_limit_buckets", "Token buckets currently held.", lambda: [((), len(rate_limiter.table))])
+registry.callback_gauge(
+    "rate_limit_bucket_evictions", "Token buckets evicted by LRU since start.", lambda: [((), rate_limiter.table.evictions)])
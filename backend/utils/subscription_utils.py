@@ -0,0 +1,128 @@
+import base64
+import hashlib
+import json
+from typing import NamedTuple
+from urllib.parse import quote, urlencode
+from backend.utils.time_utils import as_utc
+from backend.utils.xray_utils import shadowsocks_password
+
+class SubscriptionBundle(NamedTuple):
+    etag: str
+    body: bytes
+
+def _stream_params(inbound: dict) -> dict:
+    """
+    استخراج پارامترهای انتقال (network، TLS، مسیر ws و ...) از streamSettings یک inbound.
+    Args:
+        inbound (dict): تنظیمات inbound.
+    Returns:
+        dict: پارامترهای غیرخالی لینک.
+    """
+    stream = inbound.get("streamSettings") or {}
+    network = stream.get("network", "tcp")
+    security = stream.get("security", "none")
+    params = {"type": network, "security": security}
+    if network == "ws":
+        ws = stream.get("wsSettings") or {}
+        params["path"] = ws.get("path", "/")
+        params["host"] = (ws.get("headers") or {}).get("Host", "")
+    elif network == "grpc":
+        params["serviceName"] = (stream.get("grpcSettings") or {}).get("serviceName", "")
+    elif network in ("h2", "http"):
+        http = stream.get("httpSettings") or {}
+        params["path"] = http.get("path", "/")
+        params["host"] = ",".join(http.get("host", []))
+    if security in ("tls", "reality"):
+        tls = stream.get(f"{security}Settings") or {}
+        params["sni"] = tls.get("serverName") or next(iter(tls.get("serverNames", [])), "")
+    return {key: value for key, value in params.items() if value}
+
+def _remark(user: dict, inbound: dict, host: str) -> str:
+    return f"{user['username']}-{inbound['tag']}@{host}"
+
+def vmess_link(inbound: dict, host: str, user: dict) -> str:
+    params = _stream_params(inbound)
+    config = {
+        "v": "2",
+        "ps": _remark(user, inbound, host),
+        "add": host,
+        "port": str(inbound["port"]),
+        "id": user["uuid"],
+        "aid": "0",
+        "scy": "auto",
+        "net": params.get("type", "tcp"),
+        "type": "none",
+        "host": params.get("host", ""),
+        "path": params.get("path", params.get("serviceName", "")),
+        "tls": "" if params.get("security", "none") == "none" else params["security"],
+        "sni": params.get("sni", ""),
+    }
+    encoded = base64.b64encode(json.dumps(config, separators=(",", ":")).encode()).decode()
+    return f"vmess://{encoded}"
+
+def vless_link(inbound: dict, host: str, user: dict) -> str:
+    params = {"encryption": "none", **_stream_params(inbound)}
+    return f"vless://{user['uuid']}@{host}:{inbound['port']}?{urlencode(params)}#{quote(_remark(user, inbound, host))}"
+
+def trojan_link(inbound: dict, host: str, user: dict) -> str:
+    params = _stream_params(inbound)
+    return f"trojan://{quote(user['uuid'])}@{host}:{inbound['port']}?{urlencode(params)}#{quote(_remark(user, inbound, host))}"
+
+def shadowsocks_link(inbound: dict, host: str, user: dict) -> str:
+    # قالب SIP002: ss://base64url(method:password)@host:port#remark
+    method = inbound.get("settings", {}).get("method", "aes-128-gcm")
+    userinfo = f"{method}:{shadowsocks_password(method, user['uuid'])}"
+    encoded = base64.urlsafe_b64encode(userinfo.encode()).decode().rstrip("=")
+    return f"ss://{encoded}@{host}:{inbound['port']}#{quote(_remark(user, inbound, host))}"
+
+LINK_BUILDERS = {
+    "vmess": vmess_link,
+    "vless": vless_link,
+    "trojan": trojan_link,
+    "shadowsocks": shadowsocks_link,
+}
+
+def render_links(inbounds: list, hosts: list, user: dict) -> list:
+    """
+    ساخت لینک‌های اشتراک یک کاربر برای همه ترکیب‌های inbound × دامنه.
+    Args:
+        inbounds (list): inboundهای مدیریت‌شده Xray.
+        hosts (list): دامنه‌ها یا آدرس‌های سرور.
+        user (dict): اطلاعات کاربر (uuid و username).
+    Returns:
+        list: لینک‌های share.
+    """
+    links = []
+    for inbound in inbounds:
+        builder = LINK_BUILDERS.get(inbound.get("protocol"))
+        if builder is None or "port" not in inbound:
+            continue
+        for host in hosts:
+            links.append(builder(inbound, host, user))
+    return links
+
+def build_bundle(links: list) -> SubscriptionBundle:
+    """
+    کدگذاری base64 لینک‌ها (قالب رایج کلاینت‌ها) و ساخت ETag از هش محتوا.
+    Args:
+        links (list): لینک‌های share.
+    Returns:
+        SubscriptionBundle: ETag و بدنه پاسخ.
+    """
+    body = base64.b64encode("\n".join(links).encode())
+    return SubscriptionBundle(etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"', body=body)
+
+def subscription_userinfo(user: dict, upload: int = 0, download: int = 0) -> str:
+    """
+    مقدار هدر subscription-userinfo که کلاینت‌ها برای نمایش سهمیه و انقضا می‌خوانند.
+    Args:
+        user (dict): اطلاعات کاربر (traffic_limit به مگابایت و expires_at).
+        upload (int): ترافیک ارسالی به بایت.
+        download (int): ترافیک دریافتی به بایت.
+    Returns:
+        str: مقدار هدر.
+    """
+    total = user["traffic_limit"] * 1048576
+    expires_at = user.get("expires_at")
+    expire = int(as_utc(expires_at).timestamp()) if expires_at else 0
+    return f"upload={upload}; download={download}; total={total}; expire={expire}"
@@ -0,0 +1,168 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger("app_logger")
+
+# تنظیمات نمونه‌برداری از منابع سیستم
+SYSTEM_SAMPLE_INTERVAL = float(os.getenv("SYSTEM_SAMPLE_INTERVAL", "5"))  # به ثانیه
+SYSTEM_HISTORY_SIZE = int(os.getenv("SYSTEM_HISTORY_SIZE", "720"))  # یک ساعت با فاصله ۵ ثانیه
+SYSTEM_DISK_PATH = os.getenv("SYSTEM_DISK_PATH", "/")
+
+def read_cpu_times() -> Optional[tuple]:
+    """
+    خواندن زمان‌های تجمعی CPU از /proc/stat.
+    Returns:
+        Optional[tuple]: (زمان بیکار، زمان کل) یا None اگر در دسترس نباشد.
+    """
+    try:
+        with open("/proc/stat", "r") as file:
+            fields = [int(value) for value in file.readline().split()[1:]]
+    except (FileNotFoundError, ValueError):
+        return None
+    idle = fields[3] + (fields[4] if len(fields) > 4 else 0)  # idle + iowait
+    return idle, sum(fields)
+
+def read_memory_usage() -> Optional[float]:
+    """
+    درصد استفاده از حافظه بر اساس MemTotal و MemAvailable در /proc/meminfo.
+    """
+    values = {}
+    try:
+        with open("/proc/meminfo", "r") as file:
+            for line in file:
+                key, _, rest = line.partition(":")
+                if key in ("MemTotal", "MemAvailable"):
+                    values[key] = int(rest.split()[0])
+                    if len(values) == 2:
+                        break
+    except FileNotFoundError:
+        return None
+    if not values.get("MemTotal") or "MemAvailable" not in values:
+        return None
+    return 100.0 * (values["MemTotal"] - values["MemAvailable"]) / values["MemTotal"]
+
+def read_disk_usage(path: str = SYSTEM_DISK_PATH) -> Optional[float]:
+    """
+    درصد استفاده از دیسک با statvfs.
+    """
+    try:
+        stat = os.statvfs(path)
+    except (OSError, AttributeError):
+        return None
+    total = stat.f_blocks * stat.f_frsize
+    if not total:
+        return None
+    used = (stat.f_blocks - stat.f_bfree) * stat.f_frsize
+    return 100.0 * used / (used + stat.f_bavail * stat.f_frsize)
+
+def read_network_bytes() -> Optional[int]:
+    """
+    مجموع بایت‌های دریافتی و ارسالی همه اینترفیس‌ها (به جز loopback) از /proc/net/dev.
+    """
+    total = 0
+    try:
+        with open("/proc/net/dev", "r") as file:
+            for line in file.readlines()[2:]:
+                interface, _, data = line.partition(":")
+                if interface.strip() == "lo":
+                    continue
+                fields = data.split()
+                total += int(fields[0]) + int(fields[8])
+    except (FileNotFoundError, ValueError, IndexError):
+        return None
+    return total
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+class SystemSampler:
+    """
+    نمونه‌برداری پس‌زمینه از CPU، RAM، دیسک و پهنای باند در یک بافر حلقوی با اندازه ثابت.
+    خواندن آخرین نمونه O(1) است و هزینه نمونه‌برداری به تعداد خواننده‌ها بستگی ندارد.
+    Args:
+        interval (float): فاصله نمونه‌برداری، به ثانیه.
+        history_size (int): تعداد نمونه‌های نگهداری‌شده.
+        disk_path (str): مسیری که استفاده دیسک آن گزارش می‌شود.
+    """
+
+    def __init__(self, interval: float = SYSTEM_SAMPLE_INTERVAL, history_size: int = SYSTEM_HISTORY_SIZE,
+                 disk_path: str = SYSTEM_DISK_PATH):
+        self.interval = interval
+        self.disk_path = disk_path
+        self._history = deque(maxlen=history_size)
+        self._latest = None
+        self._previous_cpu = read_cpu_times()
+        self._previous_net = read_network_bytes()
+        self._previous_time = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self) -> dict:
+        """
+        گرفتن یک نمونه و افزودن آن به بافر.
+        Returns:
+            dict: نمونه شامل cpu_usage، ram_usage، disk_usage (درصد) و bandwidth_speed (Mbps).
+        """
+        now = time.monotonic()
+        elapsed = now - self._previous_time
+        cpu = read_cpu_times()
+        net = read_network_bytes()
+
+        cpu_usage = None
+        if cpu is not None and self._previous_cpu is not None:
+            total = cpu[1] - self._previous_cpu[1]
+            if total > 0:
+                cpu_usage = 100.0 * (1 - (cpu[0] - self._previous_cpu[0]) / total)
+
+        bandwidth_speed = None
+        if net is not None and self._previous_net is not None and elapsed > 0:
+            bandwidth_speed = max(net - self._previous_net, 0) * 8 / 1_000_000 / elapsed
+
+        self._previous_cpu, self._previous_net, self._previous_time = cpu, net, now
+        snapshot = {
+            "timestamp": time.time(),
+            "cpu_usage": _round(cpu_usage),
+            "ram_usage": _round(read_memory_usage()),
+            "disk_usage": _round(read_disk_usage(self.disk_path)),
+            "bandwidth_speed": _round(bandwidth_speed),
+        }
+        self._history.append(snapshot)
+        self._latest = snapshot
+        return snapshot
+
+    def latest(self) -> Optional[dict]:
+        return self._latest
+
+    def history(self, limit: Optional[int] = None) -> list:
+        """
+        Args:
+            limit (int): (اختیاری) حداکثر تعداد نمونه‌های اخیر.
+        Returns:
+            list: نمونه‌ها از قدیمی به جدید.
+        """
+        items = list(self._history)
+        return items[-limit:] if limit else items
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception:
+                logger.exception("System sampling failed")
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self.sample()
+            self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,50 @@
+import os
+from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
+
+# مسیر تمپلت‌ها و تنظیمات کامپایل
+TEMPLATES_DIR = os.getenv("TEMPLATES_DIR", "backend/templates")
+TEMPLATES_AUTO_RELOAD = os.getenv("TEMPLATES_AUTO_RELOAD", "0") == "1"  # برای توسعه
+TEMPLATES_CACHE_DIR = os.getenv("TEMPLATES_CACHE_DIR")  # bytecode کامپایل‌شده بین ری‌استارت‌ها
+# حداقل اندازه هر تکه خروجی در رندر استریمی (بایت)
+TEMPLATES_STREAM_BUFFER = int(os.getenv("TEMPLATES_STREAM_BUFFER", "16384"))
+
+# نمونه مشترک تمپلت‌ها برای app و همه روترها
+templates = Jinja2Templates(directory=TEMPLATES_DIR, auto_reload=TEMPLATES_AUTO_RELOAD)
+if TEMPLATES_CACHE_DIR:
+    os.makedirs(TEMPLATES_CACHE_DIR, exist_ok=True)
+    templates.env.bytecode_cache = FileSystemBytecodeCache(TEMPLATES_CACHE_DIR)
+
+def precompile_templates() -> int:
+    """
+    کامپایل همه تمپلت‌ها و نگهداری آن‌ها در کش محیط Jinja تا اولین درخواست هزینه کامپایل نپردازد.
+    Returns:
+        int: تعداد تمپلت‌های کامپایل‌شده.
+    """
+    names = templates.env.list_templates(extensions=["html"])
+    for name in names:
+        templates.env.get_template(name)
+    return len(names)
+
+def stream_template(name: str, context: dict, buffer_size: int = TEMPLATES_STREAM_BUFFER):
+    """
+    رندر تدریجی تمپلت با generate() جینجا؛ قطعه‌های کوچک خروجی تا buffer_size بایت جمع
+    می‌شوند تا StreamingResponse برای هر قطعه یک بار به threadpool نرود.
+    Args:
+        name (str): نام تمپلت.
+        context (dict): متغیرهای تمپلت.
+        buffer_size (int): حداقل اندازه هر تکه ارسالی.
+    Returns:
+        Iterator[bytes]: تکه‌های UTF-8 صفحه.
+    """
+    parts = []
+    size = 0
+    for part in templates.env.get_template(name).generate(context):
+        parts.append(part)
+        size += len(part)
+        if size >= buffer_size:
+            yield "".join(parts).encode("utf-8")
+            parts = []
+            size = 0
+    if parts:
+        yield "".join(parts).encode("utf-8")
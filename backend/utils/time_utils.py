@@ -1,5 +1,6 @@
-from datetime import datetime, timedelta
-import pytz
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
 
 def format_datetime(dt: datetime, format: str = "%Y-%m-%d %H:%M:%S") -> str:
     """
@@ -31,5 +32,30 @@ def get_current_time(timezone: str = "UTC") -> datetime:
     Returns:
         datetime: زمان فعلی.
     """
-    tz = pytz.timezone(timezone)
-    return datetime.now(tz)
+    return datetime.now(ZoneInfo(timezone))
+
+def as_utc(dt: datetime) -> datetime:
+    """
+    تبدیل تاریخ به UTC آگاه از منطقه زمانی؛ تاریخ‌های بدون منطقه زمانی (مانند خروجی SQLite) UTC فرض می‌شوند.
+    Args:
+        dt (datetime): تاریخ و زمان.
+    Returns:
+        datetime: تاریخ با منطقه زمانی UTC.
+    """
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=dt_timezone.utc)
+    return dt.astimezone(dt_timezone.utc)
+
+def compute_expires_at(start: Optional[datetime], usage_duration: int) -> Optional[datetime]:
+    """
+    محاسبه زمان انقضای کاربر.
+    Args:
+        start (datetime): زمان شروع اشتراک؛ اگر None باشد زمان فعلی در نظر گرفته می‌شود.
+        usage_duration (int): مدت استفاده به دقیقه؛ صفر یعنی نامحدود.
+    Returns:
+        Optional[datetime]: زمان انقضا به UTC یا None برای اشتراک نامحدود.
+    """
+    if not usage_duration:
+        return None
+    start = as_utc(start) if start is not None else datetime.now(dt_timezone.utc)
+    return start + timedelta(minutes=usage_duration)
@@ -0,0 +1,258 @@
+import logging
+import os
+import threading
+import time
+from array import array
+from sqlalchemy import func
+from backend.utils.xray_utils import parse_client_email, parse_user_stat
+
+logger = logging.getLogger("app_logger")
+
+# تنظیمات جمع‌آوری ترافیک
+TRAFFIC_POLL_INTERVAL = float(os.getenv("TRAFFIC_POLL_INTERVAL", "1"))  # به ثانیه
+TRAFFIC_FLUSH_INTERVAL = float(os.getenv("TRAFFIC_FLUSH_INTERVAL", "30"))  # به ثانیه
+TRAFFIC_FLUSH_CHUNK_SIZE = 5000
+
+class TrafficAccumulator:
+    """
+    انباشت delta ترافیک در آرایه‌های فشرده که با id کاربر اندیس‌گذاری می‌شوند
+    (بدون ساخت شیء پایتون برای هر کاربر). اندازه آرایه‌ها تابع بزرگ‌ترین id است، پس idهای
+    بزرگ‌تر از max_user_id (مثلا ایمیل جعلی در آمار Xray) پذیرفته نمی‌شوند.
+    Args:
+        capacity (int): ظرفیت اولیه.
+        max_user_id (int): بزرگ‌ترین id قابل قبول؛ None یعنی بدون سقف.
+    """
+
+    def __init__(self, capacity: int = 1024, max_user_id: int = None):
+        self.max_user_id = max_user_id
+        self.rejected = 0
+        self._uplink = array("Q", bytes(8 * capacity))
+        self._downlink = array("Q", bytes(8 * capacity))
+        self._dirty = bytearray(capacity)
+        self._dirty_ids = array("l")
+        self._lock = threading.Lock()
+
+    def _grow(self, user_id: int) -> None:
+        capacity = len(self._dirty)
+        while capacity <= user_id:
+            capacity *= 2
+        extra = capacity - len(self._dirty)
+        self._uplink.frombytes(bytes(8 * extra))
+        self._downlink.frombytes(bytes(8 * extra))
+        self._dirty.extend(bytes(extra))
+
+    def accepts(self, user_id: int) -> bool:
+        return user_id >= 0 and (self.max_user_id is None or user_id <= self.max_user_id)
+
+    def add(self, user_id: int, uplink: int = 0, downlink: int = 0) -> bool:
+        """
+        Returns:
+            bool: آیا delta پذیرفته شد.
+        """
+        if not self.accepts(user_id):
+            self.rejected += 1
+            return False
+        with self._lock:
+            if user_id >= len(self._dirty):
+                self._grow(user_id)
+            self._uplink[user_id] += uplink
+            self._downlink[user_id] += downlink
+            if not self._dirty[user_id]:
+                self._dirty[user_id] = 1
+                self._dirty_ids.append(user_id)
+        return True
+
+    def drain(self) -> list:
+        """
+        برداشتن همه deltaهای انباشته و صفر کردن آن‌ها.
+        Returns:
+            list: لیست (user_id، uplink، downlink).
+        """
+        with self._lock:
+            rows = []
+            for user_id in self._dirty_ids:
+                rows.append((user_id, self._uplink[user_id], self._downlink[user_id]))
+                self._uplink[user_id] = 0
+                self._downlink[user_id] = 0
+                self._dirty[user_id] = 0
+            self._dirty_ids = array("l")
+            return rows
+
+    def __len__(self) -> int:
+        return len(self._dirty_ids)
+
+def upsert_usage(db, rows: list) -> None:
+    """
+    افزودن deltaهای ترافیک به جدول user_usage با یک upsert چندردیفی.
+    Args:
+        db (Session): سشن پایگاه داده.
+        rows (list): لیست (user_id، uplink، downlink).
+    """
+    from backend.models import UserUsage
+    table = UserUsage.__table__
+    params = [{"user_id": user_id, "uplink": uplink, "downlink": downlink} for user_id, uplink, downlink in rows]
+    dialect = db.get_bind().dialect.name
+
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={
+                "uplink": table.c.uplink + stmt.excluded.uplink,
+                "downlink": table.c.downlink + stmt.excluded.downlink,
+                "updated_at": func.now(),
+            },
+        )
+        db.execute(stmt, params)
+    elif dialect in ("mysql", "mariadb"):
+        from sqlalchemy.dialects.mysql import insert
+        stmt = insert(table)
+        stmt = stmt.on_duplicate_key_update(
+            uplink=table.c.uplink + stmt.inserted.uplink,
+            downlink=table.c.downlink + stmt.inserted.downlink,
+            updated_at=func.now(),
+        )
+        db.execute(stmt, params)
+    else:
+        existing = {user_id for (user_id,) in db.query(table.c.user_id).filter(table.c.user_id.in_([p["user_id"] for p in params]))}
+        updates = [p for p in params if p["user_id"] in existing]
+        inserts = [p for p in params if p["user_id"] not in existing]
+        for p in updates:
+            db.execute(
+                table.update().where(table.c.user_id == p["user_id"]).values(
+                    uplink=table.c.uplink + p["uplink"], downlink=table.c.downlink + p["downlink"], updated_at=func.now()
+                )
+            )
+        if inserts:
+            db.execute(table.insert(), inserts)
+
+class TrafficCollector:
+    """
+    جمع‌آوری دوره‌ای شمارنده‌های ترافیک کاربران از StatsService و ذخیره گروهی در پایگاه داده.
+    Args:
+        stats_api: شیء دارای query_user_traffic (XrayStatsApi یا InMemoryXrayStats).
+        session_factory: سازنده سشن sync پایگاه داده.
+        poll_interval (float): فاصله خواندن آمار، به ثانیه.
+        flush_interval (float): فاصله نوشتن در پایگاه داده، به ثانیه.
+        on_flush: (اختیاری) تابعی که پس از هر flush با لیست idهای به‌روزشده فراخوانی می‌شود.
+    """
+
+    def __init__(self, stats_api, session_factory, poll_interval: float = TRAFFIC_POLL_INTERVAL,
+                 flush_interval: float = TRAFFIC_FLUSH_INTERVAL, on_flush=None):
+        self.stats_api = stats_api
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.accumulator = TrafficAccumulator(max_user_id=0)
+        self.polls = 0
+        self.flushes = 0
+        self.db_writes = 0
+        self.dropped_users = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh_max_user_id(self) -> int:
+        """
+        به‌روزرسانی سقف id پذیرفته‌شده انباشتگر از بزرگ‌ترین id جدول users.
+        """
+        from backend.models import User
+        db = self.session_factory()
+        try:
+            self.accumulator.max_user_id = db.query(func.max(User.id)).scalar() or 0
+        finally:
+            db.close()
+        return self.accumulator.max_user_id
+
+    def poll(self) -> None:
+        refreshed = False
+        for name, value in self.stats_api.query_user_traffic(reset=True):
+            if not value:
+                continue
+            parsed = parse_user_stat(name)
+            if parsed is None:
+                continue
+            email, direction = parsed
+            user_id = parse_client_email(email)
+            if user_id is None:
+                continue
+            # کاربر تازه ساخته‌شده بزرگ‌تر از سقف فعلی است؛ سقف حداکثر یک بار در هر poll خوانده می‌شود
+            if not refreshed and not self.accumulator.accepts(user_id) and user_id >= 0:
+                refreshed = True
+                self.refresh_max_user_id()
+            if direction == "uplink":
+                self.accumulator.add(user_id, uplink=value)
+            else:
+                self.accumulator.add(user_id, downlink=value)
+        self.polls += 1
+
+    def flush(self) -> int:
+        """
+        نوشتن deltaهای انباشته در جدول user_usage.
+        Returns:
+            int: تعداد کاربران به‌روزشده.
+        """
+        from backend.models import User
+        rows = self.accumulator.drain()
+        if not rows:
+            return 0
+        db = self.session_factory()
+        try:
+            # ردیف کاربران حذف‌شده کل upsert را با خطای کلید خارجی شکست می‌دهد
+            existing = []
+            for start in range(0, len(rows), TRAFFIC_FLUSH_CHUNK_SIZE):
+                chunk = rows[start:start + TRAFFIC_FLUSH_CHUNK_SIZE]
+                ids = {user_id for (user_id,) in db.query(User.id).filter(User.id.in_([row[0] for row in chunk]))}
+                existing.extend(row for row in chunk if row[0] in ids)
+            if len(existing) < len(rows):
+                self.dropped_users += len(rows) - len(existing)
+                logger.warning("Dropped traffic of %d unknown users", len(rows) - len(existing))
+            rows = existing
+            for start in range(0, len(rows), TRAFFIC_FLUSH_CHUNK_SIZE):
+                upsert_usage(db, rows[start:start + TRAFFIC_FLUSH_CHUNK_SIZE])
+                self.db_writes += 1
+            db.commit()
+        except Exception:
+            db.rollback()
+            # deltaها دور ریخته نمی‌شوند و در flush بعدی دوباره تلاش می‌شود
+            for user_id, uplink, downlink in rows:
+                self.accumulator.add(user_id, uplink, downlink)
+            raise
+        finally:
+            db.close()
+        self.flushes += 1
+        if self.on_flush is not None:
+            self.on_flush([user_id for user_id, _, _ in rows])
+        return len(rows)
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.poll()
+                if time.monotonic() - last_flush >= self.flush_interval:
+                    last_flush = time.monotonic()
+                    self.flush()
+            except Exception:
+                logger.exception("Traffic collection failed")
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Final traffic flush failed")
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self.refresh_max_user_id()
+            self._thread = threading.Thread(target=self._run, name="traffic-collector", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=10)
+            self._thread = None
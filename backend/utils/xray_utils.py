@@ -0,0 +1,398 @@
+import base64
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import tempfile
+import threading
+from typing import Optional
+
+logger = logging.getLogger("app_logger")
+
+# تنظیمات اتصال به Xray
+XRAY_CONFIG_PATH = os.getenv("XRAY_CONFIG_PATH", "/etc/xray/config.json")
+XRAY_BINARY = os.getenv("XRAY_BINARY", "/usr/local/bin/xray/xray")
+XRAY_API_SERVER = os.getenv("XRAY_API_SERVER", "127.0.0.1:10085")
+XRAY_SYNC_DEBOUNCE = float(os.getenv("XRAY_SYNC_DEBOUNCE", "2"))  # به ثانیه
+
+# پروتکل‌هایی که لیست کاربر (clients) دارند
+CLIENT_PROTOCOLS = ("vmess", "vless", "trojan", "shadowsocks")
+
+# طول کلید متدهای Shadowsocks 2022 به بایت
+SS2022_KEY_SIZES = {
+    "2022-blake3-aes-128-gcm": 16,
+    "2022-blake3-aes-256-gcm": 32,
+    "2022-blake3-chacha20-poly1305": 32,
+}
+
+# تعداد ایمیل در هر فراخوانی rmu تا طول خط فرمان محدود بماند
+REMOVE_BATCH_SIZE = 500
+
+def client_email(user_id: int, username: str) -> str:
+    """
+    ساخت ایمیل کلاینت Xray؛ id کاربر در ابتدای آن قرار می‌گیرد تا آمار ترافیک قابل نگاشت باشد.
+    Args:
+        user_id (int): شناسه کاربر.
+        username (str): نام کاربر.
+    Returns:
+        str: ایمیل کلاینت، مثلا 12.alice
+    """
+    return f"{user_id}.{username}"
+
+def parse_client_email(email: str) -> Optional[int]:
+    """
+    استخراج id کاربر از ایمیل کلاینت Xray.
+    Args:
+        email (str): ایمیل کلاینت.
+    Returns:
+        Optional[int]: شناسه کاربر یا None برای ایمیل‌های ناشناخته.
+    """
+    user_id, _, _ = email.partition(".")
+    return int(user_id) if user_id.isdigit() else None
+
+def shadowsocks_password(method: str, user_uuid: str) -> str:
+    """
+    ساخت رمز Shadowsocks کاربر از روی UUID؛ برای متدهای 2022 یک کلید base64 با طول مناسب.
+    Args:
+        method (str): متد رمزنگاری.
+        user_uuid (str): UUID کاربر.
+    Returns:
+        str: رمز کاربر.
+    """
+    key_size = SS2022_KEY_SIZES.get(method)
+    if key_size is None:
+        return user_uuid
+    return base64.b64encode(hashlib.sha256(user_uuid.encode()).digest()[:key_size]).decode()
+
+def build_client(inbound: dict, user_uuid: str, email: str) -> dict:
+    """
+    ساخت ورودی clients یک کاربر برای یک inbound.
+    Args:
+        inbound (dict): تنظیمات inbound.
+        user_uuid (str): UUID کاربر.
+        email (str): ایمیل کلاینت.
+    Returns:
+        dict: تنظیمات کلاینت.
+    """
+    protocol = inbound["protocol"]
+    if protocol in ("vmess", "vless"):
+        return {"id": user_uuid, "email": email}
+    if protocol == "trojan":
+        return {"password": user_uuid, "email": email}
+    method = inbound.get("settings", {}).get("method", "aes-128-gcm")
+    return {"method": method, "password": shadowsocks_password(method, user_uuid), "email": email}
+
+def managed_inbounds(config: dict) -> list:
+    """
+    inboundهایی که کاربران پنل به آن‌ها اضافه می‌شوند (دارای tag و پروتکل کاربرمحور).
+    """
+    return [
+        inbound for inbound in config.get("inbounds", [])
+        if inbound.get("tag") and inbound.get("protocol") in CLIENT_PROTOCOLS
+    ]
+
+def load_xray_config(path: str = XRAY_CONFIG_PATH) -> dict:
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+def write_xray_config(config: dict, path: str = XRAY_CONFIG_PATH) -> None:
+    """
+    نوشتن اتمیک فایل کانفیگ Xray (فایل موقت و سپس جایگزینی).
+    """
+    directory = os.path.dirname(path) or "."
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".config.", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as file:
+            json.dump(config, file, indent=4)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class XrayCliApi:
+    """
+    افزودن/حذف کلاینت از طریق HandlerService با دستور `xray api` (بدون ری‌استارت Xray).
+    """
+
+    def __init__(self, binary: str = XRAY_BINARY, server: str = XRAY_API_SERVER):
+        self.binary = binary
+        self.server = server
+
+    def add_clients(self, inbounds: list) -> None:
+        """
+        Args:
+            inbounds (list): inboundها با tag، protocol و settings.clients کلاینت‌های جدید.
+        """
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as file:
+            json.dump({"inbounds": inbounds}, file)
+            path = file.name
+        try:
+            subprocess.run([self.binary, "api", "adu", f"--server={self.server}", path], check=True, capture_output=True)
+        finally:
+            os.remove(path)
+
+    def remove_clients(self, tag: str, emails: list) -> None:
+        for start in range(0, len(emails), REMOVE_BATCH_SIZE):
+            batch = emails[start:start + REMOVE_BATCH_SIZE]
+            subprocess.run(
+                [self.binary, "api", "rmu", f"--server={self.server}", f"-tag={tag}", *batch],
+                check=True, capture_output=True,
+            )
+
+def parse_user_stat(name: str):
+    """
+    تجزیه نام آمار کاربر Xray، مثلا user>>>12.alice>>>traffic>>>uplink
+    Args:
+        name (str): نام آمار.
+    Returns:
+        tuple: (ایمیل، جهت) یا None برای آمارهای غیرکاربری.
+    """
+    parts = name.split(">>>")
+    if len(parts) != 4 or parts[0] != "user" or parts[2] != "traffic":
+        return None
+    return parts[1], parts[3]
+
+class XrayStatsApi:
+    """
+    خواندن شمارنده‌های ترافیک کاربران از StatsService با دستور `xray api statsquery`.
+    """
+
+    def __init__(self, binary: str = XRAY_BINARY, server: str = XRAY_API_SERVER):
+        self.binary = binary
+        self.server = server
+
+    def query_user_traffic(self, reset: bool = True) -> list:
+        """
+        Args:
+            reset (bool): صفر کردن شمارنده‌ها پس از خواندن (خروجی به صورت delta).
+        Returns:
+            list: لیست (نام آمار، مقدار).
+        """
+        command = [self.binary, "api", "statsquery", f"--server={self.server}", "-pattern", "user>>>"]
+        if reset:
+            command.append("-reset")
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        stats = json.loads(output or "{}").get("stat") or []
+        return [(stat["name"], int(stat.get("value") or 0)) for stat in stats]
+
+class InMemoryXrayStats:
+    """
+    جایگزین محلی StatsService برای تست و توسعه.
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def record(self, email: str, uplink: int = 0, downlink: int = 0) -> None:
+        with self._lock:
+            for direction, value in (("uplink", uplink), ("downlink", downlink)):
+                name = f"user>>>{email}>>>traffic>>>{direction}"
+                self._counters[name] = self._counters.get(name, 0) + value
+
+    def query_user_traffic(self, reset: bool = True) -> list:
+        with self._lock:
+            stats = list(self._counters.items())
+            if reset:
+                self._counters.clear()
+        return stats
+
+class InMemoryXrayApi:
+    """
+    جایگزین محلی HandlerService برای تست و توسعه؛ وضعیت کلاینت‌ها را در حافظه نگه می‌دارد.
+    """
+
+    def __init__(self):
+        self.clients = {}
+        self.calls = 0
+
+    def add_clients(self, inbounds: list) -> None:
+        self.calls += 1
+        for inbound in inbounds:
+            tag_clients = self.clients.setdefault(inbound["tag"], {})
+            for client in inbound["settings"]["clients"]:
+                if client["email"] in tag_clients:
+                    raise ValueError(f"User {client['email']} already exists in {inbound['tag']}")
+                tag_clients[client["email"]] = client
+
+    def remove_clients(self, tag: str, emails: list) -> None:
+        self.calls += 1
+        tag_clients = self.clients.setdefault(tag, {})
+        for email in emails:
+            tag_clients.pop(email, None)
+
+class XrayConfigCompiler:
+    """
+    همگام‌سازی تدریجی کلاینت‌های inboundهای Xray با جدول کاربران.
+    تغییرات کاربران جمع‌آوری شده و پس از debounce در یک دسته اعمال می‌شوند؛ فقط اختلاف با
+    آخرین وضعیت اعمال‌شده از طریق API به Xray ارسال و فایل کانفیگ برای ری‌استارت‌های بعدی به‌روز می‌شود.
+    Args:
+        api: پیاده‌سازی add_clients/remove_clients (XrayCliApi یا InMemoryXrayApi).
+        session_factory: سازنده سشن sync پایگاه داده.
+        config_path (str): مسیر فایل کانفیگ Xray.
+        debounce (float): فاصله جمع‌آوری تغییرات پیش از اعمال، به ثانیه.
+    """
+
+    def __init__(self, api, session_factory, config_path: str = XRAY_CONFIG_PATH,
+                 debounce: float = XRAY_SYNC_DEBOUNCE, persist: bool = True):
+        self.api = api
+        self.session_factory = session_factory
+        self.config_path = config_path
+        self.debounce = debounce
+        self.persist = persist
+        self.applies = 0
+        self._lock = threading.Lock()
+        self._apply_lock = threading.Lock()
+        self._timer = None
+        self._pending_ids = set()
+        self._full_sync = True
+        self._applied = None  # {tag: {email: client}}
+        self._email_by_id = {}
+
+    def mark_changed(self, changes) -> None:
+        """
+        ثبت کاربران تغییرکرده؛ مناسب برای add_user_change_listener.
+        Args:
+            changes: مجموعه‌ای از (id, uuid).
+        """
+        with self._lock:
+            self._pending_ids.update(user_id for user_id, _ in changes)
+        self.schedule()
+
+    def request_full_sync(self) -> None:
+        with self._lock:
+            self._full_sync = True
+        self.schedule()
+
+    def schedule(self) -> None:
+        # پنجره ثابت: تغییراتی که تا پایان پنجره برسند در همان اعمال بعدی جمع می‌شوند
+        with self._lock:
+            if self._timer is not None:
+                return
+            self._timer = threading.Timer(self.debounce, self._run_scheduled)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _run_scheduled(self) -> None:
+        with self._lock:
+            self._timer = None
+        try:
+            self.apply()
+        except Exception:
+            logger.exception("Xray sync failed; scheduling full resync")
+            with self._lock:
+                self._full_sync = True
+            self.schedule()
+
+    def stop(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def _load_users(self, db, ids=None) -> list:
+        from backend.models import User
+        columns = (User.id, User.uuid, User.username, User.is_active)
+        if ids is None:
+            return db.query(*columns).all()
+        ids = list(ids)
+        rows = []
+        for start in range(0, len(ids), 500):
+            rows.extend(db.query(*columns).filter(User.id.in_(ids[start:start + 500])).all())
+        return rows
+
+    def _initial_state(self, inbounds: list) -> dict:
+        # وضعیت اولیه همان چیزی است که Xray از فایل کانفیگ بارگذاری کرده است
+        state = {}
+        for inbound in inbounds:
+            clients = inbound.get("settings", {}).get("clients", [])
+            state[inbound["tag"]] = {client["email"]: client for client in clients if client.get("email")}
+            for email in state[inbound["tag"]]:
+                user_id = parse_client_email(email)
+                if user_id is not None:
+                    self._email_by_id[user_id] = email
+        return state
+
+    def apply(self) -> dict:
+        """
+        اعمال تغییرات معوق روی Xray.
+        Returns:
+            dict: تعداد کلاینت‌های اضافه و حذف‌شده.
+        """
+        with self._apply_lock:
+            with self._lock:
+                pending_ids, self._pending_ids = self._pending_ids, set()
+                full_sync, self._full_sync = self._full_sync, False
+
+            config = load_xray_config(self.config_path)
+            inbounds = managed_inbounds(config)
+            if self._applied is None:
+                self._applied = self._initial_state(inbounds)
+
+            desired = {tag: dict(clients) for tag, clients in self._applied.items()}
+            for inbound in inbounds:
+                desired.setdefault(inbound["tag"], {})
+            email_by_id = dict(self._email_by_id)
+
+            if full_sync:
+                for clients in desired.values():
+                    clients.clear()
+                email_by_id.clear()
+                affected_ids = None
+            else:
+                affected_ids = pending_ids
+                for user_id in pending_ids:
+                    email = email_by_id.pop(user_id, None)
+                    if email is not None:
+                        for clients in desired.values():
+                            clients.pop(email, None)
+
+            if full_sync or pending_ids:
+                db = self.session_factory()
+                try:
+                    users = self._load_users(db, affected_ids)
+                finally:
+                    db.close()
+                for user_id, user_uuid, username, is_active in users:
+                    if not is_active:
+                        continue
+                    email = client_email(user_id, username)
+                    email_by_id[user_id] = email
+                    for inbound in inbounds:
+                        desired[inbound["tag"]][email] = build_client(inbound, user_uuid, email)
+
+            added, removed = self._push(inbounds, desired)
+            self._applied = desired
+            self._email_by_id = email_by_id
+            if self.persist and (added or removed or full_sync):
+                for inbound in inbounds:
+                    inbound.setdefault("settings", {})["clients"] = list(desired[inbound["tag"]].values())
+                write_xray_config(config, self.config_path)
+            self.applies += 1
+            if added or removed:
+                logger.info("Xray sync applied: %d clients added, %d removed", added, removed)
+            return {"added": added, "removed": removed}
+
+    def _push(self, inbounds: list, desired: dict) -> tuple:
+        added = removed = 0
+        additions = []
+        for inbound in inbounds:
+            tag = inbound["tag"]
+            current = self._applied.get(tag, {})
+            target = desired[tag]
+            # کلاینت‌های تغییرکرده حذف و دوباره اضافه می‌شوند
+            stale = [email for email, client in current.items() if target.get(email) != client]
+            fresh = [client for email, client in target.items() if current.get(email) != client]
+            if stale:
+                self.api.remove_clients(tag, stale)
+                removed += len(stale)
+            if fresh:
+                settings = {key: value for key, value in inbound.get("settings", {}).items() if key != "clients"}
+                settings["clients"] = fresh
+                additions.append({"tag": tag, "protocol": inbound["protocol"], "port": inbound.get("port"), "settings": settings})
+                added += len(fresh)
+        if additions:
+            self.api.add_clients(additions)
+        return added, removed
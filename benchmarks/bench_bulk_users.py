@@ -0,0 +1,78 @@
+"""
+مقایسه سرعت ایجاد/به‌روزرسانی تک‌به‌تک کاربران با endpointهای گروهی.
+
+اجرا از ریشه پروژه:
+    python benchmarks/bench_bulk_users.py --count 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _make_client(db_path: str):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    from fastapi.testclient import TestClient
+    from backend.app import app
+    return TestClient(app)
+
+
+def _payload(prefix: str, i: int) -> dict:
+    return {
+        "username": f"{prefix}{i}",
+        "uuid": "00000000-0000-0000-0000-000000000000",
+        "traffic_limit": 1024,
+        "usage_duration": 43200,
+        "simultaneous_connections": 2,
+    }
+
+
+def _report(label: str, count: int, elapsed: float) -> None:
+    print(f"{label:<24} {count:>7} items  {elapsed:8.3f}s  {count / elapsed:10.1f} items/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=2000, help="Number of users per scenario")
+    parser.add_argument("--batch", type=int, default=5000, help="Items per bulk request")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        client = _make_client(os.path.join(tmp, "bench.db"))
+
+        start = time.perf_counter()
+        single_ids = []
+        for i in range(args.count):
+            response = client.post("/users/", json=_payload("single", i))
+            response.raise_for_status()
+            single_ids.append(response.json()["id"])
+        _report("create (per item)", args.count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        bulk_ids = []
+        for offset in range(0, args.count, args.batch):
+            items = [_payload("bulk", i) for i in range(offset, min(offset + args.batch, args.count))]
+            response = client.post("/users/bulk", json=items)
+            response.raise_for_status()
+            bulk_ids.extend(result["id"] for result in response.json()["results"])
+        _report("create (bulk)", args.count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for user_id in single_ids:
+            client.put(f"/users/{user_id}", json={"traffic_limit": 2048}).raise_for_status()
+        _report("update (per item)", args.count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        for offset in range(0, len(bulk_ids), args.batch):
+            items = [{"id": user_id, "traffic_limit": 2048} for user_id in bulk_ids[offset:offset + args.batch]]
+            client.patch("/users/bulk", json=items).raise_for_status()
+        _report("update (bulk)", args.count, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
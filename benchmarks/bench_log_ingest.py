@@ -0,0 +1,65 @@
+"""
+اندازه‌گیری سرعت موتور خواندن لاگ (خط بر ثانیه) روی یک لاگ مصنوعی.
+
+اجرا از ریشه پروژه:
+    python benchmarks/bench_log_ingest.py --size-mb 1024
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from backend.utils.ingest_utils import LogIngestor, parse_nginx_access, parse_xray_access  # noqa: E402
+
+XRAY_LINE = "2024/03/05 10:20:{s:02d} from 10.{a}.{b}.{c}:51234 accepted tcp:example.com:443 [vless-ws >> direct] email: {u}.user{u}\n"
+NGINX_LINE = '10.{a}.{b}.{c} - - [05/Mar/2024:10:20:{s:02d} +0000] "GET /subscription/{u} HTTP/1.1" 200 {n} "-" "v2rayNG/1.8"\n'
+
+
+def write_log(path: str, template: str, size_mb: int) -> int:
+    target = size_mb * 1024 * 1024
+    block = "".join(
+        template.format(s=i % 60, a=i % 200, b=i % 250, c=i % 7, u=i % 50000, n=i % 4096) for i in range(10000)
+    ).encode()
+    written = 0
+    with open(path, "wb") as file:
+        while written < target:
+            file.write(block)
+            written += len(block)
+    return written
+
+
+def measure(label: str, path: str, parser) -> None:
+    ingestor = LogIngestor(path, parser)
+    start = time.perf_counter()
+    for _ in ingestor.read_batches():
+        pass
+    elapsed = time.perf_counter() - start
+    print(
+        f"{label:<14} {ingestor.lines:>11} lines  {ingestor.bytes / 1048576:8.1f} MiB  {elapsed:7.2f}s  "
+        f"{ingestor.lines / elapsed:12.0f} lines/s  {ingestor.bytes / 1048576 / elapsed:7.1f} MiB/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size-mb", type=int, default=1024, help="Size of each synthetic log in MiB")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, template, line_parser in (
+            ("xray access", XRAY_LINE, parse_xray_access),
+            ("nginx access", NGINX_LINE, parse_nginx_access),
+        ):
+            path = os.path.join(tmp, label.replace(" ", "_") + ".log")
+            write_log(path, template, args.size_mb)
+            measure(label, path, line_parser)
+            measure(label + " (raw)", path, lambda line: None)
+            os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+مقایسه سرعت سریال‌سازی صفحه کاربران: مسیر قبلی (شیء ORM، to_dict و اعتبارسنجی UserPage)
+در برابر مسیر سریع (ستون‌ها به صورت tuple و JSON مستقیم)، و اندازه‌گیری endpoint لیست کاربران.
+
+اجرا از ریشه پروژه:
+    python benchmarks/bench_read_path.py --users 50000 --page-size 1000
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEED_BATCH = 5000
+
+
+def _setup(db_path: str):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    from backend.database import engine
+    from backend.database.migrations import migrate
+    migrate(engine)
+    return engine
+
+
+def _seed(engine, count: int) -> None:
+    from sqlalchemy import insert
+    from backend.models import User
+    from backend.utils.time_utils import compute_expires_at
+
+    with engine.begin() as conn:
+        for offset in range(0, count, SEED_BATCH):
+            conn.execute(insert(User), [{
+                "username": f"bench_{i}",
+                "uuid": str(uuid.UUID(int=i + 1, version=4)),
+                "traffic_limit": 1024,
+                "usage_duration": 43200,
+                "simultaneous_connections": 2,
+                "is_active": True,
+                "expires_at": compute_expires_at(None, 43200),
+            } for i in range(offset, min(offset + SEED_BATCH, count))])
+
+
+def _pages(serialize, page_size: int) -> int:
+    # پیمایش keyset همه کاربران؛ خروجی مجموع بایت‌های تولیدشده است
+    from backend.database import SessionLocal
+    from backend.models import User
+
+    db = SessionLocal()
+    total = 0
+    after = 0
+    try:
+        while True:
+            body, after = serialize(db.query(User).filter(User.id > after), page_size)
+            total += len(body)
+            db.expunge_all()
+            if after is None:
+                return total
+    finally:
+        db.close()
+
+
+def _orm_page(query, limit: int):
+    # مسیر قبلی: to_dict روی شیء ORM، اعتبارسنجی response_model و JSONResponse
+    from backend.models import User
+    from backend.schemas import UserPage
+
+    users = query.order_by(User.id).limit(limit + 1).all()
+    next_cursor = users[limit - 1].id if len(users) > limit else None
+    page = UserPage(**{"items": [user.to_dict() for user in users[:limit]], "next_cursor": next_cursor})
+    body = json.dumps(page.model_dump(mode="json"), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return body, next_cursor
+
+
+def _fast_page(query, limit: int):
+    from backend.routers.users import _user_page
+
+    response = _user_page(query, limit)
+    return response.body, json.loads(response.body)["next_cursor"]
+
+
+def _report(label: str, rows: int, elapsed: float, size: int) -> None:
+    print(f"{label:<22} {rows:>8} rows  {elapsed:8.3f}s  {rows / elapsed:12.0f} rows/s  {size / 1048576:8.1f} MiB")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000, help="Number of seeded users")
+    parser.add_argument("--page-size", type=int, default=1000, help="Users per page")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario (best is reported)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = _setup(os.path.join(tmp, "bench.db"))
+        _seed(engine, args.users)
+        from backend.utils import json_utils
+        print(f"encoder: {'orjson' if json_utils.orjson is not None else 'json'}")
+
+        for label, serialize in (("orm + pydantic", _orm_page), ("tuples + fast json", _fast_page)):
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                size = _pages(serialize, args.page_size)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            _report(label, args.users, best, size)
+
+        from fastapi.testclient import TestClient
+        from backend.app import app
+        with TestClient(app) as client:
+            best = None
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                after = None
+                size = 0
+                while True:
+                    params = {"limit": min(args.page_size, 1000)}
+                    if after is not None:
+                        params["after"] = after
+                    response = client.get("/users/", params=params)
+                    response.raise_for_status()
+                    size += len(response.content)
+                    after = response.json()["next_cursor"]
+                    if after is None:
+                        break
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            _report("GET /users/", args.users, best, size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+مجموعه بنچمارک قابل تکرار: تست بار endpointهای پرترافیک و micro-benchmark توابع داغ.
+
+یک پایگاه داده SQLite با تعداد مشخصی کاربر ساخته می‌شود (با --db دوباره استفاده می‌شود)،
+سپس هر سناریو با همزمانی ثابت از طریق کلاینت ASGI درون‌پردازه‌ای اجرا شده و
+throughput، تاخیر p50/p95/p99 و اوج حافظه گزارش و در یک فایل JSON ذخیره می‌شود.
+مقایسه دو اجرا با benchmarks/compare_results.py انجام می‌شود.
+
+اجرا از ریشه پروژه:
+    python benchmarks/bench_suite.py --users 100000 --requests 5000 --concurrency 32
+    python benchmarks/bench_suite.py --users 1000000 --db /tmp/bench-1m.db --tracemalloc
+    python benchmarks/bench_suite.py --skip-load --skip-micro --import-target-ms 800
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SEED_BATCH = 10000
+
+
+def _bench_uuid(i: int) -> str:
+    # UUIDهای قطعی تا نتایج اجراهای مختلف روی یک داده قابل مقایسه باشند
+    return str(uuid.UUID(int=i + 1, version=4))
+
+
+def _prepare_app(db_path: str):
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    # همه درخواست‌های بار از یک کلاینت می‌آیند و نباید محدود شوند
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    from backend.app import app
+    from backend.database.migrations import migrate
+    # کلاینت ASGI رویداد startup را اجرا نمی‌کند، پس schema اینجا ساخته می‌شود
+    migrate()
+    return app
+
+
+def seed_users(count: int) -> int:
+    """
+    افزودن کاربران مصنوعی تا رسیدن جدول به تعداد خواسته‌شده.
+    Args:
+        count (int): تعداد کل کاربران.
+    Returns:
+        int: تعداد کاربران اضافه‌شده در این اجرا.
+    """
+    from sqlalchemy import func, select
+    from backend.database import engine
+    from backend.database.user_stats import recount_user_stats
+    from backend.models import User
+
+    table = User.__table__
+    with engine.begin() as conn:
+        existing = conn.execute(select(func.count()).select_from(table)).scalar_one()
+    now = datetime.now(timezone.utc)
+    added = 0
+    for offset in range(existing, count, SEED_BATCH):
+        rows = []
+        for i in range(offset, min(offset + SEED_BATCH, count)):
+            duration = 43200 + (i % 30) * 1440
+            rows.append({
+                "username": f"bench_{i}",
+                "uuid": _bench_uuid(i),
+                "traffic_limit": 1024 * (1 + i % 50),
+                "usage_duration": duration,
+                "simultaneous_connections": 1 + i % 3,
+                "is_active": i % 10 != 0,
+                "expires_at": now + timedelta(minutes=duration),
+                "created_at": now,
+            })
+        with engine.begin() as conn:
+            conn.execute(table.insert(), rows)
+        added += len(rows)
+    if added:
+        # درج مستقیم از رویدادهای ORM عبور نمی‌کند؛ شمارنده‌های داشبورد یک بار دوباره شمرده می‌شوند
+        with engine.begin() as conn:
+            recount_user_stats(conn)
+    return added
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def _drive(app, paths, requests: int, concurrency: int) -> dict:
+    import httpx
+
+    latencies = []
+    errors = 0
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        iterator = iter(range(requests))
+
+        async def worker():
+            nonlocal errors
+            for i in iterator:
+                path = paths[i % len(paths)]
+                start = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    errors += 1
+
+        # گرم کردن (اتصال‌های pool، ایمپورت‌های تنبل) خارج از اندازه‌گیری
+        await client.get(paths[0])
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "throughput": round(requests / elapsed, 2),
+        "p50_ms": round(_percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def run_load(app, users: int, requests: int, concurrency: int, trace_memory: bool) -> dict:
+    """
+    اجرای سناریوهای تست بار.
+    Args:
+        app: اپلیکیشن ASGI.
+        users (int): تعداد کاربران موجود در پایگاه داده.
+        requests (int): تعداد درخواست هر سناریو.
+        concurrency (int): تعداد درخواست‌های همزمان.
+        trace_memory (bool): اندازه‌گیری اوج حافظه Python با tracemalloc (کندتر).
+    Returns:
+        dict: نتیجه هر سناریو.
+    """
+    rng = random.Random(1234)
+    # فقط کاربران فعال (seed_users هر دهمین کاربر را غیرفعال می‌سازد)
+    active = (i for i in iter(lambda: rng.randrange(users), None) if i % 10)
+    sample = [_bench_uuid(next(active)) for _ in range(min(requests, 2000))]
+    scenarios = {
+        "users_list": ["/users/?limit=100"],
+        "subscription": [f"/subscription/{value}" for value in sample],
+        "copy_config": [f"/settings/copy-config/{value}" for value in sample],
+        "generate_qr": [f"/domains/generate-qr?data=vless://{value}@example.com:443" for value in sample[:50]],
+    }
+
+    # همه سناریوها در یک event loop، چون موتور async به loop سازنده‌اش وابسته است
+    async def run_all() -> dict:
+        results = {}
+        for name, paths in scenarios.items():
+            if trace_memory:
+                tracemalloc.start()
+            result = await _drive(app, paths, requests, concurrency)
+            if trace_memory:
+                result["tracemalloc_peak_kb"] = tracemalloc.get_traced_memory()[1] // 1024
+                tracemalloc.stop()
+            result["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            results[name] = result
+            print(f"{name:<14} {result['throughput']:>9.1f} req/s  p50 {result['p50_ms']:>8.2f}ms  "
+                  f"p95 {result['p95_ms']:>8.2f}ms  p99 {result['p99_ms']:>8.2f}ms  errors {result['errors']}")
+        return results
+
+    return asyncio.run(run_all())
+
+
+def _measure(func, repeat: int = 5) -> dict:
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+    return {"ns_per_op": round(best * 1e9, 1), "ops_per_sec": round(1 / best, 1)}
+
+
+def run_micro() -> dict:
+    """
+    micro-benchmark توابع پرتکرار.
+    Returns:
+        dict: زمان هر عملیات و تعداد عملیات در ثانیه.
+    """
+    from backend.models import User
+    from backend.utils.network_utils import validate_url
+    from backend.utils.qr_utils import generate_qr_code
+
+    now = datetime.now(timezone.utc)
+    user = User(
+        id=1, username="bench_user", uuid=_bench_uuid(0), traffic_limit=1024, usage_duration=43200,
+        simultaneous_connections=2, is_active=True, expires_at=now, created_at=now, updated_at=now,
+    )
+    link = f"vless://{_bench_uuid(0)}@example.com:443?type=ws&security=tls#bench"
+    results = {
+        "user_to_dict": _measure(user.to_dict),
+        "validate_url": _measure(lambda: validate_url("https://example.com/path?q=1")),
+        "generate_qr_code": _measure(lambda: generate_qr_code(link), repeat=3),
+    }
+    for name, result in results.items():
+        print(f"{name:<18} {result['ns_per_op']:>14.1f} ns/op  {result['ops_per_sec']:>12.1f} ops/s")
+    return results
+
+
+def run_import(repeat: int = 5, top: int = 15) -> dict:
+    """
+    اندازه‌گیری زمان cold start (ایمپورت backend.app در پردازه تازه) و ماژول‌های پرهزینه.
+    Args:
+        repeat (int): تعداد اجرا؛ میانه گزارش می‌شود.
+        top (int): تعداد ماژول‌های پرهزینه در گزارش.
+    Returns:
+        dict: میانه زمان ایمپورت و سنگین‌ترین ماژول‌ها (زمان تجمعی).
+    """
+    code = "import time; t = time.perf_counter(); import backend.app; print(time.perf_counter() - t)"
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    timings = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+        timings.append(float(output.stdout.strip().splitlines()[-1]) * 1000)
+    report = subprocess.run([sys.executable, "-X", "importtime", "-c", "import backend.app"],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True).stderr
+    modules = []
+    for line in report.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            modules.append((int(parts[1]), parts[2].strip()))
+    modules.sort(reverse=True)
+    timings.sort()
+    result = {
+        "import_ms": round(timings[len(timings) // 2], 1),
+        "top_modules": [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in modules[:top]],
+    }
+    print(f"import backend.app  {result['import_ms']:>8.1f} ms (median of {repeat})")
+    for entry in result["top_modules"][:5]:
+        print(f"    {entry['module']:<40} {entry['cumulative_ms']:>8.1f} ms")
+    return result
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="Users to seed (e.g. 1000, 100000, 1000000)")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per load scenario")
+    parser.add_argument("--concurrency", type=int, default=16, help="Concurrent in-flight requests")
+    parser.add_argument("--db", help="Reuse this SQLite file across runs instead of a temporary one")
+    parser.add_argument("--tracemalloc", action="store_true", help="Record Python heap peak (slows the run)")
+    parser.add_argument("--skip-load", action="store_true", help="Only run micro-benchmarks")
+    parser.add_argument("--skip-micro", action="store_true", help="Only run load scenarios")
+    parser.add_argument("--skip-import", action="store_true", help="Skip the cold-start import report")
+    parser.add_argument("--import-target-ms", type=float, help="Exit with status 1 if importing the app is slower")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>.json)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = _prepare_app(os.path.abspath(args.db) if args.db else os.path.join(tmp, "bench.db"))
+        results = {
+            "meta": {
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "users": args.users,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+            },
+        }
+        if not args.skip_load:
+            start = time.perf_counter()
+            added = seed_users(args.users)
+            print(f"seeded {added} users in {time.perf_counter() - start:.1f}s")
+            results["load"] = run_load(app, args.users, args.requests, args.concurrency, args.tracemalloc)
+        if not args.skip_micro:
+            results["micro"] = run_micro()
+        if not args.skip_import:
+            results["startup"] = run_import()
+
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"results written to {output}")
+    if args.import_target_ms and "startup" in results and results["startup"]["import_ms"] > args.import_target_ms:
+        print(f"cold start {results['startup']['import_ms']} ms exceeds target {args.import_target_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+مقایسه دو فایل نتیجه bench_suite.py و تشخیص پسرفت.
+
+برای هر معیار درصد تغییر نسبت به baseline چاپ می‌شود؛ اگر throughput یا ops/s
+بیش از آستانه کم شود یا تاخیر p95/p99 بیش از آستانه زیاد شود، خروجی با کد 1 تمام می‌شود
+(مناسب برای CI).
+
+اجرا از ریشه پروژه:
+    python benchmarks/compare_results.py benchmarks/results/base.json benchmarks/results/new.json --threshold 10
+"""
+import argparse
+import json
+import sys
+
+# معیار -> آیا مقدار بیشتر بهتر است
+LOAD_METRICS = {"throughput": True, "p50_ms": False, "p95_ms": False, "p99_ms": False}
+GATED_LOAD_METRICS = {"throughput", "p95_ms", "p99_ms"}
+MICRO_METRICS = {"ops_per_sec": True}
+STARTUP_METRICS = {"import_ms": False}
+
+
+def _change(old: float, new: float) -> float:
+    if not old:
+        return 0.0
+    return (new - old) / old * 100
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """
+    مقایسه نتایج دو اجرا.
+    Args:
+        baseline (dict): نتایج مرجع.
+        current (dict): نتایج جدید.
+        threshold (float): حداکثر بدتر شدن مجاز (درصد).
+    Returns:
+        list: فهرست معیارهایی که از آستانه بدتر شده‌اند.
+    """
+    regressions = []
+    sections = (
+        ("load", LOAD_METRICS, current.get("load", {}), baseline.get("load", {})),
+        ("micro", MICRO_METRICS, current.get("micro", {}), baseline.get("micro", {})),
+        ("startup", STARTUP_METRICS, {"app": current.get("startup", {})}, {"app": baseline.get("startup")}),
+    )
+    for section, metrics, new_results, old_results in sections:
+        for name, new_result in new_results.items():
+            old_result = old_results.get(name)
+            if old_result is None:
+                continue
+            for metric, higher_is_better in metrics.items():
+                if metric not in old_result or metric not in new_result:
+                    continue
+                change = _change(old_result[metric], new_result[metric])
+                worse = -change if higher_is_better else change
+                gated = section != "load" or metric in GATED_LOAD_METRICS
+                flag = ""
+                if gated and worse > threshold:
+                    flag = "  REGRESSION"
+                    regressions.append(f"{section}.{name}.{metric}")
+                print(f"{section + '.' + name:<24} {metric:<12} {old_result[metric]:>12.2f} -> "
+                      f"{new_result[metric]:>12.2f}  {change:+7.1f}%{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", help="Baseline result JSON")
+    parser.add_argument("current", help="New result JSON")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed slowdown in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    for key in ("users", "requests", "concurrency"):
+        if baseline["meta"].get(key) != current["meta"].get(key):
+            print(f"warning: runs differ in {key}: {baseline['meta'].get(key)} vs {current['meta'].get(key)}")
+
+    regressions = compare(baseline, current, args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold}%: {', '.join(regressions)}")
+        sys.exit(1)
+    print("no regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# ماژول‌های backend هنگام import به پایگاه داده وصل می‌شوند؛ تست‌ها هرگز test.db واقعی را لمس نمی‌کنند
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp(prefix='panel-tests-')}/test.db")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
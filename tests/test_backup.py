@@ -0,0 +1,123 @@
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, insert, select, text
+
+from backend.database import backup
+from backend.database.migrations import migrate
+from backend.models import Domain, User, UserStat, UserUsage
+
+
+def _engine(path):
+    engine = create_engine(f"sqlite:///{path}")
+    migrate(engine)
+    return engine
+
+
+def _seed(engine, count: int = 25) -> None:
+    expires_at = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [{
+            "id": user_id,
+            "username": f"user_{user_id:03d}",
+            "uuid": f"00000000-0000-4000-8000-{user_id:012d}",
+            "traffic_limit": 1024,
+            "is_active": user_id % 5 != 0,
+            "expires_at": expires_at + timedelta(days=user_id),
+        } for user_id in range(1, count + 1)])
+        conn.execute(insert(UserUsage), [{"user_id": 1, "uplink": 2**40, "downlink": 7}])
+        conn.execute(insert(Domain), [{"name": "example.com", "description": {"cdn": True}, "owner_id": 1}])
+
+
+def _contents(engine) -> dict:
+    with engine.connect() as conn:
+        return {
+            table.name: conn.execute(select(table).order_by(*table.primary_key.columns)).all()
+            for table in backup.dump_tables()
+        }
+
+
+def _stats(engine) -> dict:
+    with engine.connect() as conn:
+        return dict(conn.execute(select(UserStat.name, UserStat.value)).all())
+
+
+def _fts_ids(engine, term: str) -> list:
+    with engine.connect() as conn:
+        return sorted(conn.execute(
+            text("SELECT rowid FROM users_fts WHERE users_fts MATCH :term"), {"term": f'"{term}"'}
+        ).scalars())
+
+
+@pytest.fixture
+def dump(tmp_path):
+    source = _engine(tmp_path / "source.db")
+    _seed(source)
+    path = backup.export_to_file(str(tmp_path / "panel.ndjson.gz"), bind=source, batch_size=7)
+    return source, path
+
+
+def test_export_restore_round_trip(tmp_path, dump):
+    source, path = dump
+    target = _engine(tmp_path / "target.db")
+    restored = backup.restore_dump(path, bind=target, batch_size=4)
+
+    assert restored["users"] == 25
+    assert restored["user_usage"] == 1
+    assert _contents(target) == _contents(source)
+    # درج گروهی از شمارنده‌ها عبور نمی‌کند؛ بازیابی آن‌ها را دوباره می‌شمارد
+    assert _stats(target) == {"total": 25, "active": 20, "inactive": 5}
+    # ایندکس FTS یک‌جا ساخته شده و triggerهای آن دوباره فعال‌اند
+    assert _fts_ids(target, "r_01") == list(range(10, 20))
+    with target.begin() as conn:
+        conn.execute(insert(User), [{"id": 26, "username": "late_r_01x", "uuid": "00000000-0000-4000-8000-000000000026"}])
+    assert 26 in _fts_ids(target, "r_01")
+
+
+def test_restore_refuses_non_empty_target(tmp_path, dump):
+    source, path = dump
+    target = _engine(tmp_path / "target.db")
+    backup.restore_dump(path, bind=target)
+    with target.begin() as conn:
+        conn.execute(text("UPDATE users SET username = 'renamed' WHERE id = 2"))
+    before = _contents(target)
+
+    with pytest.raises(ValueError, match="not empty"):
+        backup.restore_dump(path, bind=target)
+    assert _contents(target) == before
+
+
+def test_restore_replace_overwrites_existing_rows(tmp_path, dump):
+    source, path = dump
+    target = _engine(tmp_path / "target.db")
+    _seed(target, count=40)
+    with target.begin() as conn:
+        conn.execute(text("UPDATE users SET username = 'stale_name' WHERE id = 3"))
+
+    backup.restore_dump(path, bind=target, replace=True)
+    assert _contents(target) == _contents(source)
+    assert _stats(target) == {"total": 25, "active": 20, "inactive": 5}
+    assert _fts_ids(target, "stale_name") == []
+    assert _fts_ids(target, "user_003") == [3]
+
+
+def test_snapshot_keeps_only_latest_copies(tmp_path, monkeypatch):
+    source = tmp_path / "panel.db"
+    with sqlite3.connect(source) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.execute("INSERT INTO t VALUES (1)")
+    directory = tmp_path / "backups"
+    directory.mkdir()
+    for stamp in ("20240101-000000", "20240102-000000", "20240103-000000"):
+        (directory / f"panel-{stamp}.db").write_bytes(b"old")
+    monkeypatch.setattr(backup, "BACKUP_DIR", str(directory))
+    monkeypatch.setattr(backup, "_timestamp", lambda: "20240104-000000")
+    monkeypatch.setattr(backup, "BACKUP_KEEP", 2)
+
+    path = backup.sqlite_snapshot(bind=create_engine(f"sqlite:///{source}"))
+    assert sorted(os.listdir(directory)) == ["panel-20240103-000000.db", "panel-20240104-000000.db"]
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT x FROM t").fetchall() == [(1,)]
+
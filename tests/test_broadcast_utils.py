@@ -0,0 +1,48 @@
+import asyncio
+import json
+
+from backend.utils.broadcast_utils import Broadcaster, sse_frame
+
+
+def _decode(frame: bytes) -> tuple:
+    event, data = frame.decode().strip().split("\n")
+    return event.removeprefix("event: "), json.loads(data.removeprefix("data: "))
+
+
+def test_slow_client_receives_snapshot_instead_of_losing_deltas():
+    async def main():
+        broadcaster = Broadcaster(produce=None, interval=1, queue_size=2)
+        queue = asyncio.Queue(maxsize=2)
+        broadcaster._subscribers.add(queue)
+        states = [{"cpu": 1, "total": 10}, {"cpu": 2, "total": 11}, {"cpu": 3, "total": 11}]
+        previous = {}
+        for state in states:
+            delta = {key: value for key, value in state.items() if previous.get(key) != value}
+            broadcaster.state = previous = state
+            broadcaster.publish(sse_frame("update", delta))
+        return [_decode(queue.get_nowait()) for _ in range(queue.qsize())]
+
+    frames = asyncio.run(main())
+    # آخرین وضعیت کلاینت پس از اعمال فریم‌ها باید با وضعیت واقعی یکی باشد
+    client_state = {}
+    for event, data in frames:
+        if event == "snapshot":
+            client_state = dict(data)
+        else:
+            client_state.update(data)
+    assert client_state == {"cpu": 3, "total": 11}
+    assert frames[0] == ("snapshot", {"cpu": 3, "total": 11})
+
+
+def test_fast_client_receives_deltas():
+    async def main():
+        broadcaster = Broadcaster(produce=None, interval=1, queue_size=8)
+        queue = asyncio.Queue(maxsize=8)
+        broadcaster._subscribers.add(queue)
+        broadcaster.state = {"cpu": 1}
+        broadcaster.publish(sse_frame("update", {"cpu": 1}))
+        return _decode(queue.get_nowait()), broadcaster.frames_dropped
+
+    frame, dropped = asyncio.run(main())
+    assert frame == ("update", {"cpu": 1})
+    assert dropped == 0
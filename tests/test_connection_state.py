@@ -0,0 +1,24 @@
+import json
+import time
+
+from backend.utils.connection_utils import ConnectionTracker
+from backend.utils.process_utils import read_shared_state, write_shared_state
+
+
+def test_shared_state_round_trip(tmp_path):
+    path = str(tmp_path / "connections.json")
+    tracker = ConnectionTracker()
+    tracker.observe(1, "10.0.0.1")
+    tracker.observe(2, "10.0.0.2")
+    write_shared_state(path, tracker.status())
+    assert read_shared_state(path, max_age=10) == {"online_users": 2, "flagged_users": [], "records_processed": 0}
+
+
+def test_stale_or_missing_shared_state_is_none(tmp_path):
+    path = tmp_path / "connections.json"
+    assert read_shared_state(str(path), max_age=10) is None
+    path.write_text(json.dumps({"updated_at": time.time() - 60, "data": {"online_users": 5}}))
+    # رهبری که دیگر وضعیت منتشر نمی‌کند نباید عدد قدیمی نشان دهد
+    assert read_shared_state(str(path), max_age=10) is None
+    path.write_text("{")
+    assert read_shared_state(str(path), max_age=10) is None
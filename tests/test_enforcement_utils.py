@@ -0,0 +1,89 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend.database.user_stats import STAT_ACTIVE, STAT_INACTIVE, STAT_TOTAL
+from backend.models import Base, User, UserStat
+from backend.utils.enforcement_utils import EnforcementScheduler
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/enforcement.db")
+    Base.metadata.create_all(engine, tables=[User.__table__, UserStat.__table__])
+    past = datetime.now(timezone.utc) - timedelta(seconds=1)
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": 1, "username": "expired", "uuid": "00000000-0000-4000-8000-000000000001", "expires_at": past},
+            {"id": 2, "username": "changed", "uuid": "00000000-0000-4000-8000-000000000002", "expires_at": None},
+        ])
+        conn.execute(insert(UserStat), [
+            {"name": STAT_TOTAL, "value": 2}, {"name": STAT_ACTIVE, "value": 2}, {"name": STAT_INACTIVE, "value": 0},
+        ])
+    return sessionmaker(bind=engine)
+
+
+def _is_active(session_factory, user_id: int) -> bool:
+    db = session_factory()
+    try:
+        return db.execute(select(User.is_active).where(User.id == user_id)).scalar_one()
+    finally:
+        db.close()
+
+
+def _wait_until(predicate, timeout: float = 5) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def _fail_once(method):
+    calls = []
+
+    def wrapper(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 1:
+            raise OperationalError("UPDATE users", {}, Exception("database is locked"))
+        return method(*args, **kwargs)
+
+    return wrapper, calls
+
+
+def test_expired_user_is_retried_after_failed_tick(session_factory):
+    scheduler = EnforcementScheduler(session_factory, retry_delay=0.05)
+    scheduler.deactivate_expired, calls = _fail_once(scheduler.deactivate_expired)
+    scheduler.start()
+    try:
+        assert _wait_until(lambda: not _is_active(session_factory, 1))
+    finally:
+        scheduler.stop()
+    assert len(calls) == 2
+    assert scheduler.failures == 1
+    assert scheduler.expired_total == 1
+
+
+def test_changed_users_are_reloaded_after_failed_tick(session_factory):
+    scheduler = EnforcementScheduler(session_factory, retry_delay=0.05)
+    scheduler.start()
+    assert _wait_until(lambda: not _is_active(session_factory, 1))
+    scheduler._load_pending, calls = _fail_once(scheduler._load_pending)
+
+    # انقضای کاربر ۲ تغییر کرده است ولی اولین خواندن آن شکست می‌خورد
+    db = session_factory()
+    db.execute(User.__table__.update().where(User.id == 2).values(
+        expires_at=datetime.now(timezone.utc) + timedelta(milliseconds=100)))
+    db.commit()
+    db.close()
+    scheduler.mark_changed({(2, "00000000-0000-4000-8000-000000000002")})
+    try:
+        assert _wait_until(lambda: not _is_active(session_factory, 2))
+    finally:
+        scheduler.stop()
+    assert len(calls) == 2
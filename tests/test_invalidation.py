@@ -0,0 +1,65 @@
+from sqlalchemy import create_engine, insert
+
+from backend.database.invalidation import ChangeLogPoller
+from backend.models import ChangeEvent
+
+
+def _engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/changes.db")
+    ChangeEvent.__table__.create(engine)
+    return engine
+
+
+def _write(engine, event_id: int, user_id: int) -> None:
+    # origin صفر یعنی پردازه‌ای دیگر
+    with engine.begin() as conn:
+        conn.execute(insert(ChangeEvent), [{
+            "id": event_id, "kind": "user", "user_id": user_id, "user_uuid": f"uuid-{user_id}", "origin": 0,
+        }])
+
+
+def test_poller_applies_late_committed_lower_ids(tmp_path, monkeypatch):
+    engine = _engine(tmp_path)
+    seen = []
+    monkeypatch.setattr("backend.database.invalidation.notify_user_changes", lambda changes: seen.extend(sorted(changes)))
+    poller = ChangeLogPoller(engine, gap_timeout=30)
+
+    # تراکنش id=2 هنوز commit نشده است و id=3 زودتر commit می‌شود
+    _write(engine, 1, 1)
+    _write(engine, 3, 3)
+    assert poller.poll(now=0) == 2
+    assert poller.last_id == 3
+
+    _write(engine, 2, 2)
+    assert poller.poll(now=1) == 1
+    assert seen == [(1, "uuid-1"), (3, "uuid-3"), (2, "uuid-2")]
+    assert poller.late_events == 1
+    # پس از دریافت، id دیگر دوباره خوانده نمی‌شود
+    assert poller.poll(now=2) == 0
+
+
+def test_poller_gives_up_on_gaps_after_timeout(tmp_path, monkeypatch):
+    engine = _engine(tmp_path)
+    seen = []
+    monkeypatch.setattr("backend.database.invalidation.notify_user_changes", lambda changes: seen.extend(changes))
+    poller = ChangeLogPoller(engine, gap_timeout=5)
+
+    _write(engine, 4, 4)
+    poller.poll(now=0)
+    assert sorted(poller._gaps) == [1, 2, 3]
+    # تراکنش‌های rollback‌شده هرگز ظاهر نمی‌شوند و پس از مهلت کنار گذاشته می‌شوند
+    poller.poll(now=10)
+    assert poller._gaps == {}
+    _write(engine, 2, 2)
+    assert poller.poll(now=11) == 0
+
+
+def test_poller_caps_tracked_gaps(tmp_path, monkeypatch):
+    engine = _engine(tmp_path)
+    monkeypatch.setattr("backend.database.invalidation.notify_user_changes", lambda changes: None)
+    poller = ChangeLogPoller(engine, max_gaps=10)
+
+    _write(engine, 1_000_000, 1)
+    poller.poll(now=0)
+    assert len(poller._gaps) == 10
+    assert max(poller._gaps) == 999_999
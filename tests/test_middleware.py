@@ -0,0 +1,63 @@
+import asyncio
+import threading
+
+from fastapi import APIRouter, FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from backend.middleware import RequestContextMiddleware
+from backend.utils.metrics_utils import http_requests_in_flight
+
+
+def _in_flight(route: str) -> float:
+    return http_requests_in_flight._values.get((route,), 0)
+
+
+def test_streaming_response_counts_as_in_flight_until_body_is_sent():
+    app = FastAPI()
+    router = APIRouter()
+    started = threading.Event()
+    release = threading.Event()
+    observed = []
+
+    async def body():
+        yield b"first\n"
+        started.set()
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        yield b"last\n"
+
+    @router.get("/items/{item_id}/stream")
+    def stream(item_id: int):
+        return StreamingResponse(body(), media_type="text/plain")
+
+    app.add_middleware(RequestContextMiddleware, routes=app.router.routes)
+    # مسیرهایی که پس از افزودن middleware ثبت می‌شوند هم برچسب درست می‌گیرند
+    app.include_router(router, prefix="/api")
+    route = "/api/items/{item_id}/stream"
+    before = _in_flight(route)
+
+    def watch():
+        started.wait(5)
+        observed.append(_in_flight(route))
+        release.set()
+
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    with TestClient(app) as client:
+        response = client.get("/api/items/7/stream")
+    watcher.join(5)
+
+    assert response.text == "first\nlast\n"
+    assert response.headers["x-request-id"]
+    assert observed == [before + 1]
+    assert _in_flight(route) == before
+
+
+def test_unknown_path_is_labelled_unmatched():
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware, routes=app.router.routes)
+    before = _in_flight("unmatched")
+    with TestClient(app) as client:
+        assert client.get("/nope").status_code == 404
+    assert _in_flight("unmatched") == before
@@ -0,0 +1,167 @@
+import asyncio
+import ipaddress
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from backend.utils.network_utils import AsyncHttpClient, probe_cache, probe_url, validate_url, validate_urls
+
+LOOPBACK = (ipaddress.ip_network("127.0.0.0/8"),)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    routes = {
+        "/ok": (200, {}),
+        "/down": (503, {}),
+        "/redirect-ok": (302, {"Location": "/ok"}),
+        "/redirect-private": (302, {"Location": "http://10.0.0.1/"}),
+        "/redirect-metadata": (301, {"Location": "http://169.254.169.254/latest/meta-data/"}),
+        "/redirect-loop": (302, {"Location": "/redirect-loop"}),
+    }
+
+    hosts = []
+
+    def _reply(self, allow_head: bool = True):
+        self.hosts.append(self.headers.get("Host"))
+        if self.path == "/no-head" and not allow_head:
+            status, headers = 405, {}
+        else:
+            status, headers = self.routes.get(self.path, (200 if self.path == "/no-head" else 404, {}))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._reply(allow_head=False)
+
+    def do_GET(self):
+        self._reply()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def clear_probe_cache():
+    probe_cache.clear()
+
+
+def _run(coro_factory):
+    async def main():
+        client = AsyncHttpClient(retries=0)
+        try:
+            return await coro_factory(client)
+        finally:
+            await client.aclose()
+    return asyncio.run(main())
+
+
+def test_validate_url_rejects_malformed_input():
+    assert validate_url("https://example.com/path")
+    assert not validate_url("example.com")
+    assert not validate_url("http://[::1/")
+
+
+def test_validate_urls_keeps_batch_on_malformed_entry():
+    results = _run(lambda client: validate_urls(["https://ok.com", "http://[::1/", "nope"], client=client))
+    assert [result["is_valid"] for result in results] == [True, False, False]
+    assert results[0]["domain"] == "ok.com"
+
+
+def test_probe_reports_status_and_falls_back_to_get(server):
+    results = _run(lambda client: validate_urls(
+        [f"{server}/ok", f"{server}/down", f"{server}/no-head", f"{server}/ok"],
+        probe=True, client=client, allowed_networks=LOOPBACK,
+    ))
+    assert [result["probe"]["status"] for result in results] == [200, 503, 200, 200]
+    assert [result["probe"]["reachable"] for result in results] == [True, False, True, True]
+
+
+def test_probe_follows_safe_redirects(server):
+    result = _run(lambda client: probe_url(f"{server}/redirect-ok", client, LOOPBACK))
+    assert result["status"] == 200
+
+
+@pytest.mark.parametrize("path", ["/redirect-private", "/redirect-metadata"])
+def test_probe_blocks_redirect_to_internal_address(server, path):
+    result = _run(lambda client: probe_url(f"{server}{path}", client, LOOPBACK))
+    assert result["reachable"] is False
+    assert result["error"].startswith("blocked")
+
+
+def test_probe_connects_to_the_validated_address(server, monkeypatch):
+    # اولین resolve آدرس مجاز و بعدی‌ها آدرس دیگری برمی‌گردانند (DNS rebinding)
+    real_getaddrinfo = socket.getaddrinfo
+    answers = []
+
+    def rebinding_getaddrinfo(host, *args, **kwargs):
+        if host == "rebind.test":
+            address = "127.0.0.1" if not answers else "10.255.255.1"
+            answers.append(address)
+            return real_getaddrinfo(address, *args, **kwargs)
+        return real_getaddrinfo(host, *args, **kwargs)
+
+    monkeypatch.setattr(socket, "getaddrinfo", rebinding_getaddrinfo)
+    port = server.rsplit(":", 1)[1]
+    _Handler.hosts.clear()
+    result = _run(lambda client: probe_url(f"http://rebind.test:{port}/ok", client, LOOPBACK))
+    assert result["status"] == 200
+    # نام فقط یک بار (برای بررسی) resolve شده و سرور نام اصلی را در Host دیده است
+    assert answers == ["127.0.0.1"]
+    assert _Handler.hosts == [f"rebind.test:{port}"]
+
+
+def test_probe_stops_redirect_loops(server):
+    result = _run(lambda client: probe_url(f"{server}/redirect-loop", client, LOOPBACK))
+    assert result["error"] == "blocked: too many redirects"
+
+
+@pytest.mark.parametrize("url", [
+    "http://127.0.0.1:10085/",
+    "http://localhost/",
+    "http://[::1]/",
+    "http://[::ffff:127.0.0.1]/",
+    "http://10.1.2.3/",
+    "http://192.168.1.1/",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://0.0.0.0/",
+    "ftp://example.com/",
+    "file:///etc/passwd",
+])
+def test_probe_refuses_internal_and_non_http_targets(url):
+    result = _run(lambda client: probe_url(url, client))
+    assert result["reachable"] is False
+    assert result["error"].startswith("blocked")
+
+
+def test_probe_reports_unsendable_url_per_item(server):
+    results = _run(lambda client: validate_urls(
+        [f"{server}/ok", "http://a\x00b.com"], probe=True, client=client, allowed_networks=LOOPBACK,
+    ))
+    assert results[0]["probe"]["status"] == 200
+    assert results[1]["probe"] == {"reachable": False, "status": None, "error": results[1]["probe"]["error"]}
+
+
+def test_validate_urls_endpoint_survives_malformed_entries():
+    from fastapi.testclient import TestClient
+    from backend.app import app
+
+    with TestClient(app) as client:
+        response = client.post("/domains/validate-urls", json={"urls": ["https://ok.com", "http://[::1/"]})
+        assert response.status_code == 200
+        assert response.json()["valid"] == 1
+        response = client.post("/domains/validate-urls", json={"urls": ["https://ok.com"] * 501, "probe": True})
+        assert response.status_code == 413
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import threading
+
+import pytest
+
+from backend.utils import qr_utils
+
+
+@pytest.fixture
+def counted_render(tmp_path, monkeypatch):
+    monkeypatch.setattr(qr_utils, "QR_CACHE_DIR", str(tmp_path))
+    qr_utils.qr_cache.clear()
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+    real_generate = qr_utils.generate_qr_code
+
+    def slow_generate(*args, **kwargs):
+        calls.append(args)
+        started.set()
+        release.wait(5)
+        return real_generate(*args, **kwargs)
+
+    monkeypatch.setattr(qr_utils, "generate_qr_code", slow_generate)
+    yield calls, started, release
+    qr_utils.qr_cache.clear()
+
+
+def test_concurrent_sync_and_async_misses_render_once(tmp_path, counted_render):
+    calls, started, release = counted_render
+    results = []
+
+    def sync_request():
+        results.append(qr_utils.get_qr_png("vless://example", 4, 1, "M"))
+
+    async def async_requests():
+        return await asyncio.gather(*(qr_utils.get_qr_png_async("vless://example", 4, 1, "M") for _ in range(5)))
+
+    threads = [threading.Thread(target=sync_request) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    started.wait(5)
+    loop_thread_results = []
+    runner = threading.Thread(target=lambda: loop_thread_results.extend(asyncio.run(async_requests())))
+    runner.start()
+    release.set()
+    for thread in threads + [runner]:
+        thread.join(5)
+
+    assert len(calls) == 1
+    keys_and_images = set(results + loop_thread_results)
+    assert len(keys_and_images) == 1
+    key, png = keys_and_images.pop()
+    assert png.startswith(b"\x89PNG")
+    # فقط فایل نهایی روی دیسک می‌ماند و فایل موقتی باقی نمی‌ماند
+    files = [name for _, _, names in os.walk(tmp_path) for name in names]
+    assert files == [f"{key}.png"]
+
+
+def test_failed_render_is_not_cached(counted_render):
+    _, _, release = counted_render
+    release.set()
+    with pytest.raises(KeyError):
+        qr_utils.get_qr_png("data", error_correction="X")
+    assert qr_utils._inflight == {}
+    _, png = qr_utils.get_qr_png("data")
+    assert png.startswith(b"\x89PNG")
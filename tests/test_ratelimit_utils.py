@@ -0,0 +1,101 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.middleware import RateLimitMiddleware
+from backend.utils.ratelimit_utils import RateLimiter, TokenBucketTable, build_rule, parse_rate
+
+
+def test_parse_rate():
+    assert parse_rate("30/60") == (0.5, 30)
+    assert parse_rate("5") == (5, 5)
+    assert parse_rate("0") is None
+    assert parse_rate("") is None
+
+
+def test_bucket_refills_over_time():
+    table = TokenBucketTable()
+    limits = [("key", 1.0, 2)]  # یک توکن در ثانیه، ظرفیت ۲
+    assert table.acquire(limits, now=0) == 0
+    assert table.acquire(limits, now=0) == 0
+    assert table.acquire(limits, now=0) == 1.0
+    assert table.acquire(limits, now=0.5) == 0.5
+    assert table.acquire(limits, now=1.0) == 0
+    # پر شدن از ظرفیت bucket بیشتر نمی‌شود
+    assert table.acquire(limits, now=100) == 0
+    assert table.acquire(limits, now=100) == 0
+    assert table.acquire(limits, now=100) > 0
+
+
+def test_rejected_request_takes_no_token_from_other_buckets():
+    table = TokenBucketTable()
+    ip, uuid = ("ip", 1.0, 10), ("uuid", 1.0, 1)
+    assert table.acquire([ip, uuid], now=0) == 0
+    # bucket uuid خالی است؛ درخواست رد می‌شود و از bucket ip چیزی کم نمی‌شود
+    for _ in range(5):
+        assert table.acquire([ip, uuid], now=0) > 0
+    assert table._buckets["ip"][0] == 9
+    for _ in range(9):
+        assert table.acquire([ip], now=0) == 0
+    assert table.acquire([ip], now=0) > 0
+
+
+def test_lru_eviction_at_capacity():
+    table = TokenBucketTable(capacity=2)
+    table.acquire([("a", 1.0, 1)], now=0)
+    table.acquire([("b", 1.0, 1)], now=0)
+    table.acquire([("a", 1.0, 1)], now=0)  # a اخیرا استفاده شده است
+    table.acquire([("c", 1.0, 1)], now=0)
+    assert len(table) == 2
+    assert table.evictions == 1
+    assert set(table._buckets) == {"a", "c"}
+    # bucket حذف‌شده با بازگشت دوباره پر شروع می‌کند
+    assert table.acquire([("b", 1.0, 1)], now=0) == 0
+    assert table.evictions == 2
+
+
+def test_subscription_is_limited_per_uuid_and_per_ip():
+    limiter = RateLimiter([build_rule("subscription", "/subscription/{user_uuid}", ("GET",), ip="4/60", user_uuid="2/60")])
+    check = limiter.check
+    assert check("GET", "/subscription/aaa", "10.0.0.1") == ("subscription", 0)
+    assert check("GET", "/subscription/aaa", "10.0.0.2") == ("subscription", 0)
+    # همان uuid از IP دیگر هم محدود است
+    rule, wait = check("GET", "/subscription/aaa", "10.0.0.3")
+    assert rule == "subscription" and wait > 0
+    # uuid دیگر bucket جداگانه دارد تا سقف IP
+    assert check("GET", "/subscription/bbb", "10.0.0.1") == ("subscription", 0)
+    assert check("GET", "/subscription/ccc", "10.0.0.1") == ("subscription", 0)
+    assert check("GET", "/subscription/ddd", "10.0.0.1") == ("subscription", 0)
+    assert check("GET", "/subscription/eee", "10.0.0.1")[1] > 0
+    # مسیرها و متدهای بدون قاعده محدود نمی‌شوند
+    assert check("POST", "/subscription/aaa", "10.0.0.3") == (None, 0.0)
+    assert check("GET", "/users/", "10.0.0.3") == (None, 0.0)
+
+
+def test_default_rules_cover_backup_endpoints():
+    limiter = RateLimiter()
+    results = [limiter.check("POST", "/system/backup/snapshot", "203.0.113.1") for _ in range(3)]
+    assert [wait == 0 for _, wait in results] == [True, True, False]
+    assert results[0][0] == "backup_snapshot"
+
+
+def test_middleware_returns_429_with_retry_after():
+    app = FastAPI()
+
+    @app.get("/subscription/{user_uuid}")
+    def subscription(user_uuid: str):
+        return {"uuid": user_uuid}
+
+    @app.get("/free")
+    def free():
+        return {}
+
+    limiter = RateLimiter([build_rule("subscription", "/subscription/{user_uuid}", ("GET",), ip="2/60")])
+    client = TestClient(RateLimitMiddleware(app, limiter=limiter))
+    assert client.get("/subscription/a").status_code == 200
+    assert client.get("/subscription/b").status_code == 200
+    response = client.get("/subscription/c")
+    assert response.status_code == 429
+    # یک توکن در هر ۳۰ ثانیه
+    assert 29 <= int(response.headers["Retry-After"]) <= 30
+    assert response.json() == {"message": "Too many requests."}
+    assert all(client.get("/free").status_code == 200 for _ in range(5))
@@ -0,0 +1,109 @@
+import pytest
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
+
+from backend.models import Base, User, UserUsage
+from backend.utils.traffic_utils import TrafficAccumulator, TrafficCollector, upsert_usage
+from backend.utils.xray_utils import InMemoryXrayStats, client_email
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/traffic.db")
+
+    # کلید خارجی مانند MariaDB و PostgreSQL اعمال می‌شود
+    @event.listens_for(engine, "connect")
+    def _foreign_keys(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA foreign_keys = ON")
+
+    Base.metadata.create_all(engine, tables=[User.__table__, UserUsage.__table__])
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": user_id, "username": f"user{user_id}", "uuid": f"00000000-0000-4000-8000-{user_id:012d}"}
+            for user_id in (1, 2, 3)
+        ])
+    return sessionmaker(bind=engine)
+
+
+def _usage(session_factory) -> dict:
+    db = session_factory()
+    try:
+        return {row.user_id: (row.uplink, row.downlink) for row in db.query(UserUsage)}
+    finally:
+        db.close()
+
+
+def test_accumulator_sums_and_drains():
+    accumulator = TrafficAccumulator(capacity=2)
+    accumulator.add(1, uplink=10)
+    accumulator.add(1, downlink=5)
+    accumulator.add(7, uplink=3)
+    assert len(accumulator) == 2
+    assert sorted(accumulator.drain()) == [(1, 10, 5), (7, 3, 0)]
+    assert accumulator.drain() == []
+
+
+def test_accumulator_rejects_ids_above_cap():
+    accumulator = TrafficAccumulator(capacity=4, max_user_id=10)
+    assert not accumulator.add(2**40, uplink=1)
+    assert not accumulator.add(-1, uplink=1)
+    assert accumulator.add(10, uplink=1)
+    # آرایه‌ها فقط تا سقف رشد می‌کنند
+    assert len(accumulator._dirty) == 16
+    assert accumulator.rejected == 2
+
+
+def test_upsert_usage_adds_to_existing_rows(session_factory):
+    db = session_factory()
+    upsert_usage(db, [(1, 100, 200), (2, 1, 2)])
+    upsert_usage(db, [(1, 50, 50)])
+    db.commit()
+    db.close()
+    assert _usage(session_factory) == {1: (150, 250), 2: (1, 2)}
+
+
+def test_upsert_usage_rejects_unknown_user(session_factory):
+    db = session_factory()
+    with pytest.raises(IntegrityError):
+        upsert_usage(db, [(1, 1, 1), (99, 1, 1)])
+    db.close()
+
+
+def test_collector_drops_unknown_and_oversized_ids(session_factory):
+    stats = InMemoryXrayStats()
+    flushed = []
+    collector = TrafficCollector(stats, session_factory, on_flush=flushed.extend)
+    stats.record(client_email(1, "user1"), uplink=100, downlink=200)
+    stats.record(client_email(3, "user3"), downlink=7)
+    stats.record(f"{2**40}.attacker", uplink=1)
+    stats.record("not-a-panel-client", uplink=1)
+    collector.poll()
+    assert collector.accumulator.max_user_id == 3
+    assert len(collector.accumulator._dirty) == 1024
+
+    # کاربر ۳ پیش از flush حذف می‌شود؛ ردیف او نباید بقیه را از کار بیندازد
+    db = session_factory()
+    db.execute(User.__table__.delete().where(User.id == 3))
+    db.commit()
+    db.close()
+    assert collector.flush() == 1
+    assert _usage(session_factory) == {1: (100, 200)}
+    assert flushed == [1]
+    assert collector.dropped_users == 1
+    # delta کاربر حذف‌شده دوباره صف نمی‌شود
+    assert collector.flush() == 0
+
+
+def test_collector_accepts_users_created_after_start(session_factory):
+    stats = InMemoryXrayStats()
+    collector = TrafficCollector(stats, session_factory)
+    collector.refresh_max_user_id()
+    db = session_factory()
+    db.execute(insert(User), [{"id": 4, "username": "user4", "uuid": "00000000-0000-4000-8000-000000000004"}])
+    db.commit()
+    db.close()
+    stats.record(client_email(4, "user4"), uplink=9)
+    collector.poll()
+    collector.flush()
+    assert _usage(session_factory) == {4: (9, 0)}
@@ -0,0 +1,42 @@
+import asyncio
+import uuid
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from backend.database import user_cache
+from backend.models import Base, User
+from backend.utils.cache_utils import TTLCache
+
+REAL_UUID = "00000000-0000-4000-8000-000000000001"
+
+
+def test_unknown_uuids_do_not_evict_cached_users(tmp_path, monkeypatch):
+    monkeypatch.setattr(user_cache, "user_cache", TTLCache(maxsize=4, ttl=300, name="test_users"))
+    monkeypatch.setattr(user_cache, "unknown_uuid_cache", TTLCache(maxsize=8, ttl=30, name="test_unknown"))
+
+    async def main():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/users.db")
+        async with engine.begin() as conn:
+            await conn.run_sync(lambda sync: Base.metadata.create_all(sync, tables=[User.__table__]))
+            await conn.execute(insert(User), [{"id": 1, "username": "alice", "uuid": REAL_UUID}])
+        try:
+            async with AsyncSession(engine) as db:
+                assert (await user_cache.get_user_snapshot(db, REAL_UUID))["username"] == "alice"
+                # اسکن با UUIDهای تصادفی فقط کش منفی را پر می‌کند
+                for _ in range(100):
+                    assert await user_cache.get_user_snapshot(db, str(uuid.uuid4())) is None
+                assert len(user_cache.unknown_uuid_cache) == 8
+                assert user_cache.user_cache.get(REAL_UUID)["username"] == "alice"
+
+                # UUID ناموجود پس از ساخته شدن کاربر دیگر None برنمی‌گردد
+                new_uuid = "00000000-0000-4000-8000-000000000002"
+                assert await user_cache.get_user_snapshot(db, new_uuid) is None
+                await db.execute(insert(User), [{"id": 2, "username": "bob", "uuid": new_uuid}])
+                await db.commit()
+                user_cache._invalidate_users({(2, new_uuid)})
+                assert (await user_cache.get_user_snapshot(db, new_uuid))["username"] == "bob"
+        finally:
+            await engine.dispose()
+
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+import json
+import time
+
+import pytest
+from sqlalchemy import create_engine, insert, update
+from sqlalchemy.orm import sessionmaker
+
+from backend.models import Base, User
+from backend.utils.xray_utils import InMemoryXrayApi, XrayConfigCompiler, client_email
+
+UUIDS = {user_id: f"00000000-0000-4000-8000-{user_id:012d}" for user_id in range(1, 5)}
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path}/xray.db")
+    Base.metadata.create_all(engine, tables=[User.__table__])
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {"id": user_id, "username": f"user{user_id}", "uuid": UUIDS[user_id], "is_active": user_id != 3}
+            for user_id in (1, 2, 3)
+        ])
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def config_path(tmp_path):
+    # کلاینت 99 در کانفیگ هست ولی در پایگاه داده نیست
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"inbounds": [
+        {"tag": "vless-in", "protocol": "vless", "port": 443,
+         "settings": {"clients": [{"id": "stale", "email": "99.gone"}], "decryption": "none"}},
+        {"tag": "trojan-in", "protocol": "trojan", "port": 8443, "settings": {"clients": []}},
+        {"tag": "api", "protocol": "dokodemo-door", "port": 10085, "settings": {}},
+    ]}))
+    return str(path)
+
+
+def _execute(session_factory, statement) -> None:
+    db = session_factory()
+    db.execute(statement)
+    db.commit()
+    db.close()
+
+
+def _compiler(session_factory, config_path, debounce: float = 60) -> tuple:
+    api = InMemoryXrayApi()
+    # وضعیت اولیه Xray همان فایل کانفیگ است
+    api.clients = {"vless-in": {"99.gone": {"id": "stale", "email": "99.gone"}}}
+    return api, XrayConfigCompiler(api, session_factory, config_path=config_path, debounce=debounce)
+
+
+def _config_emails(config_path) -> dict:
+    with open(config_path, encoding="utf-8") as f:
+        config = json.load(f)
+    return {inbound["tag"]: sorted(c["email"] for c in inbound["settings"].get("clients", []))
+            for inbound in config["inbounds"] if inbound["tag"] != "api"}
+
+
+def test_full_sync_adds_active_users_and_removes_unknown_clients(session_factory, config_path):
+    api, compiler = _compiler(session_factory, config_path)
+    assert compiler.apply() == {"added": 4, "removed": 1}
+    expected = sorted([client_email(1, "user1"), client_email(2, "user2")])
+    assert {tag: sorted(clients) for tag, clients in api.clients.items()} == {"vless-in": expected, "trojan-in": expected}
+    assert api.clients["vless-in"][client_email(1, "user1")] == {"id": UUIDS[1], "email": "1.user1"}
+    assert api.clients["trojan-in"][client_email(1, "user1")] == {"password": UUIDS[1], "email": "1.user1"}
+    assert _config_emails(config_path) == {"vless-in": expected, "trojan-in": expected}
+
+
+def test_incremental_apply_pushes_only_the_diff(session_factory, config_path):
+    api, compiler = _compiler(session_factory, config_path)
+    compiler.apply()
+    calls = api.calls
+
+    # بدون تغییر، هیچ فراخوانی API انجام نمی‌شود
+    assert compiler.apply() == {"added": 0, "removed": 0}
+    assert api.calls == calls
+
+    _execute(session_factory, update(User).where(User.id == 1).values(username="renamed"))
+    _execute(session_factory, update(User).where(User.id == 2).values(is_active=False))
+    _execute(session_factory, update(User).where(User.id == 3).values(is_active=True))
+    compiler.mark_changed({(1, UUIDS[1]), (2, UUIDS[2]), (3, UUIDS[3])})
+    compiler.stop()
+    assert compiler.apply() == {"added": 4, "removed": 4}
+    expected = sorted([client_email(1, "renamed"), client_email(3, "user3")])
+    assert {tag: sorted(clients) for tag, clients in api.clients.items()} == {"vless-in": expected, "trojan-in": expected}
+    assert _config_emails(config_path) == {"vless-in": expected, "trojan-in": expected}
+
+
+def test_changes_within_debounce_window_are_applied_once(session_factory, config_path):
+    api, compiler = _compiler(session_factory, config_path, debounce=0.1)
+    compiler.apply()
+    applies = compiler.applies
+
+    for user_id in (1, 2, 3):
+        _execute(session_factory, update(User).where(User.id == user_id).values(username=f"new{user_id}"))
+        compiler.mark_changed({(user_id, UUIDS[user_id])})
+    deadline = time.monotonic() + 5
+    while compiler.applies == applies and time.monotonic() < deadline:
+        time.sleep(0.02)
+    time.sleep(0.2)
+    compiler.stop()
+    assert compiler.applies == applies + 1
+    assert sorted(api.clients["vless-in"]) == [client_email(1, "new1"), client_email(2, "new2")]